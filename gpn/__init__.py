@@ -1,16 +1,44 @@
 # -*- coding: utf-8 -*-
 """Granular Partition Network"""
+import sys
 
 __version__ = '0.01'
 
-from gpn.node import Node
-from gpn.connector import IN_MEMORY
-from gpn.connector import TEMP_FILE
-from gpn.connector import READ_ONLY
-
 __all__ = [
     'Node',
+    'Cell',
     'IN_MEMORY',
     'TEMP_FILE',
     'READ_ONLY',
 ]
+
+# Public names and the modules that define them.  These modules are
+# not imported until one of their names is first used.
+_lazy_attrs = {
+    'Node': 'gpn.node',
+    'Cell': 'gpn.cell',
+    'IN_MEMORY': 'gpn.connector',
+    'TEMP_FILE': 'gpn.connector',
+    'READ_ONLY': 'gpn.connector',
+}
+
+if sys.version_info >= (3, 7):
+    def __getattr__(name):  # Module __getattr__ is new in 3.7 (PEP 562).
+        global _lazy_attrs
+        if name not in _lazy_attrs:
+            raise AttributeError('module %r has no attribute %r'
+                                 % (__name__, name))
+        module = __import__(_lazy_attrs[name], fromlist=[name])
+        value = getattr(module, name)
+        globals()[name] = value  # <- Later lookups skip __getattr__.
+        return value
+
+    def __dir__():
+        return sorted(set(globals()) | set(_lazy_attrs))
+
+else:
+    from gpn.node import Node
+    from gpn.cell import Cell
+    from gpn.connector import IN_MEMORY
+    from gpn.connector import TEMP_FILE
+    from gpn.connector import READ_ONLY
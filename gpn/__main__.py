@@ -0,0 +1,393 @@
+# -*- coding: utf-8 -*-
+"""Command-line interface:
+
+    python -m gpn ingest counties.node counties.csv --progress
+    python -m gpn export counties.node counties-out.csv
+    python -m gpn hash counties.node
+    python -m gpn select counties.node state=Indiana
+    python -m gpn graph path/to/folder --export dot
+    python -m gpn serve path/to/folder --socket gpn.sock
+    python -m gpn client --socket gpn.sock '{"op": "hash"}'
+
+Every command accepts --profile (print the slowest functions and SQLite
+statements to stderr) and --progress (report rows per second to
+stderr).
+
+"""
+import argparse
+import json
+import os
+import re
+import sys
+import threading
+import time
+
+# Other gpn modules (and cProfile) are imported by the commands that
+# use them so that "client" and other quick commands start fast.
+
+
+class _Progress(object):
+    """Reports count and rate to `stream` at most every `interval`
+    seconds.
+
+    """
+    def __init__(self, stream, unit='rows', interval=1.0):
+        self.stream = stream
+        self.unit = unit
+        self.interval = interval
+        self.count = 0
+        self._start = self._last = time.time()
+
+    def update(self, count=1):
+        self.count += count
+        now = time.time()
+        if now - self._last >= self.interval:
+            self._last = now
+            self.stream.write('\r' + self._message(now))
+            self.stream.flush()
+
+    def finish(self):
+        self.stream.write('\r' + self._message(time.time()) + '\n')
+
+    def _message(self, now):
+        elapsed = max(now - self._start, 1e-9)
+        return '%s %s (%.0f %s/s)' % (self.count, self.unit,
+                                      self.count / elapsed, self.unit)
+
+
+class _NoProgress(object):
+    def update(self, count=1):
+        pass
+
+    def finish(self):
+        pass
+
+
+class _CountingLines(object):
+    """Iterate over lines of `fh` reporting every line after the
+    header row to `progress`.
+
+    """
+    def __init__(self, fh, progress):
+        self._lines = iter(fh)
+        self._progress = progress
+        self._header = True
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        line = next(self._lines)
+        if self._header:
+            self._header = False
+        else:
+            self._progress.update()
+        return line
+
+    next = __next__  # For Python 2.
+
+
+class _CountingWriter(object):
+    """Wrap file object `fh` reporting each line written (after the
+    header row) to `progress`.
+
+    """
+    def __init__(self, fh, progress):
+        self._fh = fh
+        self._progress = progress
+        self._header = True
+
+    def write(self, value):
+        count = value.count('\n')
+        if count and self._header:
+            self._header = False
+            count -= 1
+        if count:
+            self._progress.update(count)
+        return self._fh.write(value)
+
+
+class _StatementTimer(object):
+    """SQLite trace callback that times statements.  The time for a
+    statement is measured from its start until the next statement
+    starts (or until stop() is called) on the same thread--so it also
+    includes time spent in Python between statements.
+
+    """
+    def __init__(self):
+        self.totals = {}
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self.active = True
+
+    @staticmethod
+    def _normalize(sql):
+        sql = re.sub(r"'(?:[^']|'')*'", '?', sql)  # String literals.
+        sql = re.sub(r'\b\d+(?:\.\d+)?\b', '?', sql)  # Numeric literals.
+        return ' '.join(sql.split())
+
+    def __call__(self, sql):
+        if not self.active:
+            return
+        now = time.time()
+        self._finish(now)
+        self._local.last = (self._normalize(sql), now)
+
+    def _finish(self, now):
+        last = getattr(self._local, 'last', None)
+        if last:
+            key, start = last
+            with self._lock:
+                count, total = self.totals.get(key, (0, 0.0))
+                self.totals[key] = (count + 1, total + now - start)
+            self._local.last = None
+
+    def stop(self):
+        self._finish(time.time())
+        self.active = False
+
+    def report(self, top=10):
+        lines = ['SQLite statements (approximate seconds, by total):',
+                 '%10s %8s  %s' % ('seconds', 'calls', 'statement')]
+        ordered = sorted(self.totals.items(), key=lambda x: -x[1][1])
+        for sql, (count, total) in ordered[:top]:
+            if len(sql) > 100:
+                sql = sql[:97] + '...'
+            lines.append('%10.4f %8d  %s' % (total, count, sql))
+        return '\n'.join(lines) + '\n'
+
+
+def _run_profiled(func, top, stream):
+    """Call `func` under cProfile and write the `top` functions (by
+    cumulative time) and SQLite statements to `stream`.
+
+    """
+    import cProfile
+    import pstats
+    import gpn.connector
+
+    profiler = cProfile.Profile()
+    statements = _StatementTimer()
+    gpn.connector._trace_callback = statements
+    try:
+        return profiler.runcall(func)
+    finally:
+        gpn.connector._trace_callback = None
+        statements.stop()
+        stream.write('\n')
+        stats = pstats.Stats(profiler, stream=stream)
+        stats.sort_stats('cumulative').print_stats(top)
+        stream.write(statements.report(top))
+
+
+def _open_node(path):
+    """Return existing node (unlike Node(), never creates a file)."""
+    from gpn.node import Node
+    if not os.path.isfile(path):
+        raise IOError('No such node file: %r' % path)
+    return Node(path)
+
+
+#
+# Commands: each function accepts parsed arguments and a progress
+# object and returns an exit status.
+#
+
+def cmd_ingest(args, progress):
+    from gpn.node import Node
+    node = Node(args.node)
+    with open(args.csv, 'r') as fh:
+        node._insert_cells(_CountingLines(fh, progress))
+    return 0
+
+
+def cmd_export(args, progress):
+    node = _open_node(args.node)
+    if args.csv == '-':
+        node._export_cells(_CountingWriter(sys.stdout, progress))
+    else:
+        with open(args.csv, 'w') as fh:  # Overwrites existing file.
+            node._export_cells(_CountingWriter(fh, progress))
+    return 0
+
+
+def cmd_hash(args, progress):
+    sys.stdout.write('%s\n' % _open_node(args.node).get_hash())
+    return 0
+
+
+def cmd_select(args, progress):
+    from gpn import _csv as csv
+    criteria = {}
+    for item in args.criteria:
+        key, sep, value = item.partition('=')
+        if not sep:
+            raise ValueError('Criteria must be HIERARCHY=LABEL, got %r.' % item)
+        criteria[key] = value
+
+    node = _open_node(args.node)
+    with node._connect() as connection:
+        cursor = connection.cursor()
+        cursor.execute('SELECT hierarchy_value FROM hierarchy '
+                       'ORDER BY hierarchy_level')
+        fieldnames = [x[0] for x in cursor]
+
+    writer = csv.DictWriter(sys.stdout, fieldnames, lineterminator='\n')
+    writer.writeheader()
+    for cell in node.select_cell(**criteria):
+        writer.writerow(cell)
+        progress.update()
+    return 0
+
+
+def cmd_graph(args, progress):
+    from gpn.graph import Graph
+    graph = Graph(args.path, depth=args.depth)
+    if args.export == 'dot':
+        graph.export_dot(_CountingWriter(sys.stdout, progress),
+                         cells=args.cells)
+        return 0
+    if args.export == 'graphml':
+        graph.export_graphml(_CountingWriter(sys.stdout, progress),
+                             cells=args.cells)
+        return 0
+
+    write = sys.stdout.write
+    write('Nodes: %s\n' % len(graph.nodes))
+    write('Edges: %s\n' % len(graph.edges))
+    for edge in graph.edges:
+        write('  %s -> %s (%s)\n' % (edge.from_node, edge.to_node,
+                                     edge.edge_name))
+        progress.update()
+    write('Unresolved edges: %s\n' % len(graph._unresolved))
+    components = graph.strongly_connected_components()
+    write('Strongly connected components: %s\n' % len(components))
+    write('Hash: %s\n' % graph.get_hash())
+    return 0
+
+
+def cmd_serve(args, progress):
+    from gpn import server
+    from gpn.graph import Graph
+    graph = Graph(args.path, depth=args.depth)
+    ready = lambda srv: sys.stderr.write('Listening on %s\n' % args.socket)
+    server.serve(graph, args.socket, poll=args.poll or None, ready=ready)
+    return 0
+
+
+def cmd_client(args, progress):
+    from gpn import client
+    if args.requests:
+        lines = args.requests
+    else:
+        lines = (x for x in sys.stdin if x.strip())
+    requests = (json.loads(x) for x in lines)
+
+    status = 0
+    for response in client.request(args.socket, requests):
+        sys.stdout.write(json.dumps(response, sort_keys=True) + '\n')
+        sys.stdout.flush()
+        if not response.get('ok'):
+            status = 1
+        progress.update()
+    return status
+
+
+def _make_parser():
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument('--profile', action='store_true',
+                        help='run under cProfile and print the slowest '
+                             'functions and SQLite statements to stderr')
+    common.add_argument('--profile-top', type=int, default=20,
+                        metavar='N', help='entries to print (default: 20)')
+    common.add_argument('--progress', action='store_true',
+                        help='report rows per second to stderr')
+
+    parser = argparse.ArgumentParser(prog='python -m gpn',
+                                     description='Granular Partition Network')
+    subparsers = parser.add_subparsers(dest='command', metavar='COMMAND')
+    subparsers.required = True
+
+    sub = subparsers.add_parser('ingest', parents=[common],
+                                help='insert cells from CSV file into node')
+    sub.add_argument('node', help='node file (created if missing)')
+    sub.add_argument('csv', help='CSV file with hierarchy header row')
+    sub.set_defaults(func=cmd_ingest)
+
+    sub = subparsers.add_parser('export', parents=[common],
+                                help='write node cells to CSV file')
+    sub.add_argument('node', help='node file')
+    sub.add_argument('csv', nargs='?', default='-',
+                     help='output file (default: stdout)')
+    sub.set_defaults(func=cmd_export)
+
+    sub = subparsers.add_parser('hash', parents=[common],
+                                help='print node hash')
+    sub.add_argument('node', help='node file')
+    sub.set_defaults(func=cmd_hash)
+
+    sub = subparsers.add_parser('select', parents=[common],
+                                help='print cells matching labels as CSV')
+    sub.add_argument('node', help='node file')
+    sub.add_argument('criteria', nargs='+', metavar='HIERARCHY=LABEL')
+    sub.set_defaults(func=cmd_select)
+
+    sub = subparsers.add_parser('graph', parents=[common],
+                                help='summarize or export graph folder')
+    sub.add_argument('path', nargs='?', default='.',
+                     help='graph folder (default: current directory)')
+    sub.add_argument('--depth', type=int, default=0,
+                     help='sub-folder levels to include (default: 0)')
+    sub.add_argument('--export', choices=['dot', 'graphml'], default=None,
+                     help='write graph to stdout in given format')
+    sub.add_argument('--cells', action='store_true',
+                     help='include cell-level detail in export')
+    sub.set_defaults(func=cmd_graph)
+
+    sub = subparsers.add_parser('serve', parents=[common],
+                                help='answer queries on Unix domain socket')
+    sub.add_argument('path', nargs='?', default='.',
+                     help='graph folder or store file (default: current '
+                          'directory)')
+    sub.add_argument('--socket', default='gpn.sock',
+                     help='socket path (default: gpn.sock)')
+    sub.add_argument('--depth', type=int, default=0,
+                     help='sub-folder levels to include (default: 0)')
+    sub.add_argument('--poll', type=float, default=5.0, metavar='SECONDS',
+                     help='check node files for changes (default: 5, '
+                          '0 to disable)')
+    sub.set_defaults(func=cmd_serve)
+
+    sub = subparsers.add_parser('client', parents=[common],
+                                help='send JSON requests to running server')
+    sub.add_argument('requests', nargs='*', metavar='REQUEST',
+                     help='JSON request (default: one per line from stdin)')
+    sub.add_argument('--socket', default='gpn.sock',
+                     help='socket path (default: gpn.sock)')
+    sub.set_defaults(func=cmd_client)
+
+    return parser
+
+
+def main(argv=None):
+    args = _make_parser().parse_args(argv)
+    if args.progress:
+        progress = _Progress(sys.stderr)
+    else:
+        progress = _NoProgress()
+
+    try:
+        if args.profile:
+            status = _run_profiled(lambda: args.func(args, progress),
+                                   args.profile_top, sys.stderr)
+        else:
+            status = args.func(args, progress)
+    except Exception as err:
+        sys.stderr.write('gpn: error: %s\n' % err)
+        return 1
+    progress.finish()
+    return status
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,2 @@
+# -*- coding: utf-8 -*-
+"""Performance benchmarks for gpn (run with "python -m gpn.benchmarks")."""
@@ -0,0 +1,133 @@
+# -*- coding: utf-8 -*-
+"""Run benchmarks and write results as JSON:
+
+    python -m gpn.benchmarks --sizes 1000,10000 --output results.json
+
+Store a baseline, then compare later runs against it (exits with
+status 1 if any case is significantly slower than the threshold):
+
+    python -m gpn.benchmarks --repeat 7 --save-baseline baseline.json
+    python -m gpn.benchmarks --repeat 7 --baseline baseline.json
+
+Benchmark the catalog scan of a 2,000-node folder at 1, 4 and 16
+workers (building the fixture takes several minutes):
+
+    python -m gpn.benchmarks --sizes '' --cases graph_load --graph-nodes 2000
+
+"""
+import argparse
+import json
+import sys
+
+from gpn.benchmarks import compare
+from gpn.benchmarks import suite
+
+
+def _int_list(value):
+    return [int(x) for x in value.split(',') if x]
+
+
+def _name_list(value):
+    return [x.strip() for x in value.split(',') if x.strip()]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m gpn.benchmarks',
+                                     description='Run gpn benchmarks.')
+    parser.add_argument('--sizes', type=_int_list, default=[1000, 10000, 100000],
+                        help='comma-separated cell counts (default: '
+                             '1000,10000,100000; up to 10000000 is supported '
+                             'but slow)')
+    parser.add_argument('--depth', type=int, default=None,
+                        help='hierarchy levels (default: smallest depth '
+                             'that holds each size)')
+    parser.add_argument('--fanout', type=int, default=10,
+                        help='children per label (default: 10)')
+    parser.add_argument('--cardinality', type=int, default=None,
+                        help='distinct labels per level (default: fanout)')
+    parser.add_argument('--unmapped', type=float, default=0.0,
+                        help='fraction of UNMAPPED leaf labels (default: 0)')
+    parser.add_argument('--lookups', type=int, default=100,
+                        help='select_cell() calls per size (default: 100)')
+    parser.add_argument('--graph-nodes', type=int, default=50,
+                        help='node files for graph load (default: 50, '
+                             '0 to skip; use 2000 for the scan benchmark)')
+    parser.add_argument('--graph-cells', type=int, default=1000,
+                        help='cells per graph node (default: 1000)')
+    parser.add_argument('--workers', type=_int_list, default=[1, 4, 16],
+                        help='graph load worker counts (default: 1,4,16)')
+    parser.add_argument('--modules', type=_name_list, default=None,
+                        help='comma-separated modules for import case '
+                             '(default: %s)' % ','.join(suite.import_modules))
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--repeat', type=int, default=1,
+                        help='runs per case (default: 1; at least 2 are '
+                             'required with a baseline--use 5 or more)')
+    parser.add_argument('--cases', type=_name_list, default=None,
+                        help='comma-separated case names to run '
+                             '(default: all)')
+    parser.add_argument('--save-baseline', metavar='PATH', default=None,
+                        help='store results as baseline in PATH')
+    parser.add_argument('--baseline', metavar='PATH', default=None,
+                        help='compare results against baseline in PATH')
+    parser.add_argument('--threshold', type=float, default=10.0,
+                        help='percent slowdown that fails a comparison '
+                             '(default: 10)')
+    parser.add_argument('--memory', action='store_true',
+                        help='also profile memory use of each case '
+                             '(tracemalloc peaks, top allocation sites, '
+                             'and SQLite memory)')
+    parser.add_argument('--memory-top', type=int, default=10,
+                        help='allocation sites to record per case '
+                             '(default: 10)')
+    parser.add_argument('--output', '-o', default=None,
+                        help='JSON output file (default: stdout)')
+    args = parser.parse_args(argv)
+    if (args.baseline or args.save_baseline) and args.repeat < 2:
+        parser.error('--repeat must be 2 or more to save or compare '
+                     'against a baseline')
+
+    log = lambda message: sys.stderr.write(message + '\n')
+    results = suite.run(sizes=args.sizes, depth=args.depth,
+                        fanout=args.fanout, cardinality=args.cardinality,
+                        unmapped=args.unmapped, lookups=args.lookups,
+                        graph_nodes=args.graph_nodes,
+                        graph_cells=args.graph_cells, workers=args.workers,
+                        seed=args.seed, repeat=args.repeat,
+                        cases=args.cases, memory=args.memory,
+                        memory_top=args.memory_top, modules=args.modules,
+                        log=log)
+
+    output = json.dumps(results, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, 'w') as fh:
+            fh.write(output + '\n')
+    else:
+        sys.stdout.write(output + '\n')
+
+    if args.save_baseline:
+        with open(args.save_baseline, 'w') as fh:
+            fh.write(output + '\n')
+
+    status = 0
+    if args.baseline:
+        with open(args.baseline) as fh:
+            baseline = json.load(fh)
+        rows = compare.compare(baseline, results, threshold=args.threshold)
+        log(compare.format_report(rows))
+        regressions = [x for x in rows
+                       if x['regression'] or x['memory_regression']]
+        if regressions:
+            log('%s case(s) slower than %s%% threshold.'
+                % (len(regressions), args.threshold))
+            status = 1
+        insufficient = [x for x in rows if x['insufficient']]
+        if insufficient:
+            log('%s case(s) have fewer than 2 samples in the baseline or '
+                'current run.' % len(insufficient))
+            status = 1
+    return status
+
+
+if __name__ == '__main__':
+    sys.exit(main())
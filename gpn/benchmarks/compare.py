@@ -0,0 +1,155 @@
+# -*- coding: utf-8 -*-
+"""Compare benchmark results against a stored baseline."""
+import math
+
+# Two-sided 95% critical values of Student's t distribution for 1 to
+# 30 degrees of freedom (larger values use the normal approximation).
+_t_critical = [12.706, 4.303, 3.182, 2.776, 2.571, 2.447, 2.365, 2.306,
+               2.262, 2.228, 2.201, 2.179, 2.160, 2.145, 2.131, 2.120,
+               2.110, 2.101, 2.093, 2.086, 2.080, 2.074, 2.069, 2.064,
+               2.060, 2.056, 2.052, 2.048, 2.045, 2.042]
+
+
+def _t_value(df):
+    global _t_critical
+    if df < 1:
+        return float('inf')
+    df = int(df)  # Round down (conservative).
+    if df <= len(_t_critical):
+        return _t_critical[df - 1]
+    return 1.960
+
+
+def _mean_variance(samples):
+    """Return mean and sample variance of `samples`."""
+    count = len(samples)
+    mean = sum(samples) / float(count)
+    if count < 2:
+        return mean, 0.0
+    variance = sum((x - mean) ** 2 for x in samples) / (count - 1)
+    return mean, variance
+
+
+def _result_key(result):
+    """Return key that identifies the same case in different runs."""
+    return (result['case'], result.get('module') or result.get('cells'),
+            result.get('workers'))
+
+
+def change_interval(baseline, current):
+    """Return percentage change in mean time from `baseline` samples
+    to `current` samples with the low and high bounds of its 95%
+    confidence interval (Welch's t-interval for the difference of
+    means, expressed as a percentage of the baseline mean).
+
+    """
+    base_mean, base_var = _mean_variance(baseline)
+    curr_mean, curr_var = _mean_variance(current)
+    base_se2 = base_var / len(baseline)
+    curr_se2 = curr_var / len(current)
+    std_error = math.sqrt(base_se2 + curr_se2)
+
+    if len(baseline) < 2 or len(current) < 2:
+        margin = float('inf')  # <- Cannot estimate variance.
+    elif std_error == 0:
+        margin = 0.0
+    else:
+        df = (base_se2 + curr_se2) ** 2 / (
+            base_se2 ** 2 / (len(baseline) - 1)
+            + curr_se2 ** 2 / (len(current) - 1))
+        margin = _t_value(df) * std_error
+
+    difference = curr_mean - base_mean
+    scale = 100.0 / base_mean if base_mean else 0.0
+    return (difference * scale,
+            (difference - margin) * scale,
+            (difference + margin) * scale)
+
+
+def _memory_total(result):
+    """Return peak Python plus SQLite bytes for `result` or None if
+    memory was not profiled.
+
+    """
+    memory = result.get('memory')
+    if not memory:
+        return None
+    return (memory.get('python_peak') or 0) + (memory.get('sqlite_peak') or 0)
+
+
+def compare(baseline, current, threshold=10.0):
+    """Return list of comparison rows (dictionaries) for cases found
+    in both `baseline` and `current` results (as returned by
+    gpn.benchmarks.suite.run()).
+
+    A case is marked as a regression when its percentage change is
+    greater than `threshold` and the low bound of its confidence
+    interval is above zero (i.e., the slowdown is unlikely to be
+    noise).
+
+    Cases with fewer than two samples in either run have no usable
+    interval and are marked as insufficient (they cannot pass).
+
+    If both runs profiled memory, the percentage change in peak memory
+    (Python plus SQLite) is also reported and marked as a regression
+    when greater than `threshold`.
+
+    """
+    base_results = dict((_result_key(x), x) for x in baseline['results'])
+    rows = []
+    for result in current['results']:
+        key = _result_key(result)
+        if key not in base_results:
+            continue
+        base_samples = base_results[key].get('samples',
+                                             [base_results[key]['seconds']])
+        curr_samples = result.get('samples', [result['seconds']])
+        change, low, high = change_interval(base_samples, curr_samples)
+
+        base_memory = _memory_total(base_results[key])
+        curr_memory = _memory_total(result)
+        if base_memory and curr_memory is not None:
+            memory_change = (curr_memory - base_memory) * 100.0 / base_memory
+        else:
+            memory_change = None
+
+        rows.append({'case': key[0],
+                     'cells': key[1],
+                     'workers': key[2],
+                     'baseline': base_results[key]['seconds'],
+                     'current': result['seconds'],
+                     'change': change,
+                     'low': low,
+                     'high': high,
+                     'regression': change > threshold and low > 0,
+                     'insufficient': (len(base_samples) < 2
+                                      or len(curr_samples) < 2),
+                     'memory_change': memory_change,
+                     'memory_regression': (memory_change is not None
+                                           and memory_change > threshold)})
+    return rows
+
+
+def format_report(rows):
+    """Return comparison rows as a plain-text table."""
+    lines = ['%-14s %10s %8s %10s %10s %9s  %-21s %8s' % (
+        'case', 'cells', 'workers', 'baseline', 'current', 'change',
+        '95% interval', 'memory')]
+    for row in rows:
+        interval = '[%+.1f%%, %+.1f%%]' % (row['low'], row['high'])
+        if row['memory_change'] is None:
+            memory = '-'
+        else:
+            memory = '%+.1f%%' % row['memory_change']
+        flags = []
+        if row['regression']:
+            flags.append('REGRESSION')
+        if row['memory_regression']:
+            flags.append('MEMORY REGRESSION')
+        if row['insufficient']:
+            flags.append('INSUFFICIENT SAMPLES')
+        lines.append('%-14s %10s %8s %9.4fs %9.4fs %+8.1f%%  %-21s %8s%s' % (
+            row['case'], row['cells'], row['workers'] or '-',
+            row['baseline'], row['current'], row['change'], interval,
+            memory, ''.join('  ' + x for x in flags)))
+    return '\n'.join(lines)
@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+"""Synthetic hierarchies for benchmarking."""
+import random
+
+from gpn import _csv as csv
+
+
+def iter_rows(cells, depth=4, fanout=10, cardinality=None, unmapped=0.0,
+              seed=0):
+    """Yield header row followed by `cells` rows of labels (rows are
+    generated lazily so very large files need not fit in memory).
+
+    The first level is a single root label.  Each following level
+    branches `fanout` ways and draws its labels from a vocabulary of
+    `cardinality` values per level (defaults to `fanout`).  Sibling
+    labels are always distinct so every row is a unique label set.
+
+    A fraction of rows (given by `unmapped`, at most 1/fanout) end in
+    an UNMAPPED label instead of their leaf label.  Only the first row
+    of each sibling group can be unmapped so unmapped label sets are
+    also unique.
+
+    """
+    if cardinality is None:
+        cardinality = fanout
+    assert depth > 1, 'depth must be at least 2.'
+    assert cardinality >= fanout, 'cardinality must not be less than fanout.'
+    assert cells <= fanout ** (depth - 1), (
+        'Too many cells for depth and fanout (maximum is %s).'
+        % fanout ** (depth - 1))
+    assert 0.0 <= unmapped <= 1.0, 'unmapped must be between 0 and 1.'
+
+    rand = random.Random(seed)
+    group_ratio = min(unmapped * fanout, 1.0)  # Chance per sibling group.
+
+    yield ['level%s' % x for x in range(depth)]
+    for index in range(cells):
+        row = ['Root']
+        prefix = 0
+        for level in range(1, depth):
+            place = fanout ** (depth - 1 - level)
+            digit = (index // place) % fanout
+            offset = (prefix * 7919) % cardinality  # <- Varies by parent.
+            row.append('L%s-%s' % (level, (digit + offset) % cardinality))
+            prefix = prefix * fanout + digit
+
+        if index % fanout == 0 and rand.random() < group_ratio:
+            row[-1] = 'UNMAPPED'
+        yield row
+
+
+def write_csv(path, cells, **kwds):
+    """Write synthetic cells to CSV file `path` (see iter_rows() for
+    keyword arguments).
+
+    """
+    with open(path, 'w') as fh:
+        writer = csv.writer(fh, lineterminator='\n')
+        writer.writerows(iter_rows(cells, **kwds))
@@ -0,0 +1,151 @@
+# -*- coding: utf-8 -*-
+"""Memory profiling for benchmark cases."""
+import ctypes
+import gc
+import os
+import sqlite3
+import threading
+try:
+    import tracemalloc  # New in 3.4
+except ImportError:
+    tracemalloc = None
+try:
+    import resource  # Unix only.
+except ImportError:
+    resource = None
+
+_sqlite_library = None  # Set by _get_sqlite_library() on first use.
+
+
+def _get_sqlite_library():
+    """Return ctypes handle for the SQLite library used by the sqlite3
+    module or False if its memory functions cannot be loaded.
+
+    """
+    global _sqlite_library
+    if _sqlite_library is None:
+        try:
+            import _sqlite3
+            library = ctypes.CDLL(_sqlite3.__file__)
+            library.sqlite3_memory_used.restype = ctypes.c_int64
+            library.sqlite3_memory_highwater.restype = ctypes.c_int64
+            library.sqlite3_memory_highwater.argtypes = [ctypes.c_int]
+            _sqlite_library = library
+        except (ImportError, AttributeError, OSError):
+            _sqlite_library = False
+    return _sqlite_library
+
+
+def sqlite_settings(path):
+    """Return dictionary of page and cache settings for the SQLite
+    database in `path`.  The cache size is given in bytes (a negative
+    cache_size PRAGMA value is a size in KiB).
+
+    """
+    connection = sqlite3.connect(path)
+    try:
+        cursor = connection.cursor()
+        settings = {}
+        for pragma in ('page_size', 'page_count', 'cache_size'):
+            cursor.execute('PRAGMA %s' % pragma)
+            settings[pragma] = cursor.fetchone()[0]
+    finally:
+        connection.close()
+
+    cache_size = settings['cache_size']
+    if cache_size < 0:
+        settings['cache_bytes'] = -cache_size * 1024
+    else:
+        settings['cache_bytes'] = cache_size * settings['page_size']
+    return settings
+
+
+class _PeakSampler(object):
+    """Background thread that keeps the tracemalloc snapshot taken
+    closest to peak traced memory (sampled every `interval` seconds).
+
+    """
+    def __init__(self, interval=0.05):
+        self.interval = interval
+        self.snapshot = None
+        self.snapshot_size = -1
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run)
+        self._thread.daemon = True
+
+    def _sample(self):
+        current = tracemalloc.get_traced_memory()[0]
+        if current > self.snapshot_size:
+            self.snapshot = tracemalloc.take_snapshot()
+            self.snapshot_size = current
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self._sample()
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._thread.join()
+        self._sample()  # <- Final sample in case operation was short.
+
+
+def profile_memory(case, context, top=10):
+    """Run `case` once and return dictionary of memory measurements:
+
+    * python_peak: peak bytes allocated by Python (tracemalloc)
+    * python_top: list of the `top` allocation sites (file:line) in
+      the sampled snapshot closest to the peak
+    * sqlite_peak: peak bytes allocated by SQLite during the case
+      (page cache, statements, and other internal memory) above what
+      was already allocated when the case started
+    * max_rss: peak resident set size of the process so far (KiB on
+      Linux)
+
+    Values that cannot be measured on this platform are None.
+
+    """
+    gc.collect()  # Close unreferenced connections from earlier cases.
+    library = _get_sqlite_library()
+    if library:
+        sqlite_before = library.sqlite3_memory_used()
+        library.sqlite3_memory_highwater(1)  # Reset highwater mark.
+
+    result = {'python_peak': None, 'python_top': None}
+    if tracemalloc:
+        tracemalloc.start()
+        try:
+            with _PeakSampler() as sampler:
+                case(context)
+            result['python_peak'] = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+        this_file = os.path.splitext(__file__)[0] + '.py*'
+        snapshot = sampler.snapshot.filter_traces([
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, this_file),
+        ])
+        result['python_top'] = [
+            {'site': '%s:%s' % (stat.traceback[0].filename,
+                                stat.traceback[0].lineno),
+             'size': stat.size,
+             'count': stat.count}
+            for stat in snapshot.statistics('lineno')[:top]]
+    else:
+        case(context)
+
+    if library:
+        highwater = library.sqlite3_memory_highwater(0)
+        result['sqlite_peak'] = highwater - sqlite_before
+    else:
+        result['sqlite_peak'] = None
+
+    if resource:
+        result['max_rss'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    else:
+        result['max_rss'] = None
+    return result
@@ -0,0 +1,363 @@
+# -*- coding: utf-8 -*-
+"""Benchmark cases for node and graph hot paths."""
+import os
+import platform
+import random
+import shutil
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+
+from gpn.benchmarks.generator import iter_rows
+from gpn.benchmarks.generator import write_csv
+from gpn.benchmarks.memory import profile_memory
+from gpn.benchmarks.memory import sqlite_settings
+import gpn
+from gpn.graph import Graph
+from gpn.node import Node
+
+try:
+    _timer = time.perf_counter  # New in 3.3
+except AttributeError:
+    _timer = time.time
+
+
+class _Stopwatch(object):
+    """Context manager that records elapsed seconds."""
+    def __enter__(self):
+        self.seconds = None
+        self._start = _timer()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.seconds = _timer() - self._start
+
+
+def _default_depth(cells, fanout):
+    """Return smallest depth that can hold `cells` rows."""
+    depth = 2
+    while fanout ** (depth - 1) < cells:
+        depth += 1
+    return depth
+
+
+def _sample_lookups(count, cells, seed=0, **kwds):
+    """Return list of `count` label dictionaries for randomly chosen
+    rows (as keyword arguments for Node.select_cell()).
+
+    """
+    rand = random.Random(seed)
+    wanted = set(rand.sample(range(cells), min(count, cells)))
+    rows = iter_rows(cells, seed=seed, **kwds)
+    fieldnames = next(rows)
+    return [dict(zip(fieldnames, row))
+            for index, row in enumerate(rows) if index in wanted]
+
+
+def _add_identity_edge(node, other, cells):
+    """Add edge to `node` relating each cell of `other` to the cell
+    with the same cell_id.
+
+    """
+    with node._connect() as connection:
+        cursor = connection.cursor()
+        cursor.execute('INSERT INTO edge (other_node_hash, other_node_name) '
+                       'VALUES (?, ?)', (other.get_hash(), other.name))
+        edge_id = cursor.lastrowid
+        params = ((edge_id, x, x) for x in range(1, cells + 1))
+        cursor.executemany('INSERT INTO relation (edge_id, other_cell_id, '
+                           'cell_id) VALUES (?, ?, ?)', params)
+
+
+#
+# Cases: each function accepts a context dictionary (see run()),
+# performs any needed setup, and returns the seconds spent in the
+# operation being measured.
+#
+
+def case_insert_cells(context):
+    path = os.path.join(context['workdir'], 'insert.node')
+    if os.path.exists(path):
+        os.remove(path)
+    node = Node(path)
+    with _Stopwatch() as stopwatch:
+        node.insert_cells(context['csv_path'])
+    return stopwatch.seconds
+
+
+def case_open(context):
+    with _Stopwatch() as stopwatch:
+        Node(context['node_path'])
+    return stopwatch.seconds
+
+
+def case_get_hash(context):
+    node = Node(context['node_path'])
+    with node._connect() as connection:
+        cursor = connection.cursor()
+        with _Stopwatch() as stopwatch:
+            node._get_hash(cursor)
+    return stopwatch.seconds
+
+
+def case_select_cell(context):
+    node = Node(context['node_path'])
+    with _Stopwatch() as stopwatch:
+        for kwds in context['lookups']:
+            list(node.select_cell(**kwds))
+    return stopwatch.seconds
+
+
+def case_snapshot(context):
+    node = Node(context['node_path'])
+    with _Stopwatch() as stopwatch:
+        node.snapshot()
+    return stopwatch.seconds
+
+
+def case_snapshot_select(context):
+    snapshot = Node(context['node_path']).snapshot()
+    with _Stopwatch() as stopwatch:
+        for kwds in context['lookups']:
+            snapshot.select_cell(**kwds)
+    return stopwatch.seconds
+
+
+def case_descendants(context):
+    node = Node(context['node_path'])
+    parents = [dict(list(kwds.items())[:-1]) for kwds in context['lookups']]
+    with _Stopwatch() as stopwatch:
+        for kwds in parents:
+            node.descendants(**kwds)
+    return stopwatch.seconds
+
+
+def case_rollup(context):
+    node = Node(context['node_path'])
+    data = ((cell_id, 1) for cell_id in node.descendants())
+    with _Stopwatch() as stopwatch:
+        for _ in node.rollup(data, 'level1'):  # <- Second generated level.
+            pass
+    return stopwatch.seconds
+
+
+def case_export_cells(context):
+    path = os.path.join(context['workdir'], 'export.csv')
+    if os.path.exists(path):
+        os.remove(path)
+    node = Node(context['node_path'])
+    with _Stopwatch() as stopwatch:
+        node.export_cells(path)
+    return stopwatch.seconds
+
+
+def case_repr(context):
+    node = Node(context['node_path'])
+    with _Stopwatch() as stopwatch:
+        repr(node)
+    return stopwatch.seconds
+
+
+def _import_time(module):
+    """Return seconds to import `module` in a new interpreter (its
+    cumulative time as reported by "python -X importtime").
+
+    """
+    env = dict(os.environ)
+    env.pop('PYTHONDONTWRITEBYTECODE', None)  # <- Measure cached imports.
+    package_dir = os.path.dirname(os.path.dirname(os.path.abspath(gpn.__file__)))
+    env['PYTHONPATH'] = os.pathsep.join(
+        [package_dir] + [x for x in [env.get('PYTHONPATH')] if x])
+
+    command = [sys.executable, '-X', 'importtime', '-c', 'import ' + module]
+    process = subprocess.Popen(command, env=env, stdout=subprocess.PIPE,
+                               stderr=subprocess.PIPE)
+    output = process.communicate()[1].decode('utf-8')
+    assert process.returncode == 0, output
+    for line in output.splitlines():
+        # Format is "import time: <self> | <cumulative> | <name>"
+        # with nested imports indented below the top-level name.
+        if line.startswith('import time:') and line.endswith('| ' + module):
+            return int(line.split('|')[1]) / 1000000.0
+    raise ValueError('No import time reported for %r.' % module)
+
+
+def case_import(context):
+    return _import_time(context['module'])
+
+
+def case_graph_load(context):
+    with _Stopwatch() as stopwatch:
+        graph = Graph(context['graph_path'], catalog=False,
+                      workers=context['workers'])
+        graph.edges  # <- Reads every node's summary.
+    return stopwatch.seconds
+
+
+node_cases = [
+    ('insert_cells', case_insert_cells),
+    ('open', case_open),
+    ('_get_hash', case_get_hash),
+    ('select_cell', case_select_cell),
+    ('snapshot', case_snapshot),
+    ('snapshot_select', case_snapshot_select),
+    ('descendants', case_descendants),
+    ('rollup', case_rollup),
+    ('export_cells', case_export_cells),
+    ('__repr__', case_repr),
+]
+
+
+def _make_graph(path, nodes, cells, **kwds):
+    """Create folder of `nodes` node files (each with `cells` cells)
+    where each node has an edge from the previous node.
+
+    """
+    os.mkdir(path)
+    csv_path = os.path.join(path, 'cells.csv')
+    write_csv(csv_path, cells, **kwds)
+    previous = None
+    for index in range(nodes):
+        node = Node(os.path.join(path, 'node%05d.node' % index))
+        node.insert_cells(csv_path)
+        if previous:
+            _add_identity_edge(node, previous, cells)
+        previous = node
+    os.remove(csv_path)
+
+
+import_modules = ['gpn', 'gpn.node', 'gpn.graph', 'gpn.__main__']
+
+
+def _measure(case, context, repeat):
+    """Run `case` `repeat` times and return result dictionary with
+    all samples and their median (as "seconds").
+
+    """
+    samples = [case(context) for _ in range(repeat)]
+    ordered = sorted(samples)
+    middle = len(ordered) // 2
+    if len(ordered) % 2:
+        median = ordered[middle]
+    else:
+        median = (ordered[middle - 1] + ordered[middle]) / 2.0
+    return {'seconds': median, 'samples': samples}
+
+
+def _memory_note(result):
+    """Return peak memory summary for log messages."""
+    memory = result.get('memory')
+    if not memory:
+        return ''
+    parts = []
+    if memory['python_peak'] is not None:
+        parts.append('python peak %.1f MiB' % (memory['python_peak'] / 1048576.0))
+    if memory['sqlite_peak'] is not None:
+        parts.append('sqlite peak %.1f MiB'
+                     % (memory['sqlite_peak'] / 1048576.0))
+    return '  (%s)' % ', '.join(parts) if parts else ''
+
+
+def _environment():
+    return {'python': platform.python_version(),
+            'implementation': platform.python_implementation(),
+            'sqlite': sqlite3.sqlite_version,
+            'platform': platform.platform(),
+            'argv': sys.argv}
+
+
+def run(sizes=(1000, 10000, 100000), depth=None, fanout=10,
+        cardinality=None, unmapped=0.0, lookups=100, graph_nodes=50,
+        graph_cells=1000, workers=(1, 4, 16), seed=0, repeat=1, cases=None,
+        memory=False, memory_top=10, modules=None, log=None):
+    """Run all cases and return results dictionary (JSON-compatible).
+
+    Node cases are run once for each number of cells in `sizes` (see
+    gpn.benchmarks.generator.iter_rows() for the hierarchy arguments).
+    Graph load is run for a folder of `graph_nodes` nodes with each
+    number of `workers`.  The "import" case measures import time for
+    each of the `modules` (default: import_modules; requires Python
+    3.7 or newer).  Each case is run `repeat` times (see _measure()).
+    If given, only case names in `cases` are run and `log` is called
+    with a message as each case finishes.
+
+    If `memory` is True, each case is run once more with memory
+    profiling (see gpn.benchmarks.memory.profile_memory()) and node
+    cases also record the fixture's SQLite page and cache settings.
+    Import cases run in a separate process so memory is not profiled.
+
+    """
+    log = log or (lambda message: None)
+    if modules is None:
+        modules = import_modules
+    if cases and 'import' not in cases:
+        modules = []
+    elif sys.version_info < (3, 7):
+        modules = []  # <- The -X importtime option is new in 3.7.
+
+    results = []
+    for module in modules:
+        context = {'module': module}
+        case_import(context)  # <- Warm-up run writes bytecode cache.
+        result = {'case': 'import', 'module': module}
+        result.update(_measure(case_import, context, repeat))
+        results.append(result)
+        log('%-14s %16s  %.4fs' % ('import', module, result['seconds']))
+
+    workdir = tempfile.mkdtemp(prefix='gpn-benchmarks-')
+    try:
+        for cells in sizes:
+            kwds = {'depth': depth or _default_depth(cells, fanout),
+                    'fanout': fanout,
+                    'cardinality': cardinality,
+                    'unmapped': unmapped}
+            csv_path = os.path.join(workdir, 'cells.csv')
+            write_csv(csv_path, cells, seed=seed, **kwds)
+
+            node_path = os.path.join(workdir, 'fixture.node')
+            if os.path.exists(node_path):
+                os.remove(node_path)
+            Node(node_path).insert_cells(csv_path)
+
+            context = {'workdir': workdir,
+                       'csv_path': csv_path,
+                       'node_path': node_path,
+                       'lookups': _sample_lookups(lookups, cells, seed=seed,
+                                                  **kwds)}
+            for name, case in node_cases:
+                if cases and name not in cases:
+                    continue
+                result = {'case': name, 'cells': cells}
+                result.update(kwds)
+                result.update(_measure(case, context, repeat))
+                if memory:
+                    result['memory'] = profile_memory(case, context,
+                                                      memory_top)
+                    result['memory'].update(sqlite_settings(node_path))
+                results.append(result)
+                log('%-14s %10s cells  %.4fs%s' % (name, cells,
+                                                   result['seconds'],
+                                                   _memory_note(result)))
+
+        if graph_nodes and (not cases or 'graph_load' in cases):
+            graph_path = os.path.join(workdir, 'graph')
+            _make_graph(graph_path, graph_nodes, graph_cells, fanout=fanout,
+                        depth=_default_depth(graph_cells, fanout))
+            for count in workers:
+                context = {'graph_path': graph_path, 'workers': count}
+                result = {'case': 'graph_load', 'nodes': graph_nodes,
+                          'cells': graph_cells, 'workers': count}
+                result.update(_measure(case_graph_load, context, repeat))
+                if memory:
+                    result['memory'] = profile_memory(case_graph_load,
+                                                      context, memory_top)
+                results.append(result)
+                log('%-14s %10s nodes  %.4fs (%s workers)%s'
+                    % ('graph_load', graph_nodes, result['seconds'], count,
+                       _memory_note(result)))
+    finally:
+        shutil.rmtree(workdir)
+
+    return {'environment': _environment(), 'results': results}
@@ -0,0 +1,175 @@
+# -*- coding: utf-8 -*-
+import sqlite3
+
+from gpn.connector import _SharedConnection
+from gpn.connector import _register_types
+
+
+_cache_schema = [
+    """
+    CREATE TABLE IF NOT EXISTS translation (
+        translation_id INTEGER PRIMARY KEY,
+        translation_key TEXT UNIQUE NOT NULL,
+        last_used INTEGER NOT NULL
+    )
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS idx_Translation_LastUsed
+        ON translation (last_used)
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS translation_row (
+        translation_id INTEGER NOT NULL,
+        from_cell_id INTEGER NOT NULL,
+        to_cell_id INTEGER NOT NULL,
+        weight TEXTNUM,  /* <- Custom type for Python Decimals. */
+        FOREIGN KEY (translation_id) REFERENCES translation(translation_id)
+    )
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS idx_TranslationRow_TranslationId
+        ON translation_row (translation_id)
+    """,
+]
+
+
+class TranslationCache(object):
+    """Least-recently-used store of composed translations.
+
+    Entries are keyed by the ordered node hashes of a path (plus the
+    edge and weight names used and a version token for each node
+    holding an edge) so an entry stops matching as soon as any node or
+    edge on its path changes.  Stale entries are never looked up
+    again and are eventually evicted.
+
+    """
+    def __init__(self, path=None, maxsize=128):
+        """Open cache stored in `path` (created if it does not exist).
+        If `path` is omitted, the cache is kept in memory.
+
+        """
+        global _cache_schema
+        assert maxsize > 0, 'maxsize must be a positive integer.'
+        _register_types()
+        self.maxsize = maxsize
+        if path:
+            self._dbsrc = path
+        else:
+            self._dbsrc = sqlite3.connect(':memory:',
+                                          detect_types=sqlite3.PARSE_DECLTYPES,
+                                          factory=_SharedConnection)
+
+        with self._connect() as connection:
+            cursor = connection.cursor()
+            for operation in _cache_schema:
+                cursor.execute(operation)
+
+    def __del__(self):
+        try:
+            self._dbsrc.close_parent()  # Permanently close in-memory db!
+        except AttributeError:
+            pass
+
+    def _connect(self):
+        if isinstance(self._dbsrc, sqlite3.Connection):
+            return self._dbsrc
+        return sqlite3.connect(self._dbsrc,
+                               detect_types=sqlite3.PARSE_DECLTYPES)
+
+    @staticmethod
+    def make_key(hashes, edges=None, weight=None, versions=None):
+        """Return cache key for the given path of node hashes, the
+        edge names used for each step, the weight name, and the
+        versions of the nodes holding each step's edge.
+
+        """
+        hashes = list(hashes)
+        if edges is None:
+            edges = [None] * (len(hashes) - 1)
+        parts = ['%s' % x for x in hashes]
+        parts.append(','.join(str(x) for x in edges))
+        parts.append(str(weight))
+        if versions is not None:
+            parts.append(','.join(str(x) for x in versions))
+        return '|'.join(parts)
+
+    def get(self, key):
+        """Return list of (from_cell_id, to_cell_id, weight) rows for
+        `key` or None if key is not cached.
+
+        """
+        with self._connect() as connection:
+            cursor = connection.cursor()
+            cursor.execute('SELECT translation_id FROM translation '
+                           'WHERE translation_key=?', (key,))
+            found = cursor.fetchone()
+            if not found:
+                return None
+            translation_id = found[0]
+
+            cursor.execute("""
+                UPDATE translation
+                SET last_used=(SELECT MAX(last_used)+1 FROM translation)
+                WHERE translation_id=?
+            """, (translation_id,))
+
+            cursor.execute("""
+                SELECT from_cell_id, to_cell_id, weight
+                FROM translation_row
+                WHERE translation_id=?
+                ORDER BY from_cell_id, to_cell_id
+            """, (translation_id,))
+            return cursor.fetchall()
+
+    def put(self, key, rows):
+        """Store `rows` under `key` and evict least-recently-used
+        entries beyond `maxsize`.
+
+        """
+        with self._connect() as connection:
+            cursor = connection.cursor()
+            self._delete(cursor, 'translation_key=?', (key,))
+            cursor.execute("""
+                INSERT INTO translation (translation_key, last_used)
+                SELECT ?, COALESCE(MAX(last_used), 0)+1 FROM translation
+            """, (key,))
+            translation_id = cursor.lastrowid
+
+            operation = ('INSERT INTO translation_row '
+                         '(translation_id, from_cell_id, to_cell_id, weight) '
+                         'VALUES (?, ?, ?, ?)')
+            params = ((translation_id,) + tuple(row) for row in rows)
+            cursor.executemany(operation, params)
+
+            where = ('translation_id NOT IN (SELECT translation_id '
+                     '                       FROM translation '
+                     '                       ORDER BY last_used DESC '
+                     '                       LIMIT ?)')
+            self._delete(cursor, where, (self.maxsize,))
+
+    def __contains__(self, key):
+        with self._connect() as connection:
+            cursor = connection.cursor()
+            cursor.execute('SELECT 1 FROM translation WHERE translation_key=?',
+                           (key,))
+            return cursor.fetchone() is not None
+
+    def __len__(self):
+        with self._connect() as connection:
+            cursor = connection.cursor()
+            cursor.execute('SELECT COUNT(*) FROM translation')
+            return cursor.fetchone()[0]
+
+    def clear(self):
+        """Remove all cached entries."""
+        with self._connect() as connection:
+            cursor = connection.cursor()
+            cursor.execute('DELETE FROM translation_row')
+            cursor.execute('DELETE FROM translation')
+
+    @staticmethod
+    def _delete(cursor, where, params):
+        cursor.execute('DELETE FROM translation_row WHERE translation_id IN '
+                       '(SELECT translation_id FROM translation WHERE %s)' % where,
+                       params)
+        cursor.execute('DELETE FROM translation WHERE %s' % where, params)
@@ -0,0 +1,370 @@
+# -*- coding: utf-8 -*-
+import json
+import os
+import sqlite3
+import warnings
+try:
+    from concurrent import futures  # New in 3.2
+except ImportError:
+    futures = None
+
+from gpn.connector import _SharedConnection
+from gpn.node import Node
+from gpn.node import _normalize_label
+
+
+_catalog_schema = [
+    """
+    CREATE TABLE IF NOT EXISTS catalog_file (
+        filename TEXT PRIMARY KEY NOT NULL,
+        mtime REAL NOT NULL,
+        size INTEGER NOT NULL,
+        valid INTEGER DEFAULT 1 CHECK (valid IN (0, 1)),
+        node_hash TEXT,
+        hierarchy TEXT  /* <- JSON list of hierarchy values. */
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS catalog_edge (
+        filename TEXT NOT NULL,
+        other_node_hash TEXT NOT NULL,
+        other_node_name TEXT,
+        edge_name TEXT,
+        edge_order INTEGER,
+        statistics TEXT,  /* <- JSON object (see _read_summary()). */
+        FOREIGN KEY (filename) REFERENCES catalog_file(filename)
+    )
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS idx_CatalogEdge_Filename
+        ON catalog_edge (filename)
+    """,
+]
+
+
+class _Catalog(object):
+    """Summary of the node files in a graph directory (stored in a
+    SQLite file).  Each file's entry is refreshed only when its
+    modification time or size changes.
+
+    """
+    def __init__(self, path=None):
+        """Open catalog stored in `path` (created if it does not
+        exist).  If `path` is omitted, the catalog is kept in memory.
+
+        """
+        global _catalog_schema
+        if path:
+            self._dbsrc = path
+        else:
+            self._dbsrc = sqlite3.connect(':memory:',
+                                          check_same_thread=False,
+                                          factory=_SharedConnection)
+
+        with self._connect() as connection:
+            cursor = connection.cursor()
+            for operation in _catalog_schema:
+                cursor.execute(operation)
+
+    def __del__(self):
+        try:
+            self._dbsrc.close_parent()  # Permanently close in-memory db!
+        except AttributeError:
+            pass
+
+    def _connect(self):
+        if isinstance(self._dbsrc, sqlite3.Connection):
+            return self._dbsrc
+        return sqlite3.connect(self._dbsrc)
+
+    def sync(self, dirpath, filenames, workers=1, stats=None):
+        """Synchronize catalog with the given `filenames` (relative to
+        `dirpath`).
+
+        New or changed files are opened using a pool of `workers`
+        threads (opening a node is mostly file I/O and SQLite work
+        which release the GIL).  If given, `stats` is a dictionary of
+        filenames and os.stat() results to use instead of calling
+        os.stat() again.
+
+        """
+        filenames = set(filenames)
+        with self._connect() as connection:
+            cursor = connection.cursor()
+            cursor.execute('SELECT filename, mtime, size FROM catalog_file')
+            known = dict((x[0], (x[1], x[2])) for x in cursor.fetchall())
+
+            # Remove missing files.
+            for filename in set(known) - filenames:
+                self._delete(cursor, filename)
+
+            # Find new or changed files.
+            changed = []
+            for filename in sorted(filenames):
+                if stats and filename in stats:
+                    stat = stats[filename]
+                else:
+                    stat = os.stat(os.path.join(dirpath, filename))
+                if known.get(filename) != (stat.st_mtime, stat.st_size):
+                    changed.append((filename, stat))
+
+            # Read and insert summaries (in filename order).
+            paths = [os.path.join(dirpath, x[0]) for x in changed]
+            if workers > 1 and futures and len(paths) > 1:
+                with futures.ThreadPoolExecutor(max_workers=workers) as executor:
+                    results = list(executor.map(_load_summary, paths))
+            else:
+                results = [_load_summary(x) for x in paths]
+
+            for (filename, stat), summary in zip(changed, results):
+                if summary is None:
+                    warnings.warn('Skipping invalid node file %r.' % filename)
+                self._delete(cursor, filename)
+                self._insert(cursor, filename, stat, summary)
+
+    def summaries(self, filenames=None):
+        """Return dictionary of filenames and summaries for all valid
+        node files in catalog (or only those in `filenames`).
+
+        """
+        if filenames is None:
+            file_query = ('SELECT filename, node_hash, hierarchy '
+                          'FROM catalog_file WHERE valid=1')
+            edge_query = """
+                SELECT filename, other_node_hash, other_node_name,
+                       edge_name, edge_order, statistics
+                FROM catalog_edge
+                ORDER BY filename, other_node_hash, edge_order
+            """
+            params = [()]
+        else:
+            file_query = ('SELECT filename, node_hash, hierarchy '
+                          'FROM catalog_file WHERE valid=1 AND filename=?')
+            edge_query = """
+                SELECT filename, other_node_hash, other_node_name,
+                       edge_name, edge_order, statistics
+                FROM catalog_edge
+                WHERE filename=?
+                ORDER BY other_node_hash, edge_order
+            """
+            params = [(x,) for x in sorted(filenames)]
+
+        with self._connect() as connection:
+            cursor = connection.cursor()
+            summaries = {}
+            for param in params:
+                cursor.execute(file_query, param)
+                for filename, node_hash, hierarchy in cursor.fetchall():
+                    summaries[filename] = (node_hash, json.loads(hierarchy),
+                                           [])
+
+            for param in params:
+                cursor.execute(edge_query, param)
+                for row in cursor.fetchall():
+                    edge_row = row[1:5] + (json.loads(row[5]),)
+                    summaries[row[0]][2].append(edge_row)
+        return summaries
+
+    @staticmethod
+    def _delete(cursor, filename):
+        cursor.execute('DELETE FROM catalog_edge WHERE filename=?', (filename,))
+        cursor.execute('DELETE FROM catalog_file WHERE filename=?', (filename,))
+
+    @staticmethod
+    def _insert(cursor, filename, stat, summary):
+        if summary is None:
+            cursor.execute('INSERT INTO catalog_file (filename, mtime, size, '
+                           'valid) VALUES (?, ?, ?, 0)',
+                           (filename, stat.st_mtime, stat.st_size))
+            return
+
+        node_hash, hierarchy, edge_rows = summary
+        cursor.execute('INSERT INTO catalog_file (filename, mtime, size, '
+                       'node_hash, hierarchy) VALUES (?, ?, ?, ?, ?)',
+                       (filename, stat.st_mtime, stat.st_size, node_hash,
+                        json.dumps(hierarchy)))
+        operation = ('INSERT INTO catalog_edge (filename, other_node_hash, '
+                     'other_node_name, edge_name, edge_order, statistics) '
+                     'VALUES (?, ?, ?, ?, ?, ?)')
+        params = [(filename,) + tuple(row[:4]) + (json.dumps(row[4]),)
+                  for row in edge_rows]
+        cursor.executemany(operation, params)
+
+
+def _load_summary(path):
+    """Open node file and return its summary or None if the file is
+    not a valid node.
+
+    """
+    try:
+        node = Node(path)
+    except Exception:
+        return None
+    return _read_summary(node)
+
+
+def _read_summary(node):
+    """Return tuple of node hash, hierarchy list, and list of
+    (other_node_hash, other_node_name, edge_name, edge_order,
+    statistics) edge rows for given node.  Edge statistics are read
+    from the property table (see Node.update_edge_statistics()) and
+    are empty if not computed.
+
+    """
+    with node._connect() as connection:
+        cursor = connection.cursor()
+        cursor.execute('SELECT node_hash FROM node '
+                       'ORDER BY node_id DESC LIMIT 1')
+        found = cursor.fetchone()
+        node_hash = found[0] if found else None
+
+        cursor.execute('SELECT hierarchy_value FROM hierarchy '
+                       'ORDER BY hierarchy_level')
+        hierarchy = [x[0] for x in cursor.fetchall()]
+
+        cursor.execute("""
+            SELECT other_node_hash, other_node_name, edge_name, edge_order,
+                   property_val
+            FROM edge
+            LEFT JOIN property
+                ON property_key=('edge_statistics:' || edge_id)
+            ORDER BY other_node_hash, edge_order
+        """)
+        edge_rows = []
+        for row in cursor.fetchall():
+            statistics = json.loads(row[4]) if row[4] else {}
+            edge_rows.append(row[:4] + (statistics,))
+    return node_hash, hierarchy, edge_rows
+
+
+_label_index_schema = [
+    """
+    CREATE TABLE IF NOT EXISTS indexed_node (
+        node_name TEXT PRIMARY KEY NOT NULL,
+        node_hash TEXT
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS label_index (
+        normalized TEXT NOT NULL,
+        label_value TEXT NOT NULL,
+        node_name TEXT NOT NULL,
+        node_hash TEXT,
+        hierarchy_value TEXT NOT NULL,
+        label_id INTEGER NOT NULL,
+        FOREIGN KEY (node_name) REFERENCES indexed_node(node_name)
+    )
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS idx_LabelIndex_Normalized
+        ON label_index (normalized)
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS idx_LabelIndex_NodeName
+        ON label_index (node_name)
+    """,
+]
+
+
+class _LabelIndex(object):
+    """Inverted index of label values for the nodes of a graph (stored
+    in a SQLite file).  A node's entries are rebuilt only when its
+    node hash changes.
+
+    """
+    def __init__(self, path=None):
+        """Open index stored in `path` (created if it does not exist).
+        If `path` is omitted, the index is kept in memory.
+
+        """
+        global _label_index_schema
+        if path:
+            self._dbsrc = path
+        else:
+            self._dbsrc = sqlite3.connect(':memory:',
+                                          check_same_thread=False,
+                                          factory=_SharedConnection)
+
+        with self._connect() as connection:
+            cursor = connection.cursor()
+            for operation in _label_index_schema:
+                cursor.execute(operation)
+
+    def __del__(self):
+        try:
+            self._dbsrc.close_parent()  # Permanently close in-memory db!
+        except AttributeError:
+            pass
+
+    def _connect(self):
+        if isinstance(self._dbsrc, sqlite3.Connection):
+            return self._dbsrc
+        return sqlite3.connect(self._dbsrc)
+
+    def stale(self, node_hashes):
+        """Return sorted list of node names (from the `node_hashes`
+        dictionary) whose entries are missing or out of date.
+
+        """
+        with self._connect() as connection:
+            cursor = connection.cursor()
+            cursor.execute('SELECT node_name, node_hash FROM indexed_node')
+            indexed = dict(cursor.fetchall())
+        return sorted(name for name, node_hash in node_hashes.items()
+                      if name not in indexed or indexed[name] != node_hash)
+
+    def update(self, node_hashes, rows):
+        """Replace entries for the nodes in `node_hashes` with `rows` of
+        (node_name, label_value, hierarchy_value, label_id).
+
+        """
+        with self._connect() as connection:
+            cursor = connection.cursor()
+            for name, node_hash in node_hashes.items():
+                self._delete(cursor, name)
+                cursor.execute('INSERT INTO indexed_node (node_name, '
+                               'node_hash) VALUES (?, ?)', (name, node_hash))
+
+            operation = ('INSERT INTO label_index (normalized, label_value, '
+                         'node_name, node_hash, hierarchy_value, label_id) '
+                         'VALUES (?, ?, ?, ?, ?, ?)')
+            params = ((_normalize_label(value), value, name,
+                       node_hashes[name], hierarchy, label_id)
+                      for name, value, hierarchy, label_id in rows)
+            cursor.executemany(operation, params)
+
+    def remove(self, keep):
+        """Remove entries for all nodes whose names are not in `keep`."""
+        keep = set(keep)
+        with self._connect() as connection:
+            cursor = connection.cursor()
+            cursor.execute('SELECT node_name FROM indexed_node')
+            for name in [x[0] for x in cursor.fetchall()]:
+                if name not in keep:
+                    self._delete(cursor, name)
+
+    def find(self, value, normalize=True):
+        """Return list of (node_name, node_hash, hierarchy_value,
+        label_id, label_value) rows for labels matching `value`.
+
+        """
+        with self._connect() as connection:
+            cursor = connection.cursor()
+            where = 'normalized=?'
+            params = [_normalize_label(value)]
+            if not normalize:
+                where += ' AND label_value=?'  # <- Exact match only.
+                params.append(value)
+            cursor.execute("""
+                SELECT node_name, node_hash, hierarchy_value, label_id,
+                       label_value
+                FROM label_index
+                WHERE %s
+                ORDER BY node_name, hierarchy_value, label_id
+            """ % where, params)
+            return cursor.fetchall()
+
+    @staticmethod
+    def _delete(cursor, name):
+        cursor.execute('DELETE FROM label_index WHERE node_name=?', (name,))
+        cursor.execute('DELETE FROM indexed_node WHERE node_name=?', (name,))
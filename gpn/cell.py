@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+"""Compact cell rows (see Node.row_factory)."""
+try:
+    from collections.abc import Mapping  # New location in 3.3
+except ImportError:
+    from collections import Mapping
+
+
+if '__slots__' in Mapping.__dict__:
+    _MappingBase = Mapping
+else:
+    class _MappingBase(object):
+        """Mapping methods for Python 2 (its collections.Mapping has no
+        __slots__ so subclasses would still get a __dict__).
+
+        """
+        __slots__ = ()
+        get = Mapping.__dict__['get']
+        keys = Mapping.__dict__['keys']
+        items = Mapping.__dict__['items']
+        values = Mapping.__dict__['values']
+        iterkeys = Mapping.__dict__['iterkeys']
+        itervalues = Mapping.__dict__['itervalues']
+        iteritems = Mapping.__dict__['iteritems']
+        __eq__ = Mapping.__dict__['__eq__']
+        __ne__ = Mapping.__dict__['__ne__']
+        __hash__ = None
+
+    Mapping.register(_MappingBase)
+
+
+class CellHierarchy(object):
+    """Hierarchy values (in level order) shared by every Cell from the
+    same node query.
+
+    """
+    __slots__ = ('names', 'positions')
+
+    def __init__(self, names):
+        self.names = tuple(names)
+        self.positions = dict((name, i) for i, name in enumerate(self.names))
+
+    def __repr__(self):
+        return 'CellHierarchy(%r)' % (self.names,)
+
+
+class Cell(_MappingBase):
+    """Read-only mapping of hierarchy values to label values for one
+    cell.  Labels are kept in a tuple and the hierarchy (the mapping's
+    keys) is shared with other cells, so a Cell is much smaller than
+    the equivalent dict.  Cells compare equal to dicts with the same
+    items.
+
+    """
+    __slots__ = ('hierarchy', 'labels', 'cell_id')
+
+    def __init__(self, hierarchy, labels, cell_id=None):
+        assert len(labels) == len(hierarchy.names), 'Requires one label per level.'
+        self.hierarchy = hierarchy
+        self.labels = tuple(labels)
+        self.cell_id = cell_id
+
+    def __getitem__(self, key):
+        try:
+            return self.labels[self.hierarchy.positions[key]]
+        except (KeyError, TypeError):
+            raise KeyError(key)
+
+    def __iter__(self):
+        return iter(self.hierarchy.names)
+
+    def __len__(self):
+        return len(self.labels)
+
+    def __contains__(self, key):
+        try:
+            return key in self.hierarchy.positions
+        except TypeError:
+            return False
+
+    def __repr__(self):
+        items = ', '.join('%r: %r' % x for x in zip(self.hierarchy.names,
+                                                   self.labels))
+        return 'Cell(%r, {%s})' % (self.cell_id, items)
+
+    def __getstate__(self):
+        return (self.hierarchy.names, self.labels, self.cell_id)
+
+    def __setstate__(self, state):
+        names, labels, cell_id = state
+        self.hierarchy = CellHierarchy(names)
+        self.labels = labels
+        self.cell_id = cell_id
@@ -0,0 +1,30 @@
+# -*- coding: utf-8 -*-
+"""Client for the query daemon (see gpn.server).  Only needs the socket
+and json modules so short-lived processes start quickly.
+
+"""
+import json
+import socket
+
+
+def request(path, requests):
+    """Send `requests` (an iterable of dictionaries) to the server on
+    Unix domain socket `path` and yield response dictionaries.
+
+    """
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(path)
+        fh = sock.makefile('rwb')
+        try:
+            for item in requests:
+                fh.write((json.dumps(item) + '\n').encode('utf-8'))
+                fh.flush()
+                response = fh.readline()
+                if not response:
+                    raise IOError('Server closed connection.')
+                yield json.loads(response.decode('utf-8'))
+        finally:
+            fh.close()
+    finally:
+        sock.close()
@@ -1,10 +1,9 @@
 # -*- coding: utf-8 -*-
 import os
-import re
 import sqlite3
-import tempfile
 
-from decimal import Decimal
+# The re, tempfile, and decimal modules are only imported inside the
+# functions that need them.
 
 
 # Schema:
@@ -46,9 +45,22 @@ from decimal import Decimal
 #               +---------------+     +--------------------+
 
 
-# Register SQLite adapter/converter for Decimal type.
-sqlite3.register_adapter(Decimal, str)
-sqlite3.register_converter('TEXTNUM', lambda x: Decimal(x.decode('utf-8')))
+_types_registered = False
+
+
+def _register_types():
+    """Register SQLite adapter/converter for Decimal type (called
+    before connections are made rather than at import time).
+
+    """
+    global _types_registered
+    if not _types_registered:
+        from decimal import Decimal
+        sqlite3.register_adapter(Decimal, str)
+        sqlite3.register_converter('TEXTNUM',
+                                   lambda x: Decimal(x.decode('utf-8')))
+        _types_registered = True
+
 
 _invalid_root_hierarchy = """
     SELECT hierarchy_value AS invalid_root
@@ -104,222 +116,237 @@ _invalid_unmapped_levels = """
 """
 
 
-_schema = [
-    """
-    CREATE TABLE cell (
-       cell_id INTEGER PRIMARY KEY AUTOINCREMENT NOT NULL,
-        partial INTEGER DEFAULT 0 CHECK (partial IN (0, 1))
-    )
-    """,
-    """
-    CREATE TABLE hierarchy (
-        hierarchy_id INTEGER PRIMARY KEY AUTOINCREMENT NOT NULL,
-        hierarchy_value TEXT UNIQUE NOT NULL CHECK(hierarchy_value!='cell_id'
-                                                   AND hierarchy_value NOT LIKE '%.%'),
-        hierarchy_level INTEGER UNIQUE NOT NULL
-    )
-    """,
-    """
-    CREATE TABLE label (
-        label_id INTEGER DEFAULT NULL UNIQUE,
-        hierarchy_id INTEGER NOT NULL,
-        label_value TEXT,
-        FOREIGN KEY (hierarchy_id) REFERENCES hierarchy(hierarchy_id),
-        PRIMARY KEY (label_id, hierarchy_id),
-        UNIQUE (hierarchy_id, label_value)
-    )
-    """,
-    """
-    CREATE INDEX idx_Label_HierarchyId ON label (hierarchy_id);
-    """,
-    """
-    CREATE TRIGGER trg_AutoIncrementLabelId_InsertLabel AFTER INSERT ON label
-    BEGIN
-        UPDATE label
-        SET label_id = (SELECT MAX(COALESCE(label_id, 0))+1 FROM label)
-        WHERE label_id IS NULL;
-    END
-    """,
-    """
-    CREATE TRIGGER trg_CheckRootHierarchy_InsertLabel AFTER INSERT ON label
-    WHEN NEW.hierarchy_id=(SELECT hierarchy_id
-                           FROM hierarchy
-                           ORDER BY hierarchy_level
-                           LIMIT 1)
-         AND (%s) IS NOT NULL
-    BEGIN
-        SELECT RAISE(ABORT, 'CHECK constraint failed: label (root hierarchy cannot have multiple values)');
-    END
-    """ % _invalid_root_hierarchy,
-    """
-    CREATE TRIGGER trg_CheckRootHierarchy_UpdateLabel AFTER UPDATE ON label
-    WHEN NEW.hierarchy_id=(SELECT hierarchy_id
-                           FROM hierarchy
-                           ORDER BY hierarchy_level
-                           LIMIT 1)
-         AND (%s) IS NOT NULL
-    BEGIN
-        SELECT RAISE(ABORT, 'CHECK constraint failed: label (root hierarchy cannot have multiple values)');
-    END
-    """ % _invalid_root_hierarchy,
-    """
-    CREATE TRIGGER trg_CheckRootHierarchy_UpdateHierarchy AFTER UPDATE ON hierarchy
-    WHEN (%s) IS NOT NULL
-    BEGIN
-        SELECT RAISE(ABORT, 'CHECK constraint failed: label (root hierarchy cannot have multiple values)');
-    END
-    """ % _invalid_root_hierarchy,
-    """
-    CREATE TRIGGER trg_CheckRootHierarchy_DeleteHierarchy AFTER DELETE ON hierarchy
-    WHEN (%s) IS NOT NULL
-    BEGIN
-        SELECT RAISE(ABORT, 'CHECK constraint failed: label (root hierarchy cannot have multiple values)');
-    END
-    """ % _invalid_root_hierarchy,
-    """
-    CREATE TABLE cell_label (
-        cell_label_id INTEGER PRIMARY KEY,
-        cell_id INTEGER,
-        hierarchy_id INTEGER,
-        label_id INTEGER,
-        FOREIGN KEY (cell_id) REFERENCES cell(cell_id),
-        FOREIGN KEY (label_id, hierarchy_id) REFERENCES label(label_id, hierarchy_id),
-        UNIQUE (cell_id, hierarchy_id)
-    )
-    """,
-    """
-    CREATE INDEX idx_CellLabel_CellId ON cell_label (cell_id)
-    """,
-    """
-    CREATE INDEX idx_CellLabel_HierarchyId ON cell_label (hierarchy_id)
-    """,
-    """
-    CREATE INDEX idx_CellLabel_LabelId ON cell_label (label_id)
-    """,
-    """
-    CREATE TRIGGER trg_CheckUniqueLabels_InsertCellLabel AFTER INSERT ON cell_label
-    WHEN (%s)
-    BEGIN
-        SELECT RAISE(ABORT, 'CHECK constraint failed: cell_label (duplicate label set)');
-    END
-    """ % _duplicate_label_sets,
-    """
-    CREATE TRIGGER trg_CheckUniqueLabels_UpdateCellLabel AFTER UPDATE ON cell_label
-    WHEN (%s)
-    BEGIN
-        SELECT RAISE(ABORT, 'CHECK constraint failed: cell_label (duplicate label set)');
-    END
-    """ % _duplicate_label_sets,
-    """
-    CREATE TRIGGER trg_CheckUniqueLabels_DeleteCellLabel AFTER DELETE ON cell_label
-    WHEN (%s)
-    BEGIN
-        SELECT RAISE(ABORT, 'CHECK constraint failed: cell_label (duplicate label set)');
-    END
-    """ % _duplicate_label_sets,
-    """
-    CREATE TRIGGER trg_CheckUnmappedHierarchy_InsertCellLabel AFTER INSERT ON cell_label
-    WHEN (%s)
-    BEGIN
-        SELECT RAISE(ABORT, 'CHECK constraint failed: cell_label (invalid unmapped level)');
-    END
-    """ % _invalid_unmapped_levels,
-    """
-    CREATE TRIGGER trg_CheckUnmappedHierarchy_UpdateCellLabel AFTER UPDATE ON cell_label
-    WHEN (%s)
-    BEGIN
-        SELECT RAISE(ABORT, 'CHECK constraint failed: cell_label (invalid unmapped level)');
-    END
-    """ % _invalid_unmapped_levels,
-    """
-    CREATE TRIGGER trg_CheckUnmappedHierarchy_UpdateHierarchy AFTER UPDATE ON hierarchy
-    WHEN (%s)
-    BEGIN
-        SELECT RAISE(ABORT, 'CHECK constraint failed: cell_label (invalid unmapped level)');
-    END
-    """ % _invalid_unmapped_levels,
-    """
-    CREATE TABLE node (
-        node_id INTEGER PRIMARY KEY,
-        node_hash TEXT UNIQUE ON CONFLICT REPLACE NOT NULL,
-        created_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP NOT NULL
-    )
-    """,
-    """
-    CREATE TABLE edge (
-        edge_id INTEGER PRIMARY KEY AUTOINCREMENT NOT NULL,
-        edge_name TEXT DEFAULT 'unnamed' NOT NULL,
-        edge_description TEXT,
-        edge_order INTEGER DEFAULT NULL,
-        other_node_hash TEXT NOT NULL,
-        other_node_name TEXT,
-        UNIQUE (other_node_hash, edge_name),
-        UNIQUE (other_node_hash, edge_order)
-    )
-    """,
-    """
-    CREATE TRIGGER trg_AutoIncrementEdgeOrder_InsertEdge AFTER INSERT ON edge
-    BEGIN
-        UPDATE edge
-        SET edge_order = (SELECT MAX(COALESCE(edge_order, 0))+1
-                          FROM edge
-                          WHERE other_node_hash=NEW.other_node_hash)
-        WHERE edge_order IS NULL;
-    END
-    """,
-    """
-    CREATE TABLE weight (
-        weight_id INTEGER PRIMARY KEY,
-        edge_id INTEGER,
-        weight_name TEXT DEFAULT 'unnamed' NOT NULL,
-        weight_description TEXT,
-        weight_order INTEGER DEFAULT NULL,
-        proportional INTEGER DEFAULT 0 CHECK (proportional IN (0, 1)),
-        FOREIGN KEY (edge_id) REFERENCES edge(edge_id),
-        UNIQUE (edge_id, weight_name),
-        UNIQUE (edge_id, weight_order)
-    )
-    """,
-    """
-    CREATE TRIGGER trg_AutoIncrementWeightOrder_InsertEdge AFTER INSERT ON edge
-    BEGIN
-        UPDATE weight
-        SET weight_order = (SELECT MAX(COALESCE(weight_order, 0))+1
-                            FROM weight
-                            WHERE edge_id=NEW.edge_id)
-        WHERE weight_order IS NULL;
-    END
-    """,
-    """
-    CREATE TABLE relation (
-        relation_id INTEGER PRIMARY KEY,
-        edge_id INTEGER,
-        other_cell_id INTEGER NOT NULL,
-        cell_id INTEGER,
-        FOREIGN KEY (edge_id) REFERENCES edge(edge_id),
-        FOREIGN KEY (cell_id) REFERENCES cell(cell_id),
-        UNIQUE (edge_id, other_cell_id, cell_id)
-    )
-    """,
-    """
-    CREATE TABLE relation_weight (
-        relation_weight_id INTEGER PRIMARY KEY,
-        weight_id INTEGER,
-        relation_id INTEGER,
-        weight TEXTNUM,  /* <- Custom type for Python Decimals. */
-        FOREIGN KEY (weight_id) REFERENCES weight(weight_id),
-        FOREIGN KEY (relation_id) REFERENCES relation(relation_id)
-    )
-    """,
+_schema = None  # Built on first use (see _get_schema()).
+
+
+def _get_schema():
+    """Return list of CREATE statements for a new node (the trigger
+    templates are only formatted the first time this is called).
+
     """
-    CREATE TABLE property (
-        property_id INTEGER PRIMARY KEY,
-        property_key TEXT,
-        property_val TEXT,
-        created_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP NOT NULL
-    )
-    """,
-]
+    global _schema
+    if _schema is None:
+        _schema = _make_schema()
+    return _schema
+
+
+def _make_schema():
+    return [
+        """
+        CREATE TABLE cell (
+           cell_id INTEGER PRIMARY KEY AUTOINCREMENT NOT NULL,
+            partial INTEGER DEFAULT 0 CHECK (partial IN (0, 1))
+        )
+        """,
+        """
+        CREATE TABLE hierarchy (
+            hierarchy_id INTEGER PRIMARY KEY AUTOINCREMENT NOT NULL,
+            hierarchy_value TEXT UNIQUE NOT NULL CHECK(hierarchy_value!='cell_id'
+                                                       AND hierarchy_value NOT LIKE '%.%'),
+            hierarchy_level INTEGER UNIQUE NOT NULL
+        )
+        """,
+        """
+        CREATE TABLE label (
+            label_id INTEGER DEFAULT NULL UNIQUE,
+            hierarchy_id INTEGER NOT NULL,
+            label_value TEXT,
+            FOREIGN KEY (hierarchy_id) REFERENCES hierarchy(hierarchy_id),
+            PRIMARY KEY (label_id, hierarchy_id),
+            UNIQUE (hierarchy_id, label_value)
+        )
+        """,
+        """
+        CREATE INDEX idx_Label_HierarchyId ON label (hierarchy_id);
+        """,
+        """
+        CREATE TRIGGER trg_AutoIncrementLabelId_InsertLabel AFTER INSERT ON label
+        BEGIN
+            UPDATE label
+            SET label_id = (SELECT MAX(COALESCE(label_id, 0))+1 FROM label)
+            WHERE label_id IS NULL;
+        END
+        """,
+        """
+        CREATE TRIGGER trg_CheckRootHierarchy_InsertLabel AFTER INSERT ON label
+        WHEN NEW.hierarchy_id=(SELECT hierarchy_id
+                               FROM hierarchy
+                               ORDER BY hierarchy_level
+                               LIMIT 1)
+             AND (%s) IS NOT NULL
+        BEGIN
+            SELECT RAISE(ABORT, 'CHECK constraint failed: label (root hierarchy cannot have multiple values)');
+        END
+        """ % _invalid_root_hierarchy,
+        """
+        CREATE TRIGGER trg_CheckRootHierarchy_UpdateLabel AFTER UPDATE ON label
+        WHEN NEW.hierarchy_id=(SELECT hierarchy_id
+                               FROM hierarchy
+                               ORDER BY hierarchy_level
+                               LIMIT 1)
+             AND (%s) IS NOT NULL
+        BEGIN
+            SELECT RAISE(ABORT, 'CHECK constraint failed: label (root hierarchy cannot have multiple values)');
+        END
+        """ % _invalid_root_hierarchy,
+        """
+        CREATE TRIGGER trg_CheckRootHierarchy_UpdateHierarchy AFTER UPDATE ON hierarchy
+        WHEN (%s) IS NOT NULL
+        BEGIN
+            SELECT RAISE(ABORT, 'CHECK constraint failed: label (root hierarchy cannot have multiple values)');
+        END
+        """ % _invalid_root_hierarchy,
+        """
+        CREATE TRIGGER trg_CheckRootHierarchy_DeleteHierarchy AFTER DELETE ON hierarchy
+        WHEN (%s) IS NOT NULL
+        BEGIN
+            SELECT RAISE(ABORT, 'CHECK constraint failed: label (root hierarchy cannot have multiple values)');
+        END
+        """ % _invalid_root_hierarchy,
+        """
+        CREATE TABLE cell_label (
+            cell_label_id INTEGER PRIMARY KEY,
+            cell_id INTEGER,
+            hierarchy_id INTEGER,
+            label_id INTEGER,
+            FOREIGN KEY (cell_id) REFERENCES cell(cell_id),
+            FOREIGN KEY (label_id, hierarchy_id) REFERENCES label(label_id, hierarchy_id),
+            UNIQUE (cell_id, hierarchy_id)
+        )
+        """,
+        """
+        CREATE INDEX idx_CellLabel_CellId ON cell_label (cell_id)
+        """,
+        """
+        CREATE INDEX idx_CellLabel_HierarchyId ON cell_label (hierarchy_id)
+        """,
+        """
+        CREATE INDEX idx_CellLabel_LabelId ON cell_label (label_id)
+        """,
+        """
+        CREATE TRIGGER trg_CheckUniqueLabels_InsertCellLabel AFTER INSERT ON cell_label
+        WHEN (%s)
+        BEGIN
+            SELECT RAISE(ABORT, 'CHECK constraint failed: cell_label (duplicate label set)');
+        END
+        """ % _duplicate_label_sets,
+        """
+        CREATE TRIGGER trg_CheckUniqueLabels_UpdateCellLabel AFTER UPDATE ON cell_label
+        WHEN (%s)
+        BEGIN
+            SELECT RAISE(ABORT, 'CHECK constraint failed: cell_label (duplicate label set)');
+        END
+        """ % _duplicate_label_sets,
+        """
+        CREATE TRIGGER trg_CheckUniqueLabels_DeleteCellLabel AFTER DELETE ON cell_label
+        WHEN (%s)
+        BEGIN
+            SELECT RAISE(ABORT, 'CHECK constraint failed: cell_label (duplicate label set)');
+        END
+        """ % _duplicate_label_sets,
+        """
+        CREATE TRIGGER trg_CheckUnmappedHierarchy_InsertCellLabel AFTER INSERT ON cell_label
+        WHEN (%s)
+        BEGIN
+            SELECT RAISE(ABORT, 'CHECK constraint failed: cell_label (invalid unmapped level)');
+        END
+        """ % _invalid_unmapped_levels,
+        """
+        CREATE TRIGGER trg_CheckUnmappedHierarchy_UpdateCellLabel AFTER UPDATE ON cell_label
+        WHEN (%s)
+        BEGIN
+            SELECT RAISE(ABORT, 'CHECK constraint failed: cell_label (invalid unmapped level)');
+        END
+        """ % _invalid_unmapped_levels,
+        """
+        CREATE TRIGGER trg_CheckUnmappedHierarchy_UpdateHierarchy AFTER UPDATE ON hierarchy
+        WHEN (%s)
+        BEGIN
+            SELECT RAISE(ABORT, 'CHECK constraint failed: cell_label (invalid unmapped level)');
+        END
+        """ % _invalid_unmapped_levels,
+        """
+        CREATE TABLE node (
+            node_id INTEGER PRIMARY KEY,
+            node_hash TEXT UNIQUE ON CONFLICT REPLACE NOT NULL,
+            created_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP NOT NULL
+        )
+        """,
+        """
+        CREATE TABLE edge (
+            edge_id INTEGER PRIMARY KEY AUTOINCREMENT NOT NULL,
+            edge_name TEXT DEFAULT 'unnamed' NOT NULL,
+            edge_description TEXT,
+            edge_order INTEGER DEFAULT NULL,
+            other_node_hash TEXT NOT NULL,
+            other_node_name TEXT,
+            UNIQUE (other_node_hash, edge_name),
+            UNIQUE (other_node_hash, edge_order)
+        )
+        """,
+        """
+        CREATE TRIGGER trg_AutoIncrementEdgeOrder_InsertEdge AFTER INSERT ON edge
+        BEGIN
+            UPDATE edge
+            SET edge_order = (SELECT MAX(COALESCE(edge_order, 0))+1
+                              FROM edge
+                              WHERE other_node_hash=NEW.other_node_hash)
+            WHERE edge_order IS NULL;
+        END
+        """,
+        """
+        CREATE TABLE weight (
+            weight_id INTEGER PRIMARY KEY,
+            edge_id INTEGER,
+            weight_name TEXT DEFAULT 'unnamed' NOT NULL,
+            weight_description TEXT,
+            weight_order INTEGER DEFAULT NULL,
+            proportional INTEGER DEFAULT 0 CHECK (proportional IN (0, 1)),
+            FOREIGN KEY (edge_id) REFERENCES edge(edge_id),
+            UNIQUE (edge_id, weight_name),
+            UNIQUE (edge_id, weight_order)
+        )
+        """,
+        """
+        CREATE TRIGGER trg_AutoIncrementWeightOrder_InsertEdge AFTER INSERT ON edge
+        BEGIN
+            UPDATE weight
+            SET weight_order = (SELECT MAX(COALESCE(weight_order, 0))+1
+                                FROM weight
+                                WHERE edge_id=NEW.edge_id)
+            WHERE weight_order IS NULL;
+        END
+        """,
+        """
+        CREATE TABLE relation (
+            relation_id INTEGER PRIMARY KEY,
+            edge_id INTEGER,
+            other_cell_id INTEGER NOT NULL,
+            cell_id INTEGER,
+            FOREIGN KEY (edge_id) REFERENCES edge(edge_id),
+            FOREIGN KEY (cell_id) REFERENCES cell(cell_id),
+            UNIQUE (edge_id, other_cell_id, cell_id)
+        )
+        """,
+        """
+        CREATE TABLE relation_weight (
+            relation_weight_id INTEGER PRIMARY KEY,
+            weight_id INTEGER,
+            relation_id INTEGER,
+            weight TEXTNUM,  /* <- Custom type for Python Decimals. */
+            FOREIGN KEY (weight_id) REFERENCES weight(weight_id),
+            FOREIGN KEY (relation_id) REFERENCES relation(relation_id)
+        )
+        """,
+        """
+        CREATE TABLE property (
+            property_id INTEGER PRIMARY KEY,
+            property_key TEXT,
+            property_val TEXT,
+            created_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP NOT NULL
+        )
+        """,
+    ]
 
 
 def _get_schema_dict(sql_type=None):
@@ -328,17 +355,17 @@ def _get_schema_dict(sql_type=None):
     Value of `sql_type` can be TABLE, INDEX, or TRIGGER.  If ommitted,
     all types are returned.
     """
-    global _schema
+    import re
 
     if sql_type:
         msg = "sql_type must be 'TABLE', 'INDEX', 'TRIGGER', or None."
         assert sql_type in ('TABLE', 'INDEX', 'TRIGGER'), msg
     else:
         sql_type = '(?:TABLE|INDEX|TRIGGER)'
-    regex = re.compile('CREATE %s (\w+)' % sql_type)
+    regex = re.compile(r'CREATE %s (\w+)' % sql_type)
 
     sql_objects = {}
-    for operation in _schema:
+    for operation in _get_schema():
         match = regex.search(operation)
         if match:
             sql_objects[match.group(1)] = operation
@@ -354,6 +381,45 @@ _expensive_constraints = ['trg_CheckUniqueLabels_InsertCellLabel',
                           'trg_CheckUnmappedHierarchy_UpdateHierarchy']
 
 
+# Hierarchy index (see Node.descendants() and Node.ancestors()).  Each
+# hierarchy_prefix row is a path of label_ids from the root level down
+# to one level (e.g., '1/5/9') and cell_prefix maps every prefix of a
+# cell's labels to the cell.  The index is derived from cell_label and
+# is created when cells are inserted--nodes without it are still valid.
+# Its rows are only written by Node._update_hierarchy_index() so the
+# tables have no foreign keys (checking them slows indexing by a third).
+_hierarchy_index_tables = ['hierarchy_prefix', 'cell_prefix']
+
+_hierarchy_index_schema = [
+    """
+    CREATE TABLE IF NOT EXISTS hierarchy_prefix (
+        prefix_id INTEGER PRIMARY KEY,
+        prefix_path TEXT UNIQUE NOT NULL,
+        label_id INTEGER NOT NULL
+    )
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS idx_HierarchyPrefix_LabelId
+        ON hierarchy_prefix (label_id)
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS cell_prefix (
+        prefix_id INTEGER NOT NULL,
+        cell_id INTEGER NOT NULL,
+        PRIMARY KEY (prefix_id, cell_id)
+    )
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS idx_CellPrefix_CellId ON cell_prefix (cell_id)
+    """,
+]
+
+
+# Statement trace callback installed on new connections (set while
+# profiling--see gpn.__main__).  Requires set_trace_callback() (new
+# in 3.3).
+_trace_callback = None
+
 # Mode flags.
 IN_MEMORY = 1  #: Create a temporary node in RAM.
 TEMP_FILE = 2  #: Write a temporary node to disk instead of using RAM.
@@ -373,7 +439,7 @@ class _Connector(object):
         When using IN_MEMORY or TEMP_FILE modes, `filepath` is ignored.
 
         """
-        global _schema
+        _register_types()
         self._mode = mode
         self._init_as_temp = bool(TEMP_FILE & mode)
 
@@ -390,6 +456,7 @@ class _Connector(object):
             if filepath and (not mode):
                 self._dbsrc = filepath
             elif TEMP_FILE & mode:
+                import tempfile
                 fd, temp_path = tempfile.mkstemp(suffix='.node')
                 os.close(fd)
                 self._dbsrc = temp_path
@@ -405,7 +472,7 @@ class _Connector(object):
             with self._connect(self._dbsrc) as connection:
                 cursor = connection.cursor()
                 cursor.execute('PRAGMA synchronous=OFF')
-                for operation in _schema:
+                for operation in _get_schema():
                     cursor.execute(operation)
                 cursor.execute('PRAGMA synchronous=FULL')
 
@@ -426,6 +493,10 @@ class _Connector(object):
             sql_script = _all_foreign_key_triggers()
             cursor.executescript(sql_script)
 
+        # Install statement trace callback (used for profiling).
+        if _trace_callback and hasattr(connection, 'set_trace_callback'):
+            connection.set_trace_callback(_trace_callback)
+
         # Set to read-only if appropriate.
         if READ_ONLY & self._mode:
             if sqlite3.sqlite_version_info >= (3, 8, 0):
@@ -466,6 +537,7 @@ class _Connector(object):
                                'node', 'edge', 'weight',
                                'relation', 'relation_weight', 'property',
                                'sqlite_sequence'])
+        tables_contained.difference_update(_hierarchy_index_tables)
         return tables_required == tables_contained
 
 
@@ -1,45 +1,1287 @@
 # -*- coding: utf-8 -*-
+import bisect
+import collections
+import heapq
+import itertools
 import os
-import pprint
+import sqlite3
+import threading
 import warnings
+try:
+    from collections.abc import Mapping  # New location in 3.3
+except ImportError:
+    from collections import Mapping
 
+from gpn.cache import TranslationCache
+from gpn.catalog import _Catalog
+from gpn.catalog import _LabelIndex
+from gpn.catalog import _read_summary
+from gpn.connector import _register_types
 from gpn.node import Node
+from gpn.store import NodeStore
 
 suffix = '.node'
 suffix_default = '.node-default'
+cache_name = '.gpn-cache'
+catalog_name = '.gpn-catalog'
+label_index_name = '.gpn-labels'
+
+# Edge stored in `to_node` that relates the cells of `from_node` to its
+# own cells (i.e., other_node_hash identifies `from_node`).
+Edge = collections.namedtuple('Edge', ['from_node', 'to_node',
+                                       'edge_name', 'edge_order'])
+
+# Attributes set by Graph._build_adjacency() on first use.
+_adjacency_attrs = ['edges', '_unresolved', '_adjacency', '_edge_statistics',
+                    '_hash_index', '_node_hashes', '_hierarchies',
+                    '_node_edges', '_components',
+                    '_component', '_reach', '_reached_by']
+
+
+def _scan_dir(path):
+    """Return lists of file names and sub-folder names in `path`
+    (hidden sub-folders are skipped).
+
+    """
+    try:
+        entries = list(os.scandir(path))
+    except AttributeError:
+        # Before 3.5, os.scandir() not available.
+        names = os.listdir(path)
+        folders = [x for x in names if os.path.isdir(os.path.join(path, x))]
+        filenames = [x for x in names if x not in folders]
+    else:
+        filenames = [x.name for x in entries if x.is_file()]
+        folders = [x.name for x in entries if x.is_dir()]
+    folders = [x for x in folders if not x.startswith('.')]
+    return sorted(filenames), sorted(folders)
+
+
+def _scan_names(path, depth=0, prefix=''):
+    """Return dictionary of node names and file names for the node
+    files in `path` (without opening them).  When both exist, a
+    `suffix` file takes precedence over a `suffix_default` file.
+
+    Sub-folders are searched up to `depth` levels deep (None for no
+    limit).  Their nodes are named using a '/'-separated relative path
+    (e.g., 'subfolder/nodename').
+
+    """
+    global suffix
+    global suffix_default
+    filenames, folders = _scan_dir(path)
+
+    names = {}
+    for filename in filenames:
+        if filename.endswith(suffix_default):
+            name = prefix + filename[:-len(suffix_default)]
+            names.setdefault(name, os.path.join(prefix, filename))
+        elif filename.endswith(suffix):
+            name = prefix + filename[:-len(suffix)]
+            names[name] = os.path.join(prefix, filename)
+
+    if depth is None or depth > 0:
+        next_depth = None if depth is None else depth - 1
+        for folder in folders:
+            names.update(_scan_names(os.path.join(path, folder), next_depth,
+                                     prefix + folder + '/'))
+    return names
+
+
+def _scan_folders(path, depth=None, prefix=''):
+    """Return sorted list of '/'-separated sub-folder paths in `path`
+    that are no more than `depth` levels deep (None for no limit).
+
+    """
+    if depth is not None and depth < 1:
+        return []
+    next_depth = None if depth is None else depth - 1
+    found = []
+    for folder in _scan_dir(path)[1]:
+        found.append(prefix + folder)
+        found.extend(_scan_folders(os.path.join(path, folder), next_depth,
+                                   prefix + folder + '/'))
+    return found
+
+
+class _NodeMap(Mapping):
+    """Read-only mapping of node names to Node objects for the node
+    files in a directory.  Nodes are opened on first access and at most
+    `maxsize` opened nodes are kept (least recently used are dropped).
+
+    Node summaries (hash, hierarchy, and edges) are kept in a catalog
+    file so that only new or changed files need to be opened.  If
+    `catalog` is False, the catalog is kept in memory instead.  Files
+    that need to be read are opened by a pool of `workers` threads.
+    Node lookups and refresh() may be called from different threads
+    (see Graph.start_polling()).
+
+    """
+    def __init__(self, path, maxsize=128, catalog=True, workers=1, depth=0):
+        global catalog_name
+        assert maxsize > 0, 'maxsize must be a positive integer.'
+        self.path = path
+        self.maxsize = maxsize
+        self.workers = workers
+        self.depth = depth
+        self._filenames = _scan_names(path, depth)
+        self._stats = self._stat_files()
+        self._open = collections.OrderedDict()
+        self._lock = threading.RLock()  # <- Guards file lists and _open.
+        if catalog:
+            self._catalog = _Catalog(os.path.join(path, catalog_name))
+        else:
+            self._catalog = _Catalog()
+
+    def summaries(self, names=None):
+        """Return dictionary of node names and summaries (see
+        _read_summary()) for all valid nodes (or only those in
+        `names`).
+
+        """
+        with self._lock:
+            filenames = self._filenames
+            self._catalog.sync(self.path, filenames.values(),
+                               workers=self.workers, stats=self._stats)
+            selected = None if names is None else [filenames[x] for x in names]
+            by_filename = self._catalog.summaries(selected)
+        names = dict((v, k) for k, v in filenames.items())
+        return dict((names[k], v) for k, v in by_filename.items())
+
+    def _stat_files(self):
+        stats = {}
+        for filename in self._filenames.values():
+            stats[filename] = os.stat(os.path.join(self.path, filename))
+        return stats
+
+    def refresh(self):
+        """Rescan directory and return sets of added, removed, and
+        changed node names (compared by modification time and size).
+        Opened nodes for removed or changed files are dropped.
+
+        """
+        def signature(stat):
+            return (stat.st_mtime, stat.st_size)
+
+        filenames = _scan_names(self.path, self.depth)
+        with self._lock:
+            old_filenames, old_stats = self._filenames, self._stats
+            self._filenames = filenames
+            self._stats = self._stat_files()
+
+            old_names = set(old_filenames)
+            new_names = set(self._filenames)
+            changed = set()
+            for name in old_names & new_names:
+                old_file = old_filenames[name]
+                new_file = self._filenames[name]
+                if (old_file != new_file
+                        or signature(old_stats[old_file])
+                           != signature(self._stats[new_file])):
+                    changed.add(name)
+            added = new_names - old_names
+            removed = old_names - new_names
+
+            for name in removed | changed:
+                self._open.pop(name, None)
+        return added, removed, changed
+
+    def __getitem__(self, name):
+        with self._lock:
+            try:
+                node = self._open.pop(name)
+            except KeyError:
+                filename = self._filenames[name]  # <- KeyError if missing.
+                node = Node(os.path.join(self.path, filename))
+                node.name = name  # <- Not the file path (see Node.__init__()).
+            self._open[name] = node  # Most recently used is last.
+            while len(self._open) > self.maxsize:
+                self._open.popitem(last=False)
+        return node
+
+    def __contains__(self, name):
+        return name in self._filenames
+
+    def __iter__(self):
+        return iter(sorted(self._filenames))
+
+    def __len__(self):
+        return len(self._filenames)
 
 
 class Graph(object):
-    def __init__(self, path=None, nodes=None):
-        global suffix
-        global suffix_default
+    def __init__(self, path=None, nodes=None, cache_size=128, max_open=128,
+                 catalog=True, workers=1, depth=0):
+        """Load graph from node files in `path` (defaults to cwd) or
+        from a collection of `nodes`.  Node files in sub-folders are
+        included up to `depth` levels deep (None for no limit).  If
+        `path` is a file, it is opened as a single-file NodeStore (an
+        error is raised if the file is not a store).
+
+        """
         assert not path or not nodes, ('Cannot specify both path and nodes.')
 
-        # Get nodes.
+        # Get nodes (files are not opened until used).
         if not nodes:
             if not path:
                 path = os.getcwd()  # Default to cwd.
-
-            def is_node(x):
-                return x.endswith(suffix) or x.endswith(suffix_default)
-            nodes = [Node(x) for x in os.listdir(path) if is_node(x)]
-
+            if os.path.isfile(path):
+                self.nodes = NodeStore(path, maxsize=max_open)
+            else:
+                self.nodes = _NodeMap(path, maxsize=max_open, catalog=catalog,
+                                      workers=workers, depth=depth)
             self.path = path
 
         else:
+            # Set nodes.
+            def node_item(p):
+                assert isinstance(p, Node), '%r is not a Node.' % p
+                if p.name:
+                    key = p.name
+                else:
+                    node_hash = p.get_hash()
+                    assert node_hash, 'Node is unnamed and has no cells.'
+                    key = node_hash[:12]
+                    warnings.warn("Node is unnamed--using "
+                                  "short hash '%s'." % key)
+                return (key, p)
+            self.nodes = dict(node_item(p) for p in nodes)
             self.path = '<from collection>'
 
-        # Set nodes.
-        def node_item(p):
-            assert isinstance(p, Node), '%r is not a Node.' % p
-            if p.name:
-                key = p.name
+        # Edges are loaded on first use (see __getattr__()).
+
+        self.cache_size = cache_size
+        self._cache = None  # Opened on first use (see _get_cache()).
+
+        self.depth = depth
+        self._lock = threading.RLock()
+        self._poller = None
+        self._options = {'cache_size': cache_size, 'max_open': max_open,
+                         'catalog': catalog, 'workers': workers}
+        self._subgraphs = {}
+        self._label_index = None  # Opened on first use.
+
+    def component_names(self):
+        """Return sorted list of sub-folder components (as '/'-separated
+        paths relative to the graph directory).
+
+        """
+        if not isinstance(self.nodes, _NodeMap):
+            return []
+        return _scan_folders(self.path)
+
+    def component(self, name):
+        """Return Graph for the sub-folder component `name`.  The
+        component is loaded independently (and only when requested)
+        so other parts of the directory are not touched.
+
+        """
+        assert isinstance(self.nodes, _NodeMap), 'Graph has no directory.'
+        if name not in self._subgraphs:
+            path = os.path.join(self.path, *name.split('/'))
+            assert os.path.isdir(path), '%r is not a component.' % name
+            self._subgraphs[name] = Graph(path, **self._options)
+        return self._subgraphs[name]
+
+    def get_hash(self):
+        """Return a hash to identify the graph (computed from its node
+        names and node hashes).  Node hashes are the stored hashes read
+        with each node's edges (as of the last refresh)--for directory
+        and store graphs, they come from the catalog or store so no
+        nodes are opened.
+
+        """
+        node_hashes = self._node_hashes
+
+        import hashlib  # <- Imported here to keep "import gpn.graph" fast.
+        sha256 = hashlib.sha256()
+        for name, node_hash in sorted(node_hashes.items()):
+            sha256.update(('%s\0%s\0' % (name, node_hash)).encode('utf-8'))
+        return sha256.hexdigest()
+
+    def __getattr__(self, name):
+        global _adjacency_attrs
+        if name in _adjacency_attrs:
+            with self._lock:
+                if name not in self.__dict__:
+                    self._build_adjacency()
+            return self.__dict__[name]
+        raise AttributeError('%r object has no attribute %r'
+                             % (self.__class__.__name__, name))
+
+    def refresh(self):
+        """Check node files for changes and return sets of added,
+        removed, and changed node names.  Only new or changed files are
+        reopened.  If edges have already been loaded, they are updated
+        for the changed nodes only (see _apply_changes()).  Loaded
+        sub-folder components are refreshed too (components whose
+        folders were removed are dropped).  The translation cache needs
+        no update (it is keyed by node hash and version).
+
+        """
+        assert isinstance(self.nodes, _NodeMap), 'Graph has no directory.'
+        with self._lock:
+            added, removed, changed = self.nodes.refresh()
+            if (added or removed or changed) and 'edges' in self.__dict__:
+                self._apply_changes(added, removed, changed)
+
+            for name, subgraph in list(self._subgraphs.items()):
+                if os.path.isdir(subgraph.path):
+                    subgraph.refresh()
+                else:
+                    del self._subgraphs[name]
+        return added, removed, changed
+
+    def start_polling(self, interval=5.0, callback=None):
+        """Call refresh() every `interval` seconds in a background
+        thread.  If given, `callback` is called with the sets of added,
+        removed, and changed names whenever changes are found.
+
+        """
+        assert self._poller is None, 'Graph is already polling.'
+        stop = threading.Event()
+
+        def poll():
+            while not stop.wait(interval):
+                changes = self.refresh()
+                if callback and any(changes):
+                    callback(*changes)
+
+        thread = threading.Thread(target=poll)
+        thread.daemon = True
+        thread.start()
+        self._poller = (thread, stop)
+
+    def stop_polling(self):
+        """Stop background polling started with start_polling()."""
+        if self._poller:
+            thread, stop = self._poller
+            stop.set()
+            thread.join()
+            self._poller = None
+
+    def _build_adjacency(self):
+        """Read every node's edge table once and resolve each
+        other_node_hash to a node name using an in-memory hash index.
+        For directory graphs, edges are read from the catalog (see
+        _NodeMap) so unchanged node files are not opened.  For store
+        graphs, edges are read with a few store-wide queries.
+
+        """
+        if isinstance(self.nodes, (_NodeMap, NodeStore)):
+            summaries = self.nodes.summaries()
+        else:
+            summaries = dict((name, _read_summary(node))
+                             for name, node in self.nodes.items())
+
+        node_edges = {}
+        hash_index = {}
+        node_hashes = {}
+        hierarchies = {}
+        for name, (node_hash, hierarchy, edge_rows) in sorted(summaries.items()):
+            node_edges[name] = edge_rows
+            node_hashes[name] = node_hash
+            hierarchies[name] = hierarchy
+            if node_hash:
+                hash_index.setdefault(node_hash, name)  # First name wins.
+
+        edges = []
+        unresolved = []  # Edges referring to nodes not in graph.
+        adjacency = dict((name, []) for name in self.nodes)
+        edge_statistics = {}
+        for name, edge_rows in node_edges.items():
+            resolved, missing = _resolve_edges(name, edge_rows, hash_index)
+            for edge, stats in resolved:
+                edges.append(edge)
+                adjacency[edge.from_node].append(edge)
+                edge_statistics[edge] = stats
+            unresolved.extend(missing)
+        edges.sort()
+
+        # Replace all attributes at once (other threads may be reading).
+        state = _reachability(adjacency)
+        state.update({'edges': edges,
+                      '_unresolved': unresolved,
+                      '_adjacency': adjacency,
+                      '_edge_statistics': edge_statistics,
+                      '_hash_index': hash_index,
+                      '_node_hashes': node_hashes,
+                      '_hierarchies': hierarchies,
+                      '_node_edges': node_edges})
+        self.__dict__.update(state)
+
+    def _apply_changes(self, added, removed, changed):
+        """Update adjacency attributes for the given sets of added,
+        removed, and changed node names.  Only the summaries of added
+        and changed nodes are read, and only the edges stored in those
+        nodes (or in nodes whose edges refer to their old or new
+        hashes) are resolved again.  New edges update the reachability
+        index with _add_edge()--it is only rebuilt when nodes or edges
+        are removed.  Updated attributes replace the old ones at once
+        (other threads may be reading).
+
+        """
+        global _adjacency_attrs
+        state = dict((x, self.__dict__[x]) for x in _adjacency_attrs)
+        for attr in ['_adjacency', '_edge_statistics', '_hash_index',
+                     '_node_hashes', '_hierarchies', '_node_edges']:
+            state[attr] = dict(state[attr])
+        adjacency = state['_adjacency']
+        edge_statistics = state['_edge_statistics']
+        hash_index = state['_hash_index']
+        node_hashes = state['_node_hashes']
+        node_edges = state['_node_edges']
+
+        summaries = self.nodes.summaries(added | changed)
+        dropped = removed | changed
+        affected = set(node_hashes[x] for x in dropped if node_hashes.get(x))
+        affected.update(x[0] for x in summaries.values() if x[0])
+
+        # Get nodes whose stored edges refer to an affected hash.
+        referrers = set()
+        for node_hash in affected:
+            if node_hash in hash_index:
+                owner = hash_index[node_hash]
+                referrers.update(edge.to_node for edge in adjacency[owner])
+        referrers.update(x[0] for x in state['_unresolved'] if x[1] in affected)
+        referrers -= dropped
+
+        # Remove edges stored in affected nodes.
+        old_edges = set()
+        for name in dropped | referrers:
+            resolved, _ = _resolve_edges(name, node_edges.get(name, []),
+                                         hash_index)
+            old_edges.update(edge for edge, _ in resolved)
+        for edge in old_edges:
+            adjacency[edge.from_node] = [x for x in adjacency[edge.from_node]
+                                         if x != edge]
+            edge_statistics.pop(edge, None)
+        state['edges'] = [x for x in state['edges'] if x not in old_edges]
+        state['_unresolved'] = [x for x in state['_unresolved']
+                                if x[0] not in dropped | referrers]
+
+        # Replace node summaries and re-index affected hashes.
+        for name in dropped:
+            for attr in ['_node_hashes', '_hierarchies', '_node_edges']:
+                state[attr].pop(name, None)
+        for name in removed:
+            del adjacency[name]  # <- Its edges were stored in referrers.
+        for name in added:
+            adjacency[name] = []
+        for name, (node_hash, hierarchy, edge_rows) in summaries.items():
+            node_hashes[name] = node_hash
+            state['_hierarchies'][name] = hierarchy
+            node_edges[name] = edge_rows
+        for node_hash in affected:
+            hash_index.pop(node_hash, None)
+        for name in sorted(x for x in node_hashes if node_hashes[x] in affected):
+            hash_index.setdefault(node_hashes[name], name)  # First name wins.
+
+        # Resolve edges stored in added, changed, and referring nodes.
+        new_edges = {}
+        for name in (added | changed | referrers):
+            resolved, missing = _resolve_edges(name, node_edges.get(name, []),
+                                               hash_index)
+            new_edges.update(resolved)
+            state['_unresolved'].extend(missing)
+
+        if removed or old_edges - set(new_edges):
+            for edge in sorted(new_edges):
+                bisect.insort(state['edges'], edge)
+                adjacency[edge.from_node] = adjacency[edge.from_node] + [edge]
+                edge_statistics[edge] = new_edges[edge]
+            state.update(_reachability(adjacency))
+        else:
+            # Add new nodes as components of their own.
+            components = state['_components'] = list(state['_components'])
+            component = state['_component'] = dict(state['_component'])
+            state['_reach'] = list(state['_reach'])
+            state['_reached_by'] = list(state['_reached_by'])
+            for name in sorted(added):
+                component[name] = len(components)
+                components.append([name])
+                state['_reach'].append(1 << component[name])
+                state['_reached_by'].append(1 << component[name])
+
+            # Restore surviving edges before adding new ones so a
+            # rebuild triggered by a cycle sees the whole adjacency.
+            kept = sorted(x for x in new_edges if x in old_edges)
+            for edge in kept:
+                _add_edge(state, edge, new_edges[edge], reachable=True)
+            for edge in sorted(x for x in new_edges if x not in old_edges):
+                _add_edge(state, edge, new_edges[edge])
+        self.__dict__.update(state)
+
+    def strongly_connected_components(self):
+        """Return list of strongly connected components (each a sorted
+        list of node names).
+
+        """
+        return [sorted(x) for x in self._components]
+
+    def is_strongly_connected(self):
+        """Return True if every node can reach every other node."""
+        return len(self._components) <= 1
+
+    def is_reachable(self, from_node, to_node):
+        """Return True if a path exists from `from_node` to `to_node`."""
+        from_comp = self._component[from_node]
+        to_comp = self._component[to_node]
+        return bool(self._reach[from_comp] & (1 << to_comp))
+
+    def reachable_from(self, name):
+        """Return sorted list of nodes that `name` can be translated
+        into (including itself).
+
+        """
+        bits = self._reach[self._component[name]]
+        return self._members(bits)
+
+    def can_reach(self, name):
+        """Return sorted list of nodes that can be retabulated into
+        `name` (including itself).
+
+        """
+        bits = self._reached_by[self._component[name]]
+        return self._members(bits)
+
+    def _members(self, bits):
+        members = []
+        for comp in _iter_bits(bits):
+            members.extend(self._components[comp])
+        return sorted(members)
+
+    def hierarchy(self, name):
+        """Return list of hierarchy values for node `name`."""
+        return list(self._hierarchies.get(name, []))
+
+    def successors(self, name):
+        """Return sorted list of node names reachable from `name` by
+        a single edge.
+
+        """
+        return sorted(set(edge.to_node for edge in self._adjacency[name]))
+
+    def find_path(self, from_node, to_node, cost=None):
+        """Return list of node names for the least costly path from
+        `from_node` to `to_node` or None if no path exists.
+
+        If `cost` is omitted, the path with the fewest edges is
+        returned.  Otherwise, `cost` may be the name of an edge
+        statistic (see Node.update_edge_statistics())--each edge then
+        costs one plus the value of that statistic--or a function
+        that accepts an Edge and its statistics dictionary and returns
+        a non-negative number.  Edges without stored statistics are
+        given empty dictionaries.
+
+        """
+        edges = self._find_edges(from_node, to_node, cost)
+        if edges is None:
+            return None
+        return [from_node] + [edge.to_node for edge in edges]
+
+    def _find_edges(self, from_node, to_node, cost=None):
+        """Return list of Edges on the least costly path (Dijkstra's
+        algorithm) or None if no path exists.
+
+        """
+        assert from_node in self.nodes, '%r is not in graph.' % from_node
+        assert to_node in self.nodes, '%r is not in graph.' % to_node
+
+        if cost is None:
+            cost_func = lambda edge, stats: 1
+        elif hasattr(cost, '__call__'):
+            cost_func = cost
+        else:
+            cost_func = lambda edge, stats: 1 + stats.get(cost, 0)
+
+        distance = {from_node: 0}
+        previous = {}
+        visited = set()
+        heap = [(0, from_node)]
+        while heap:
+            dist, name = heapq.heappop(heap)
+            if name in visited:
+                continue
+            visited.add(name)
+            if name == to_node:
+                edges = []
+                while name != from_node:
+                    edge = previous[name]
+                    edges.append(edge)
+                    name = edge.from_node
+                return list(reversed(edges))
+
+            for edge in sorted(self._adjacency[name]):
+                value = cost_func(edge, self._edge_statistics[edge])
+                assert value >= 0, 'Cost must not be negative.'
+                other_dist = dist + value
+                if other_dist < distance.get(edge.to_node, other_dist + 1):
+                    distance[edge.to_node] = other_dist
+                    previous[edge.to_node] = edge
+                    heapq.heappush(heap, (other_dist, edge.to_node))
+        return None
+
+    def connected_components(self):
+        """Return list of weakly connected components (each a sorted
+        list of node names), largest first.
+
+        """
+        neighbors = dict((name, set()) for name in self.nodes)
+        for edge in self.edges:
+            neighbors[edge.from_node].add(edge.to_node)
+            neighbors[edge.to_node].add(edge.from_node)
+
+        components = []
+        unvisited = set(self.nodes)
+        while unvisited:
+            start = min(unvisited)
+            stack = [start]
+            unvisited.discard(start)
+            component = []
+            while stack:
+                name = stack.pop()
+                component.append(name)
+                for other in neighbors[name]:
+                    if other in unvisited:
+                        unvisited.discard(other)
+                        stack.append(other)
+            components.append(sorted(component))
+        components.sort(key=lambda x: (-len(x), x))
+        return components
+
+    def query(self, operation, parameters=(), names=None):
+        """Run `operation` against every node and yield result rows
+        with the node name as the first column.  Table names in the
+        operation must be qualified with a `{schema}` placeholder:
+
+            graph.query('SELECT label_value FROM {schema}.label '
+                        'WHERE label_value LIKE ?', ['New %'])
+
+        Node files are ATTACHed to a single connection in batches (no
+        larger than SQLite's attached-database limit) and queried with
+        one UNION ALL statement per batch.  For store graphs, the
+        store's tables are queried directly (see NodeStore.query()).
+        In-memory nodes are queried individually.  If `names` is given,
+        only those nodes are used; otherwise, all valid nodes are
+        queried.
+
+        """
+        parameters = list(parameters)
+        if names is None:
+            names = sorted(self._hierarchies)  # Valid nodes only.
+
+        if isinstance(self.nodes, NodeStore):
+            for row in self.nodes.query(operation, parameters, names):
+                yield row
+            return
+
+        files = []
+        for name in names:
+            path = self._node_path(name)
+            if path:
+                files.append((name, path))
+            else:
+                node = self.nodes[name]
+                with node._connect() as connection:
+                    cursor = connection.cursor()
+                    sql = operation.format(schema='main')
+                    for row in cursor.execute(sql, parameters):
+                        yield (name,) + tuple(row)
+
+        if not files:
+            return
+
+        _register_types()  # <- Attached nodes may have TEXTNUM columns.
+        connection = sqlite3.connect(':memory:',
+                                     detect_types=sqlite3.PARSE_DECLTYPES)
+        try:
+            cursor = connection.cursor()
+            if sqlite3.sqlite_version_info >= (3, 8, 0):
+                cursor.execute('PRAGMA query_only=1')
+            batch_size = _max_attached(connection)
+            for start in range(0, len(files), batch_size):
+                batch = files[start:start + batch_size]
+                aliases = ['node%s' % i for i in range(len(batch))]
+                for alias, (name, path) in zip(aliases, batch):
+                    cursor.execute('ATTACH DATABASE ? AS %s' % alias, (path,))
+
+                selects = []
+                params = []
+                for alias, (name, path) in zip(aliases, batch):
+                    sql = operation.format(schema=alias)
+                    selects.append('SELECT ? AS node_name, * FROM (%s)' % sql)
+                    params.append(name)
+                    params.extend(parameters)
+                cursor.execute('\nUNION ALL\n'.join(selects), params)
+                for row in cursor:
+                    yield tuple(row)
+
+                for alias in aliases:
+                    cursor.execute('DETACH DATABASE %s' % alias)
+        finally:
+            connection.close()
+
+    def find_label(self, value, normalize=True):
+        """Return list of (node_name, node_hash, hierarchy_value,
+        label_id, label_value) rows for every node label that matches
+        `value`.  Labels are matched case-insensitively with whitespace
+        collapsed unless `normalize` is False.  UNMAPPED labels are not
+        indexed.
+
+        The index is kept in a sidecar file for directory graphs.  A
+        node's labels are only re-read when its node hash changes.
+
+        """
+        global label_index_name
+        with self._lock:
+            if self._label_index is None:
+                if isinstance(self.nodes, _NodeMap):
+                    path = os.path.join(self.path, label_index_name)
+                    self._label_index = _LabelIndex(path)
+                else:
+                    self._label_index = _LabelIndex()
+
+            index = self._label_index
+            index.remove(keep=self._node_hashes)
+            stale = index.stale(self._node_hashes)
+            if stale:
+                operation = ("SELECT label_value, hierarchy_value, label_id "
+                             "FROM {schema}.label "
+                             "NATURAL JOIN {schema}.hierarchy "
+                             "WHERE label_value!='UNMAPPED'")
+                rows = self.query(operation, names=stale)
+                node_hashes = dict((x, self._node_hashes[x]) for x in stale)
+                index.update(node_hashes, rows)
+        return index.find(value, normalize)
+
+    def _node_path(self, name):
+        """Return file path for node `name` (without opening it) or
+        None if node is not stored in a file.
+
+        """
+        if isinstance(self.nodes, _NodeMap):
+            return os.path.join(self.nodes.path, self.nodes._filenames[name])
+        dbsrc = self.nodes[name]._connect._dbsrc
+        return dbsrc if not isinstance(dbsrc, sqlite3.Connection) else None
+
+    def _get_cache(self):
+        global cache_name
+        if self._cache is None:
+            if self.path == '<from collection>':
+                cache_path = None  # In-memory cache.
+            elif isinstance(self.nodes, NodeStore):
+                cache_path = self.path  # Cache tables live in the store.
             else:
-                key = p.get_hash()[:12]  # <- TODO!!!: Implement get_hash().
-                warnings.warn("Node is unnamed--using "
-                              "short hash '%s'." % key)
-            return (key, p)
-        self.nodes = dict(node_item(p) for p in nodes)
-
-        # Set edges.
-        self.edges = [None]
+                cache_path = os.path.join(self.path, cache_name)
+            self._cache = TranslationCache(cache_path, maxsize=self.cache_size)
+        return self._cache
+
+    def translate(self, path, edges=None, weight=None):
+        """Return composed relations along `path` (a sequence of node
+        names) as a list of (from_cell_id, to_cell_id, weight) rows.
+
+        Each step uses the edge stored in the next node that refers to
+        the previous node.  The `edges` sequence selects an edge name
+        for each step--if omitted, the lowest edge_order is used.  The
+        `weight` name selects the weight to compose--if omitted, the
+        lowest weight_order is used.  Weights along the path are
+        multiplied and summed over intermediate cells.
+
+        Results are cached by node hash and by the version of each
+        node holding an edge (see Node._change_token() and
+        NodeStore.version()) so repeated translations do not recompose
+        unchanged edges.  For store graphs, relations are
+        read directly from the store without loading nodes.
+
+        """
+        path = list(path)
+        assert len(path) > 1, 'Path must contain at least two nodes.'
+        if edges is None:
+            edges = [None] * (len(path) - 1)
+        edges = list(edges)
+        assert len(edges) == len(path) - 1, 'Requires one edge per step.'
+
+        if isinstance(self.nodes, NodeStore):
+            hashes = [self.nodes.node_hash(name) for name in path]
+            versions = [self.nodes.version(name) for name in path[1:]]
+            read_relations = self.nodes.read_relations
+        else:
+            nodes = dict((name, self.nodes[name]) for name in path)
+            hashes = [_node_hash(nodes[name]) for name in path]
+            versions = [nodes[name]._change_token() for name in path[1:]]
+            read_relations = lambda name, *args: _read_relations(nodes[name],
+                                                                 *args)
+
+        cache = self._get_cache()
+        key = cache.make_key(hashes, edges, weight, versions)
+        rows = cache.get(key)
+        if rows is None:
+            steps = zip(path[1:], hashes[:-1], edges)
+            steps = [read_relations(*args + (weight,)) for args in steps]
+            rows = _compose(steps)
+            cache.put(key, rows)
+        return rows
+
+    def retabulate(self, path, data, edges=None, weight=None):
+        """Return dictionary of values from `data` (a mapping of
+        from_cell_id to number for the first node in `path`) summed by
+        to_cell_id of the last node in `path`.  Each value is split
+        among its related cells in proportion to the composed weights
+        (see translate()), or evenly if the weights are missing.
+
+        """
+        shares = {}
+        for from_cell, to_cell, weight_value in self.translate(path, edges,
+                                                               weight):
+            shares.setdefault(from_cell, []).append((to_cell, weight_value))
+
+        result = {}
+        for from_cell, value in data.items():
+            assert from_cell in shares, ('Cell %r has no relation along '
+                                         'path.' % from_cell)
+            related = shares[from_cell]
+            if any(w is None for _, w in related):
+                related = [(cell, 1.0) for cell, _ in related]
+            related = [(cell, float(w)) for cell, w in related]
+            total = sum(w for _, w in related)
+            if not total:
+                related = [(cell, 1.0) for cell, _ in related]
+                total = float(len(related))
+            for to_cell, weight_value in related:
+                portion = value * (weight_value / total)
+                result[to_cell] = result.get(to_cell, 0) + portion
+        return result
+
+    def export_dot(self, fh, cells=False):
+        """Write graph to file-like object `fh` in GraphViz DOT format.
+
+        If `cells` is True, each node is written as a cluster of its
+        cells (labeled with their label values) and each edge as the
+        cell-to-cell relations it contains (labeled with their default
+        weights).  Output is written as it is read so only one node's
+        rows are handled at a time.
+
+        """
+        fh.write('digraph gpn {\n')
+        if not cells:
+            for name in self.nodes:
+                fh.write('  %s;\n' % _dot_quote(name))
+            for edge in self.edges:
+                fh.write('  %s -> %s [label=%s];\n'
+                         % (_dot_quote(edge.from_node),
+                            _dot_quote(edge.to_node),
+                            _dot_quote(edge.edge_name)))
+        else:
+            for name in self.nodes:
+                fh.write('  subgraph %s {\n' % _dot_quote('cluster_' + name))
+                fh.write('    label=%s;\n' % _dot_quote(name))
+                for cell_id, labels in self._iter_cells(name):
+                    fh.write('    %s [label=%s];\n'
+                             % (_dot_quote('%s::%s' % (name, cell_id)),
+                                _dot_quote(', '.join(labels))))
+                fh.write('  }\n')
+            for edge in self.edges:
+                for other_cell_id, cell_id, weight in self._iter_relations(edge):
+                    fh.write('  %s -> %s [label=%s];\n'
+                             % (_dot_quote('%s::%s' % (edge.from_node,
+                                                       other_cell_id)),
+                                _dot_quote('%s::%s' % (edge.to_node, cell_id)),
+                                _dot_quote('' if weight is None else weight)))
+        fh.write('}\n')
+
+    def export_graphml(self, fh, cells=False):
+        """Write graph to file-like object `fh` in GraphML format.
+
+        If `cells` is True, each node contains a nested graph of its
+        cells and each edge is written as the cell-to-cell relations it
+        contains (see export_dot()).
+
+        """
+        # Imported here because xml.sax imports urllib (slow to load).
+        from xml.sax.saxutils import escape
+        from xml.sax.saxutils import quoteattr
+
+        def data(key, value):
+            return '<data key="%s">%s</data>' % (key, escape('%s' % value))
+
+        fh.write('<?xml version="1.0" encoding="UTF-8"?>\n'
+                 '<graphml xmlns="http://graphml.graphdrawing.org/xmlns">\n'
+                 '  <key id="hierarchy" for="node" attr.name="hierarchy"'
+                 ' attr.type="string"/>\n'
+                 '  <key id="labels" for="node" attr.name="labels"'
+                 ' attr.type="string"/>\n'
+                 '  <key id="edge_name" for="edge" attr.name="edge_name"'
+                 ' attr.type="string"/>\n'
+                 '  <key id="edge_order" for="edge" attr.name="edge_order"'
+                 ' attr.type="int"/>\n'
+                 '  <key id="weight" for="edge" attr.name="weight"'
+                 ' attr.type="double"/>\n'
+                 '  <graph id="gpn" edgedefault="directed">\n')
+
+        for name in self.nodes:
+            hierarchy = ', '.join(self.hierarchy(name))
+            fh.write('    <node id=%s>%s' % (quoteattr(name),
+                                             data('hierarchy', hierarchy)))
+            if cells:
+                fh.write('\n      <graph id=%s edgedefault="directed">\n'
+                         % quoteattr(name + ':'))
+                for cell_id, labels in self._iter_cells(name):
+                    cell_key = quoteattr('%s::%s' % (name, cell_id))
+                    fh.write('        <node id=%s>%s</node>\n'
+                             % (cell_key, data('labels', ', '.join(labels))))
+                fh.write('      </graph>\n    ')
+            fh.write('</node>\n')
+
+        for edge in self.edges:
+            info = (data('edge_name', edge.edge_name)
+                    + data('edge_order', edge.edge_order))
+            if not cells:
+                fh.write('    <edge source=%s target=%s>%s</edge>\n'
+                         % (quoteattr(edge.from_node),
+                            quoteattr(edge.to_node), info))
+                continue
+            for other_cell_id, cell_id, weight in self._iter_relations(edge):
+                source = quoteattr('%s::%s' % (edge.from_node, other_cell_id))
+                target = quoteattr('%s::%s' % (edge.to_node, cell_id))
+                weight = '' if weight is None else data('weight', weight)
+                fh.write('    <edge source=%s target=%s>%s%s</edge>\n'
+                         % (source, target, info, weight))
+
+        fh.write('  </graph>\n'
+                 '</graphml>\n')
+
+    def to_networkx(self, cells=False):
+        """Return graph as a networkx.MultiDiGraph.  This requires the
+        optional NetworkX package and builds the entire graph in
+        memory--for large graphs, prefer export_dot() or
+        export_graphml().
+
+        Nodes are keyed by name (or by (name, cell_id) tuples if
+        `cells` is True).
+
+        """
+        try:
+            import networkx
+        except ImportError:
+            raise ImportError('to_networkx() requires the NetworkX package.')
+
+        graph = networkx.MultiDiGraph()
+        for name in self.nodes:
+            if not cells:
+                graph.add_node(name, hierarchy=self.hierarchy(name))
+                continue
+            for cell_id, labels in self._iter_cells(name):
+                graph.add_node((name, cell_id), node=name, labels=labels)
+
+        for edge in self.edges:
+            info = {'edge_name': edge.edge_name, 'edge_order': edge.edge_order}
+            if not cells:
+                info['statistics'] = self._edge_statistics[edge]
+                graph.add_edge(edge.from_node, edge.to_node, **info)
+                continue
+            for other_cell_id, cell_id, weight in self._iter_relations(edge):
+                graph.add_edge((edge.from_node, other_cell_id),
+                               (edge.to_node, cell_id), weight=weight, **info)
+        return graph
+
+    def _iter_cells(self, name):
+        """Yield (cell_id, labels) for node `name` (none for invalid
+        node files).
+
+        """
+        if name not in self._hierarchies:
+            return iter([])
+        return _iter_cells(self.nodes[name])
+
+    def _iter_relations(self, edge):
+        """Yield (other_cell_id, cell_id, weight) rows for `edge`."""
+        return _iter_relations(self.nodes[edge.to_node],
+                               self._node_hashes[edge.from_node],
+                               edge.edge_name, edge_order=edge.edge_order)
+
+
+def _node_hash(node):
+    """Return most recently stored hash of given node."""
+    with node._connect() as connection:
+        cursor = connection.cursor()
+        cursor.execute('SELECT node_hash FROM node '
+                       'ORDER BY node_id DESC LIMIT 1')
+        found = cursor.fetchone()
+    return found[0] if found else None
+
+
+def _max_attached(connection):
+    """Return maximum number of databases that can be attached to
+    given connection.
+
+    """
+    try:
+        return connection.getlimit(sqlite3.SQLITE_LIMIT_ATTACHED)
+    except AttributeError:
+        return 10  # SQLITE_MAX_ATTACHED default (getlimit() new in 3.11).
+
+
+def _resolve_edges(name, edge_rows, hash_index):
+    """Return list of (Edge, statistics) pairs for the edge rows
+    stored in node `name` (see _read_summary()) and list of
+    (name, other_node_hash, other_node_name) rows for edges whose
+    other_node_hash is not in `hash_index`.
+
+    """
+    resolved = []
+    unresolved = []
+    for other_hash, other_name, edge_name, edge_order, stats in edge_rows:
+        from_node = hash_index.get(other_hash)
+        if from_node is None:
+            unresolved.append((name, other_hash, other_name))
+        else:
+            resolved.append((Edge(from_node, name, edge_name, edge_order),
+                             stats))
+    return resolved, unresolved
+
+
+def _reachability(adjacency):
+    """Return dictionary of reachability attributes (see Graph) for
+    given adjacency (a dictionary of node names and outgoing edges).
+
+    """
+    successors = {}
+    for name, edges in adjacency.items():
+        successors[name] = sorted(set(edge.to_node for edge in edges))
+    components = _tarjan(sorted(adjacency), successors)
+
+    component_of = {}
+    for index, members in enumerate(components):
+        for name in members:
+            component_of[name] = index
+
+    # Components are found in reverse topological order so every
+    # successor's bitset is complete before it is needed.
+    reach = []
+    for index, members in enumerate(components):
+        bits = 1 << index
+        for name in members:
+            for other in successors[name]:
+                other_comp = component_of[other]
+                if other_comp != index:
+                    bits |= reach[other_comp]
+        reach.append(bits)
+
+    reached_by = [0] * len(components)
+    for index, bits in enumerate(reach):
+        for other in _iter_bits(bits):
+            reached_by[other] |= 1 << index
+
+    return {'_components': components,
+            '_component': component_of,
+            '_reach': reach,
+            '_reached_by': reached_by}
+
+
+def _add_edge(state, edge, statistics=None, reachable=False):
+    """Add `edge` to `state` (a dictionary of adjacency attributes, see
+    Graph) and update its reachability index.  If `reachable` is True,
+    the edge's nodes are already known to be connected and the index
+    is not changed.
+
+    """
+    bisect.insort(state['edges'], edge)
+    adjacency = state['_adjacency']
+    adjacency[edge.from_node] = adjacency[edge.from_node] + [edge]
+    state['_edge_statistics'][edge] = statistics or {}
+    if reachable:
+        return
+
+    from_comp = state['_component'][edge.from_node]
+    to_comp = state['_component'][edge.to_node]
+    if state['_reach'][to_comp] & (1 << from_comp):
+        if from_comp != to_comp:
+            state.update(_reachability(adjacency))  # <- Closes a cycle.
+        return
+
+    # Everything that reaches `from_comp` now reaches everything
+    # `to_comp` reaches (and vice versa).
+    reach = state['_reach'][to_comp]
+    reached_by = state['_reached_by'][from_comp]
+    for comp in _iter_bits(reached_by):
+        state['_reach'][comp] |= reach
+    for comp in _iter_bits(reach):
+        state['_reached_by'][comp] |= reached_by
+
+
+def _iter_bits(bits):
+    """Yield positions of bits set in integer `bits`."""
+    index = 0
+    while bits:
+        if bits & 1:
+            yield index
+        bits >>= 1
+        index += 1
+
+
+def _tarjan(names, successors):
+    """Return strongly connected components of graph (in reverse
+    topological order) using an iterative version of Tarjan's
+    algorithm.  The `successors` dictionary maps each name to a list
+    of names.
+
+    """
+    index = {}
+    lowlink = {}
+    stack = []
+    on_stack = set()
+    components = []
+    counter = 0
+
+    for root in names:
+        if root in index:
+            continue
+        work = [(root, iter(successors[root]))]
+        index[root] = lowlink[root] = counter
+        counter += 1
+        stack.append(root)
+        on_stack.add(root)
+        while work:
+            name, children = work[-1]
+            for child in children:
+                if child not in index:
+                    index[child] = lowlink[child] = counter
+                    counter += 1
+                    stack.append(child)
+                    on_stack.add(child)
+                    work.append((child, iter(successors[child])))
+                    break
+                elif child in on_stack:
+                    lowlink[name] = min(lowlink[name], index[child])
+            else:
+                work.pop()
+                if work:
+                    parent = work[-1][0]
+                    lowlink[parent] = min(lowlink[parent], lowlink[name])
+                if lowlink[name] == index[name]:
+                    component = []
+                    while True:
+                        member = stack.pop()
+                        on_stack.discard(member)
+                        component.append(member)
+                        if member == name:
+                            break
+                    components.append(sorted(component))
+    return components
+
+
+def _read_relations(node, other_node_hash, edge_name=None, weight_name=None):
+    """Return list of (other_cell_id, cell_id, weight) rows for the
+    edge in `node` that refers to `other_node_hash`.
+
+    """
+    relations = list(_iter_relations(node, other_node_hash, edge_name,
+                                     weight_name))
+    msg = 'No relations found for edge %r.' % (edge_name or other_node_hash)
+    assert relations, msg
+    return relations
+
+
+def _iter_relations(node, other_node_hash, edge_name=None, weight_name=None,
+                    edge_order=None):
+    """Yield (other_cell_id, cell_id, weight) rows for the edge in
+    `node` that refers to `other_node_hash` (see _read_relations()).
+    If `edge_order` is given, it selects the edge instead of
+    `edge_name`.
+
+    """
+    if edge_order is not None:
+        edge_clause = 'edge_order=?'
+        edge_param = edge_order
+    elif edge_name is None:
+        edge_clause = ('edge_order=(SELECT MIN(edge_order) FROM edge '
+                       '            WHERE other_node_hash=?)')
+        edge_param = other_node_hash
+    else:
+        edge_clause = 'edge_name=?'
+        edge_param = edge_name
+
+    if weight_name is None:
+        weight_clause = ('weight_id=(SELECT weight_id FROM weight '
+                         '           WHERE edge_id=edge.edge_id '
+                         '           ORDER BY weight_order IS NULL, '
+                         '                    weight_order, weight_id '
+                         '           LIMIT 1)')
+        weight_params = ()
+    else:
+        weight_clause = 'weight_name=?'
+        weight_params = (weight_name,)
+
+    query = """
+        SELECT relation.other_cell_id, relation.cell_id, relation_weight.weight
+        FROM edge
+        JOIN relation ON relation.edge_id=edge.edge_id
+        LEFT JOIN weight ON weight.edge_id=edge.edge_id AND weight.%s
+        LEFT JOIN relation_weight
+            ON relation_weight.relation_id=relation.relation_id
+               AND relation_weight.weight_id=weight.weight_id
+        WHERE edge.other_node_hash=? AND edge.%s
+    """ % (weight_clause, edge_clause)
+    params = weight_params + (other_node_hash, edge_param)
+
+    with node._connect() as connection:
+        cursor = connection.cursor()
+        cursor.execute(query, params)
+        for row in cursor:
+            yield row
+
+
+def _iter_cells(node):
+    """Yield (cell_id, labels) for every cell in `node` where labels
+    is a list of label values ordered by hierarchy level.
+
+    """
+    query = """
+        SELECT cell_id, label_value
+        FROM cell_label
+        NATURAL JOIN label
+        NATURAL JOIN hierarchy
+        ORDER BY cell_id, hierarchy_level
+    """
+    with node._connect() as connection:
+        cursor = connection.cursor()
+        cursor.execute(query)
+        for cell_id, rows in itertools.groupby(cursor, lambda x: x[0]):
+            yield cell_id, [x[1] for x in rows]
+
+
+def _dot_quote(value):
+    """Return `value` as a quoted DOT identifier."""
+    value = '%s' % value
+    return '"%s"' % value.replace('\\', '\\\\').replace('"', '\\"')
+
+
+def _compose(steps):
+    """Compose a list of relation steps into a single, sorted list of
+    (from_cell_id, to_cell_id, weight) rows.  A weight of None in any
+    step makes the composed weight None.
+
+    """
+    def mul(x, y):
+        return None if (x is None or y is None) else x * y
+
+    def add(x, y):
+        return None if (x is None or y is None) else x + y
+
+    composed = dict(((a, b), w) for a, b, w in steps[0])
+    for step in steps[1:]:
+        by_source = {}
+        for a, b, w in step:
+            by_source.setdefault(a, []).append((b, w))
+
+        result = {}
+        for (a, b), w1 in composed.items():
+            for c, w2 in by_source.get(b, ()):
+                weight = mul(w1, w2)
+                if (a, c) in result:
+                    weight = add(result[(a, c)], weight)
+                result[(a, c)] = weight
+        composed = result
+
+    return sorted((a, c, w) for (a, c), w in composed.items())
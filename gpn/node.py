@@ -1,22 +1,50 @@
 # -*- coding: utf-8 -*-
 import itertools
-import hashlib
+import math
 import os
 import sqlite3
-import textwrap
+import struct
 
-from gpn import _csv as csv
+# The json, hashlib, textwrap, and gpn._csv modules are imported where
+# they are used (keeps "import gpn.node" fast for short-lived processes).
+
+from gpn.cell import CellHierarchy
+from gpn.connector import READ_ONLY
 from gpn.connector import _Connector
 from gpn.connector import _duplicate_label_sets
 from gpn.connector import _invalid_unmapped_levels
 from gpn.connector import _get_schema_dict
 from gpn.connector import _expensive_constraints
+from gpn.connector import _hierarchy_index_schema
+from gpn.snapshot import NodeSnapshot
+
+
+def _normalize_label(value):
+    """Return label normalized for matching (case-folded and with
+    runs of whitespace collapsed).
+
+    """
+    return ' '.join(value.lower().split())
+
+
+def _ngrams(value, n=3):
+    """Return set of character n-grams for normalized label (padded
+    with spaces so short labels and word boundaries are represented).
+
+    """
+    value = ' %s ' % value
+    return set(value[i:i + n] for i in range(max(len(value) - n + 1, 1)))
 
 
 class Node(object):
+    # Type of rows returned by select_cell(): dict or gpn.cell.Cell (or
+    # other callable accepting a CellHierarchy, labels, and cell_id).
+    row_factory = dict
+
     def __init__(self, path=None, mode=0, **kwds):
         """Get existing node or create a new one."""
         self._connect = _Connector(path, mode=mode)
+        self._hash_cache = None  # <- (change token, hash) set by get_hash().
         if path:
             assert 'name' not in kwds, 'Cannot specify both path and name.'
             self.name = path.rsplit('.', 1)[0]
@@ -68,6 +96,8 @@ class Node(object):
                 info.append('Edges: None')
 
         # Format `info` list.
+        import textwrap
+
         def wrap(x):
             x = textwrap.wrap(x, width=70, subsequent_indent='  ')
             return '\n'.join(x)
@@ -79,31 +109,80 @@ class Node(object):
         assert not os.path.exists(filename), '%s already exists' % filename
 
         with open(filename, 'w') as fh:
-            with self._connect() as connection:
-                cursor = connection.cursor()
+            self._export_cells(fh)
 
-                # Get field names.
-                cursor.execute('SELECT hierarchy_value FROM hierarchy '
-                               'ORDER BY hierarchy_level')
-                fieldnames = [x[0] for x in cursor]
-                fieldnames.insert(0, 'cell_id')
-
-                # Write output file.
-                writer = csv.DictWriter(fh, fieldnames, lineterminator='\n')
-                writer.writeheader()
-                cursor.execute('SELECT cell_id from cell ORDER BY cell_id')
-                cursor2 = connection.cursor()
-                for cell_id in (x[0] for x in cursor):
-                    row = self._select_cell(cursor2, cell_id)
-                    row['cell_id'] = cell_id
-                    writer.writerow(row)
+    def _export_cells(self, fh):
+        """Write cells to given CSV file object."""
+        from gpn import _csv as csv
+        with self._connect() as connection:
+            cursor = connection.cursor()
+
+            # Get field names.
+            cursor.execute('SELECT hierarchy_value FROM hierarchy '
+                           'ORDER BY hierarchy_level')
+            fieldnames = [x[0] for x in cursor]
+            fieldnames.insert(0, 'cell_id')
+
+            # Write output file.
+            writer = csv.DictWriter(fh, fieldnames, lineterminator='\n')
+            writer.writeheader()
+            cursor.execute('SELECT cell_id from cell ORDER BY cell_id')
+            cursor2 = connection.cursor()
+            for cell_id in (x[0] for x in cursor):
+                row = self._select_cell(cursor2, cell_id)
+                row['cell_id'] = cell_id
+                writer.writerow(row)
+
+    def snapshot(self):
+        """Return read-only, in-memory copy of the node's cells for
+        repeated lookups without SQL (see gpn.snapshot.NodeSnapshot).
+
+        """
+        return NodeSnapshot(self)
 
     def select_cell(self, **kwds):
+        """Yield cells whose labels match the given hierarchy=label
+        keyword arguments.  Cells are dictionaries unless row_factory
+        is changed (e.g., to gpn.cell.Cell).
+
+        """
         with self._connect() as connection:
             cursor = connection.cursor()
             cursor2 = connection.cursor()
-            for cell_id in self._select_cell_id(cursor, **kwds):
-                yield self._select_cell(cursor2, cell_id)
+            cell_ids = self._select_cell_id(cursor, **kwds)
+            if self.row_factory is dict:
+                for cell_id in cell_ids:
+                    yield self._select_cell(cursor2, cell_id)
+            else:
+                rows = self._select_cell_rows(cursor2, cell_ids,
+                                              self.row_factory)
+                for row in rows:
+                    yield row
+
+    @staticmethod
+    def _select_cell_rows(cursor, cell_ids, row_factory):
+        """Yield `row_factory` objects for given cell_ids.  All rows
+        share one CellHierarchy and equal label values share one
+        string object.
+
+        """
+        cursor.execute('SELECT hierarchy_value FROM hierarchy '
+                       'ORDER BY hierarchy_level')
+        hierarchy = CellHierarchy(x[0] for x in cursor.fetchall())
+
+        query = """
+            SELECT label_value
+            FROM cell_label
+            NATURAL JOIN label
+            NATURAL JOIN hierarchy
+            WHERE cell_id=?
+            ORDER BY hierarchy_level
+        """
+        shared = {}
+        for cell_id in cell_ids:
+            cursor.execute(query, (cell_id,))
+            labels = tuple(shared.setdefault(x[0], x[0]) for x in cursor)
+            yield row_factory(hierarchy, labels, cell_id)
 
     @staticmethod
     def _select_cell(cursor, cell_id):
@@ -136,6 +215,177 @@ class Node(object):
         cursor.execute(operation, params)
         return (x[0] for x in cursor)
 
+    def descendants(self, **kwds):
+        """Return sorted list of cell_ids under the given hierarchy=label
+        keyword arguments (e.g., every cell in a state).  Labels from
+        the root level down are answered with one lookup in the
+        hierarchy index.  Labels that skip levels are matched against
+        each label path that fits.  READ_ONLY nodes without a current
+        index are queried like select_cell() instead.
+
+        """
+        with self._connect() as connection:
+            cursor = connection.cursor()
+            indexed = self._hierarchy_index_ready(cursor)
+            if not kwds:
+                cursor.execute('SELECT cell_id FROM cell ORDER BY cell_id')
+                return [x[0] for x in cursor]
+            if not indexed:
+                return sorted(self._select_cell_id(cursor, **kwds))
+
+            cursor.execute("""
+                SELECT hierarchy_value, hierarchy_level
+                FROM hierarchy
+                ORDER BY hierarchy_level
+            """)
+            levels = dict(cursor.fetchall())
+            if not set(kwds).issubset(levels):
+                return []  # <- Unknown hierarchy.
+
+            path = ['*'] * (max(levels[x] for x in kwds) + 1)
+            for hierarchy_value, label_value in kwds.items():
+                cursor.execute("""
+                    SELECT label_id
+                    FROM label
+                    NATURAL JOIN hierarchy
+                    WHERE hierarchy_value=? AND label_value=?
+                """, (hierarchy_value, label_value))
+                row = cursor.fetchone()
+                if not row:
+                    return []  # <- Unknown label.
+                path[levels[hierarchy_value]] = str(row[0])
+
+            if '*' not in path:
+                cursor.execute("""
+                    SELECT cell_id
+                    FROM cell_prefix
+                    WHERE prefix_id=(SELECT prefix_id
+                                     FROM hierarchy_prefix
+                                     WHERE prefix_path=?)
+                    ORDER BY cell_id
+                """, ('/'.join(path),))
+            else:
+                cursor.execute("""
+                    SELECT cell_id
+                    FROM cell_prefix
+                    WHERE prefix_id IN (SELECT prefix_id
+                                        FROM hierarchy_prefix
+                                        WHERE label_id=? AND prefix_path GLOB ?)
+                    ORDER BY cell_id
+                """, (int(path[-1]), '/'.join(path)))
+            return [x[0] for x in cursor]
+
+    def ancestors(self, cell_id):
+        """Return list of label dictionaries for the levels above
+        `cell_id`, from the root level down (each can be passed to
+        descendants()).  Raises KeyError if the cell does not exist.
+
+        """
+        with self._connect() as connection:
+            cursor = connection.cursor()
+            if self._hierarchy_index_ready(cursor):
+                labels = 'cell_prefix JOIN hierarchy_prefix USING (prefix_id)'
+            else:
+                labels = 'cell_label'  # <- READ_ONLY without current index.
+            cursor.execute("""
+                SELECT hierarchy_value, label_value
+                FROM %s
+                NATURAL JOIN label
+                NATURAL JOIN hierarchy
+                WHERE cell_id=?
+                ORDER BY hierarchy_level
+            """ % labels, (cell_id,))
+            items = cursor.fetchall()
+        if not items:
+            raise KeyError(cell_id)
+        return [dict(items[:i]) for i in range(1, len(items))]
+
+    def rollup(self, data, to_level):
+        """Yield (labels, total) tuples of values from `data` (a mapping
+        or iterable of cell_id and number pairs) summed for each label
+        path down to the `to_level` hierarchy (e.g., county values
+        totaled by state).  Labels are dictionaries like those from
+        ancestors() and totals are ordered by their label values.
+
+        Values are loaded into a temporary table and summed by SQLite
+        (grouped by the cells' label_ids at each level) so the data is
+        never held in Python.  Cell_ids not in the node are ignored.
+
+        """
+        if hasattr(data, 'items'):
+            data = data.items()
+
+        with self._temp_connection() as connection:
+            cursor = connection.cursor()
+            cursor.execute("""
+                SELECT hierarchy_id, hierarchy_value
+                FROM hierarchy
+                WHERE hierarchy_level <= (SELECT hierarchy_level
+                                          FROM hierarchy
+                                          WHERE hierarchy_value=?)
+                ORDER BY hierarchy_level
+            """, (to_level,))
+            levels = cursor.fetchall()
+            assert levels, 'Unknown hierarchy %r.' % to_level
+
+            # Join one cell_label per level (labels with the same value
+            # under different parents are kept apart).  CROSS JOIN keeps
+            # rollup_data as the outer loop (it has no statistics so the
+            # planner would otherwise scan all of cell_label).
+            positions = range(len(levels))
+            operation = """
+                SELECT {label_values}, total
+                FROM (SELECT {label_ids}, SUM(data.value) AS total
+                      FROM temp.rollup_data AS data
+                      {cell_label_joins}
+                      GROUP BY {group_by}) AS grouped
+                {label_joins}
+                ORDER BY {order_by}
+            """.format(
+                label_values=', '.join('label%s.label_value' % i
+                                       for i in positions),
+                label_ids=', '.join('level%s.label_id AS label_id%s' % (i, i)
+                                    for i in positions),
+                cell_label_joins=' '.join(
+                    'CROSS JOIN cell_label AS level{0} '
+                    'ON level{0}.cell_id=data.cell_id '
+                    'AND level{0}.hierarchy_id=?'.format(i) for i in positions),
+                group_by=', '.join('label_id%s' % i for i in positions),
+                label_joins=' '.join(
+                    'JOIN label AS label{0} '
+                    'ON label{0}.label_id=grouped.label_id{0}'.format(i)
+                    for i in positions),
+                order_by=', '.join(str(i + 1) for i in positions))
+            params = [x[0] for x in levels]
+            names = [x[1] for x in levels]
+
+            cursor.execute('DROP TABLE IF EXISTS temp.rollup_data')
+            cursor.execute('CREATE TEMP TABLE rollup_data '
+                           '(cell_id INTEGER NOT NULL, value NUMERIC)')
+            try:
+                cursor.executemany('INSERT INTO temp.rollup_data '
+                                   '(cell_id, value) VALUES (?, ?)', data)
+                cursor.execute(operation, params)
+                for row in cursor:
+                    yield dict(zip(names, row[:-1])), row[-1]
+            finally:
+                cursor.execute('DROP TABLE IF EXISTS temp.rollup_data')
+
+    def _temp_connection(self):
+        """Return connection that can create temporary tables.  The
+        connections of READ_ONLY nodes cannot write (not even to
+        temporary tables) so their file is attached to a new in-memory
+        database instead.
+
+        """
+        dbsrc = self._connect._dbsrc
+        if (READ_ONLY & self._connect._mode
+                and not isinstance(dbsrc, sqlite3.Connection)):
+            connection = sqlite3.connect(':memory:')
+            connection.execute('ATTACH DATABASE ? AS node', (dbsrc,))
+            return connection
+        return self._connect()
+
     def insert_cells(self, filename):
         """Insert cells from given CSV filename."""
         with open(filename, 'r') as fh:
@@ -145,6 +395,7 @@ class Node(object):
         """Insert cells from given CSV file object."""
         global _duplicate_label_sets
         global _invalid_unmapped_levels
+        from gpn import _csv as csv
 
         reader = csv.reader(fh)
         fieldnames = next(reader)  # Use header row as fieldnames.
@@ -189,11 +440,16 @@ class Node(object):
             for name in _expensive_constraints:
                 cursor.execute(schema_dict[name])
 
+            self._update_hierarchy_index(cursor)
+
             # Insert node hash.
             node_hash = self._get_hash(cursor)
             cursor.execute('INSERT INTO node (node_hash) VALUES (?)',
                            (node_hash,))
 
+        self._mark_hash_stored()
+        self._hash_cache = (self._change_token(), node_hash)
+
     @staticmethod
     def _insert_hierarchies(cursor, fieldnames):
         cursor.execute('SELECT hierarchy_value FROM hierarchy ORDER BY hierarchy_level')
@@ -239,6 +495,377 @@ class Node(object):
         params = [(cell_id, hrchy, lbl) for hrchy, lbl in items]
         cursor.executemany(operation, params)
 
+    def _hierarchy_index_ready(self, cursor):
+        """Return True if the hierarchy index can be used.  The index
+        is brought up to date first unless the node is READ_ONLY (then
+        False is returned if the index is missing or stale).
+
+        """
+        if READ_ONLY & self._connect._mode:
+            last_indexed = self._last_indexed_cell(cursor)
+            if last_indexed is None:
+                return False
+            cursor.execute('SELECT MAX(cell_id) FROM cell')
+            return (cursor.fetchone()[0] or 0) <= last_indexed
+        self._update_hierarchy_index(cursor)
+        return True
+
+    @staticmethod
+    def _last_indexed_cell(cursor):
+        """Return last cell_id in hierarchy index (0 if empty) or
+        None if the node has no index.
+
+        """
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE name='cell_prefix'")
+        if not cursor.fetchone():
+            return None
+        cursor.execute('SELECT MAX(cell_id) FROM cell_prefix')
+        return cursor.fetchone()[0] or 0
+
+    @staticmethod
+    def _update_hierarchy_index(cursor):
+        """Add cells that are not yet in the hierarchy index (creating
+        the index if needed).  Cells are only ever appended so any cell
+        after the last indexed cell_id is new.
+
+        """
+        global _hierarchy_index_schema
+        last_indexed = Node._last_indexed_cell(cursor)
+        if last_indexed is None:
+            for operation in _hierarchy_index_schema:
+                cursor.execute(operation)
+            last_indexed = 0
+        else:
+            cursor.execute('SELECT MAX(cell_id) FROM cell')
+            if (cursor.fetchone()[0] or 0) <= last_indexed:
+                return  # <- Index is current.
+
+        cursor.execute("""
+            SELECT cell_id, label_id
+            FROM cell_label
+            NATURAL JOIN hierarchy
+            WHERE cell_id>?
+            ORDER BY cell_id, hierarchy_level
+        """, (last_indexed,))
+        rows = cursor.fetchall()
+
+        prefix_ids = {}
+        cell_prefixes = []
+        for cell_id, group in itertools.groupby(rows, key=lambda x: x[0]):
+            path = []
+            for _, label_id in group:
+                path.append(str(label_id))
+                prefix_path = '/'.join(path)
+                prefix_id = prefix_ids.get(prefix_path)
+                if prefix_id is None:
+                    cursor.execute('INSERT OR IGNORE INTO hierarchy_prefix '
+                                   '(prefix_path, label_id) VALUES (?, ?)',
+                                   (prefix_path, label_id))
+                    if cursor.rowcount == 1:
+                        prefix_id = cursor.lastrowid
+                    else:  # <- Prefix was indexed by an earlier insert.
+                        cursor.execute('SELECT prefix_id FROM hierarchy_prefix '
+                                       'WHERE prefix_path=?', (prefix_path,))
+                        prefix_id = cursor.fetchone()[0]
+                    prefix_ids[prefix_path] = prefix_id
+                cell_prefixes.append((prefix_id, cell_id))
+        cursor.executemany('INSERT INTO cell_prefix (prefix_id, cell_id) '
+                           'VALUES (?, ?)', cell_prefixes)
+
+    def suggest_relations(self, other, block_size=1000, min_score=0.5,
+                          limit=3):
+        """Return list of candidate relations between the cells of
+        `other` and the cells of this node as (other_cell_id, cell_id,
+        score) tuples, best scores first.  Cells are compared by their
+        most specific (non-UNMAPPED) label:
+
+        1. Identical labels are matched with a hash join (score 1.0).
+        2. Labels that are equal after normalization (case and
+           whitespace) are matched the same way (score 0.9).
+        3. Remaining labels are blocked by character trigrams and
+           scored by trigram similarity (scaled to at most 0.8).
+           Trigrams shared by more than `block_size` labels are too
+           common to be useful and are skipped, which keeps the number
+           of comparisons bounded.  Only the `limit` best candidates
+           scoring at least `min_score` are kept for each cell.
+
+        Only `other` is indexed in memory--this node's labels are
+        streamed, so pass the smaller node as `other`.
+
+        """
+        # Index the other node's labels for hash joins on exact and
+        # normalized values and count trigrams.
+        exact = {}
+        normalized = {}
+        other_grams = {}
+        frequency = {}
+        for other_cell_id, value in other._leaf_labels():
+            exact.setdefault(value, []).append(other_cell_id)
+            value = _normalize_label(value)
+            normalized.setdefault(value, []).append(other_cell_id)
+            other_grams[other_cell_id] = gram_set = _ngrams(value)
+            for gram in gram_set:
+                frequency[gram] = frequency.get(gram, 0) + 1
+
+        # This node's labels are streamed (not kept) so only the other
+        # node's index grows with the number of cells.
+        for _, value in self._leaf_labels():
+            if value in exact:
+                continue
+            value = _normalize_label(value)
+            if value in normalized:
+                continue
+            for gram in _ngrams(value):
+                frequency[gram] = frequency.get(gram, 0) + 1
+
+        # Block remaining labels by trigram.  Uses prefix filtering:
+        # with grams ordered rarest first, two sets with a similarity
+        # of at least `min_score` must share one of their first few
+        # grams, so only those "prefix" grams are indexed and probed.
+        def prefix(gram_set):
+            size = len(gram_set) - int(math.ceil(min_score * len(gram_set))) + 1
+            ordered = sorted(gram_set, key=lambda x: (frequency[x], x))
+            return ordered[:max(size, 1)]
+
+        blocks = {}
+        for other_cell_id, gram_set in other_grams.items():
+            for gram in prefix(gram_set):
+                blocks.setdefault(gram, []).append(other_cell_id)
+        for gram in [k for k, v in blocks.items() if len(v) > block_size]:
+            del blocks[gram]
+
+        suggestions = []
+        for cell_id, value in self._leaf_labels():
+            if value in exact:
+                for other_cell_id in exact[value]:
+                    suggestions.append((other_cell_id, cell_id, 1.0))
+                continue
+            value = _normalize_label(value)
+            if value in normalized:
+                for other_cell_id in normalized[value]:
+                    suggestions.append((other_cell_id, cell_id, 0.9))
+                continue
+
+            gram_set = _ngrams(value)
+            candidate_ids = set()
+            for gram in prefix(gram_set):
+                candidate_ids.update(blocks.get(gram, ()))
+
+            size = len(gram_set)
+            low, high = size * min_score, size / min_score  # Size filter.
+            candidates = []
+            for other_cell_id in candidate_ids:
+                other_set = other_grams[other_cell_id]
+                other_size = len(other_set)
+                if other_size < low or other_size > high:
+                    continue
+                shared = len(gram_set & other_set)
+                similarity = shared / float(size + other_size - shared)
+                if similarity >= min_score:
+                    candidates.append((round(similarity * 0.8, 6), other_cell_id))
+            candidates.sort(key=lambda x: (-x[0], x[1]))
+            for score, other_cell_id in candidates[:limit]:
+                suggestions.append((other_cell_id, cell_id, score))
+
+        suggestions.sort(key=lambda x: (-x[2], x[1], x[0]))
+        return suggestions
+
+    def _leaf_labels(self):
+        """Yield (cell_id, label_value) pairs giving the most specific
+        non-UNMAPPED label of each cell (in cell_id order).
+
+        """
+        with self._connect() as connection:
+            cursor = connection.cursor()
+            cursor.execute("""
+                SELECT cell_id, label_value
+                FROM cell_label
+                NATURAL JOIN label
+                NATURAL JOIN hierarchy
+                WHERE label_value!='UNMAPPED'
+                ORDER BY cell_id, hierarchy_level DESC
+            """)
+            previous = None
+            for cell_id, label_value in cursor:
+                if cell_id != previous:
+                    yield cell_id, label_value
+                    previous = cell_id
+
+    def update_edge_statistics(self):
+        """Compute precision statistics for every edge and store them
+        in the property table (see _edge_statistics()).
+
+        """
+        import json
+        with self._connect() as connection:
+            cursor = connection.cursor()
+            cursor.execute('SELECT edge_id FROM edge ORDER BY edge_id')
+            edge_ids = [x[0] for x in cursor.fetchall()]
+            for edge_id in edge_ids:
+                statistics = self._edge_statistics(cursor, edge_id)
+                key = 'edge_statistics:%s' % edge_id
+                cursor.execute('DELETE FROM property WHERE property_key=?',
+                               (key,))
+                cursor.execute('INSERT INTO property (property_key, '
+                               'property_val) VALUES (?, ?)',
+                               (key, json.dumps(statistics, sort_keys=True)))
+
+    @staticmethod
+    def _edge_statistics(cursor, edge_id):
+        """Return dictionary of statistics describing how much
+        precision is lost when translating across the given edge.  All
+        values range from 0 (no loss) to 1:
+
+        * many_to_many: fraction of relations that are part of a
+          many-to-many relationship.
+        * weight_spread: average share of each other cell that is not
+          allocated to its largest related cell (uses the edge's first
+          proportional weight, or an even split if there is none).
+        * unmapped: fraction of relations that point to an UNMAPPED
+          cell.
+
+        """
+        cursor.execute("""
+            SELECT AVG(CASE WHEN other_count > 1 AND cell_count > 1
+                            THEN 1.0 ELSE 0.0 END)
+            FROM relation
+            NATURAL JOIN (SELECT other_cell_id, COUNT(*) AS other_count
+                          FROM relation
+                          WHERE edge_id=?
+                          GROUP BY other_cell_id)
+            NATURAL JOIN (SELECT cell_id, COUNT(*) AS cell_count
+                          FROM relation
+                          WHERE edge_id=?
+                          GROUP BY cell_id)
+            WHERE edge_id=?
+        """, (edge_id, edge_id, edge_id))
+        many_to_many = cursor.fetchone()[0] or 0.0
+
+        cursor.execute("""
+            SELECT weight_id
+            FROM weight
+            WHERE edge_id=? AND proportional=1
+            ORDER BY weight_order IS NULL, weight_order, weight_id
+            LIMIT 1
+        """, (edge_id,))
+        found = cursor.fetchone()
+        if found:
+            cursor.execute("""
+                SELECT AVG(1.0 - max_weight / total_weight)
+                FROM (SELECT MAX(CAST(weight AS REAL)) AS max_weight,
+                             SUM(CAST(weight AS REAL)) AS total_weight
+                      FROM relation
+                      NATURAL JOIN relation_weight
+                      WHERE edge_id=? AND weight_id=?
+                      GROUP BY other_cell_id)
+                WHERE total_weight > 0
+            """, (edge_id, found[0]))
+        else:
+            cursor.execute("""
+                SELECT AVG(1.0 - 1.0 / cell_count)
+                FROM (SELECT COUNT(*) AS cell_count
+                      FROM relation
+                      WHERE edge_id=?
+                      GROUP BY other_cell_id)
+            """, (edge_id,))
+        weight_spread = cursor.fetchone()[0] or 0.0
+
+        cursor.execute("""
+            SELECT AVG(CASE WHEN cell_id IN (SELECT cell_id
+                                             FROM cell_label
+                                             NATURAL JOIN label
+                                             WHERE label_value='UNMAPPED')
+                            THEN 1.0 ELSE 0.0 END)
+            FROM relation
+            WHERE edge_id=?
+        """, (edge_id,))
+        unmapped = cursor.fetchone()[0] or 0.0
+
+        return {'many_to_many': round(many_to_many, 6),
+                'weight_spread': round(weight_spread, 6),
+                'unmapped': round(unmapped, 6)}
+
+    def get_hash(self):
+        """Return a hash to uniquely identify the node's cells (see
+        _get_hash()).  The hash is cached and only recomputed when the
+        database has changed since it was last computed.  For files
+        that have not been written to since cells were inserted, the
+        hash stored in the node table is returned without reading any
+        cells (see _mark_hash_stored()).
+
+        """
+        token = self._change_token()
+        if self._hash_cache and self._hash_cache[0] == token:
+            return self._hash_cache[1]
+
+        with self._connect() as connection:
+            cursor = connection.cursor()
+            node_hash = None
+            if self._hash_stored():
+                cursor.execute('SELECT node_hash FROM node '
+                               'ORDER BY node_id DESC LIMIT 1')
+                found = cursor.fetchone()
+                node_hash = found[0] if found else None
+            if node_hash is None:
+                node_hash = self._get_hash(cursor)
+        self._hash_cache = (token, node_hash)
+        return node_hash
+
+    def _read_header(self):
+        """Return file change counter (bytes 24-27), user_version
+        (bytes 60-63), size, and modification time of a file node's
+        database or None for in-memory nodes.
+
+        """
+        dbsrc = self._connect._dbsrc
+        if isinstance(dbsrc, sqlite3.Connection):
+            return None
+        with open(dbsrc, 'rb') as fh:
+            header = fh.read(64)
+            stat = os.fstat(fh.fileno())
+        counter, = struct.unpack('>I', header[24:28])
+        user_version, = struct.unpack('>I', header[60:64])
+        return counter, user_version, stat.st_size, stat.st_mtime
+
+    def _mark_hash_stored(self):
+        """Record that the latest node_hash row matches the file's
+        cells by setting user_version to the change counter the file
+        will have once the setting is committed.  Any later write
+        increments the counter so the mark no longer matches.
+
+        """
+        header = self._read_header()
+        if header is None:
+            return  # <- In-memory nodes use the _hash_cache only.
+        version = (header[0] + 1) & 0x7fffffff  # <- Signed 32-bit field.
+        with self._connect() as connection:
+            connection.execute('PRAGMA user_version=%d' % version)
+
+    def _hash_stored(self):
+        """Return True if the latest node_hash row is known to match
+        the file's cells (see _mark_hash_stored()).
+
+        """
+        header = self._read_header()
+        if header is None:
+            return False
+        counter, user_version = header[:2]
+        return user_version != 0 and user_version == counter & 0x7fffffff
+
+    def _change_token(self):
+        """Return value that changes whenever the node's database is
+        written to.  For files, this is the file change counter from
+        the SQLite header plus the file's size and modification time.
+        For in-memory nodes, it is the shared connection's
+        total_changes count.
+
+        """
+        header = self._read_header()
+        if header is None:
+            return self._connect._dbsrc.total_changes
+        counter, _, size, mtime = header
+        return (counter, size, mtime)
+
     @staticmethod
     def _get_hash(cursor):
         """Return a hash to uniquely identify the nodes's cells.
@@ -253,6 +880,7 @@ class Node(object):
             NATURAL JOIN label
             ORDER BY cell_id, hierarchy_id, label_value
         """)
+        import hashlib
         sha256 = hashlib.sha256()
         for row in cursor:
             for cell in row:
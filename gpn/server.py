@@ -0,0 +1,237 @@
+# -*- coding: utf-8 -*-
+"""Query daemon that keeps a Graph loaded between requests.
+
+The server listens on a Unix domain socket and speaks line-delimited
+JSON: each request is one JSON object on its own line and each
+response is one JSON object on its own line (in the same order).
+
+    {"op": "select", "node": "counties", "criteria": {"state": "Ohio"}}
+    {"op": "translate", "path": ["counties", "zones"]}
+    {"op": "retabulate", "path": ["counties", "zones"], "data": {"2": 10}}
+    {"op": "hash"}
+
+A request may include an "id" which is copied into its response.
+Successful responses are {"ok": true, "result": ...} and failures are
+{"ok": false, "error": "..."}.  The select, translate, and retabulate
+operations accept the same arguments as Node.select_cell(),
+Graph.translate(), and Graph.retabulate() (JSON object keys are
+strings, so retabulate "data" keys are converted to cell_id integers).
+Use gpn.client.request() to send requests.
+
+"""
+import collections
+import json
+import os
+import signal
+import socket
+try:
+    import asyncio  # New in 3.4
+    from concurrent.futures import ThreadPoolExecutor
+except ImportError:
+    asyncio = None
+
+_operations = {}
+
+
+def _operation(func):
+    _operations[func.__name__[len('_op_'):]] = func
+    return func
+
+
+@_operation
+def _op_select(graph, node, criteria=None):
+    node = graph.nodes[node]
+    results = []
+    with node._connect() as connection:
+        cursor = connection.cursor()
+        cursor2 = connection.cursor()
+        for cell_id in node._select_cell_id(cursor, **(criteria or {})):
+            row = node._select_cell(cursor2, cell_id)
+            row['cell_id'] = cell_id
+            results.append(row)
+    return results
+
+
+@_operation
+def _op_translate(graph, path, edges=None, weight=None):
+    rows = graph.translate(path, edges, weight)
+    return [[a, b, None if w is None else float(w)] for a, b, w in rows]
+
+
+@_operation
+def _op_retabulate(graph, path, data, edges=None, weight=None):
+    data = dict((int(k), v) for k, v in data.items())
+    result = graph.retabulate(path, data, edges, weight)
+    return dict((str(k), v) for k, v in result.items())
+
+
+@_operation
+def _op_hash(graph):
+    return graph.get_hash()
+
+
+def handle_request(graph, line):
+    """Return response dictionary for request `line` (a JSON object)
+    run against `graph`.
+
+    """
+    response = {}
+    try:
+        request = json.loads(line)
+        assert isinstance(request, dict), 'Request must be a JSON object.'
+        if 'id' in request:
+            response['id'] = request['id']
+        op = request.get('op')
+        assert op in _operations, 'Unknown op %r.' % op
+        kwds = dict((k, v) for k, v in request.items() if k not in ('id', 'op'))
+        response['result'] = _operations[op](graph, **kwds)
+        response['ok'] = True
+    except Exception as err:
+        response.pop('result', None)
+        response['ok'] = False
+        response['error'] = '%s: %s' % (err.__class__.__name__, err)
+    return response
+
+
+class _Protocol(object if asyncio is None else asyncio.Protocol):
+    """One client connection.  Requests are answered in order, one at
+    a time, by the server's worker thread.
+
+    """
+    def __init__(self, server):
+        self._server = server
+        self._buffer = b''
+        self._pending = collections.deque()
+        self._busy = False
+        self._eof = False
+        self.transport = None
+
+    def connection_made(self, transport):
+        self.transport = transport
+        self._server.protocols.add(self)
+
+    def data_received(self, data):
+        lines = (self._buffer + data).split(b'\n')
+        self._buffer = lines.pop()
+        self._pending.extend(x for x in lines if x.strip())
+        self._next()
+
+    def eof_received(self):
+        self._eof = True
+        self._next()
+        return True  # <- Keep transport open to finish pending requests.
+
+    def connection_lost(self, exc):
+        self.transport = None
+        self._pending.clear()
+        self._server.protocols.discard(self)
+
+    def _next(self):
+        if self._busy or not self.transport:
+            return
+        if not self._pending:
+            if self._eof:
+                self.transport.close()
+            return
+        line = self._pending.popleft().decode('utf-8')
+        self._busy = True
+        future = self._server.submit(handle_request, self._server.graph, line)
+        future.add_done_callback(self._done)
+
+    def _done(self, future):
+        self._busy = False
+        if self.transport:
+            response = json.dumps(future.result()) + '\n'
+            self.transport.write(response.encode('utf-8'))
+            self._next()
+
+
+class _Server(object):
+    """Event loop for serve().  The Graph is only used from a single
+    worker thread so node, catalog, and cache state are never shared
+    between threads while the loop handles many connections.
+
+    """
+    def __init__(self, graph, path, poll=None):
+        self.graph = graph
+        self.path = path
+        self.poll = poll
+        self.loop = asyncio.new_event_loop()
+        self.protocols = set()  # <- Open connections.
+        self._executor = ThreadPoolExecutor(max_workers=1)
+
+    def submit(self, func, *args):
+        return self.loop.run_in_executor(self._executor, func, *args)
+
+    def _schedule_refresh(self):
+        def refresh():
+            future = self.submit(self.graph.refresh)
+            future.add_done_callback(lambda f: self._schedule_refresh())
+        self.loop.call_later(self.poll, refresh)
+
+    def run(self, ready=None):
+        loop = self.loop
+        server = loop.run_until_complete(
+            loop.create_unix_server(lambda: _Protocol(self), self.path))
+        try:
+            for signum in (signal.SIGINT, signal.SIGTERM):
+                try:
+                    loop.add_signal_handler(signum, loop.stop)
+                except (RuntimeError, ValueError):
+                    pass  # <- Not in main thread.
+            if self.poll:
+                self._schedule_refresh()
+            if ready:
+                loop.call_soon(ready)
+            loop.run_forever()
+        finally:
+            loop.run_until_complete(asyncio.sleep(0))  # <- Finish accepts.
+            server.close()
+            for protocol in list(self.protocols):
+                protocol.transport.close()
+            loop.run_until_complete(server.wait_closed())
+            loop.run_until_complete(asyncio.sleep(0))  # <- Lose connections.
+            self._executor.shutdown()
+            loop.close()
+            if os.path.exists(self.path):
+                os.remove(self.path)
+
+    def stop(self):
+        """Stop server (safe to call from any thread)."""
+        self.loop.call_soon_threadsafe(self.loop.stop)
+
+
+def _check_socket(path):
+    """Remove stale socket file at `path` (left by a server that did
+    not shut down cleanly).  Raises an error if a server is already
+    listening.
+
+    """
+    if not os.path.exists(path):
+        return
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(path)
+    except socket.error:
+        os.remove(path)
+    else:
+        raise IOError('Server already running on %r.' % path)
+    finally:
+        sock.close()
+
+
+def serve(graph, path, poll=5.0, ready=None):
+    """Answer requests for `graph` on Unix domain socket `path` until
+    interrupted (SIGINT or SIGTERM).  For directory graphs, node files
+    are checked for changes every `poll` seconds (see Graph.refresh())
+    unless `poll` is None.  If given, `ready` is called with the
+    server once the socket is listening.
+
+    """
+    assert asyncio, 'serve() requires Python 3.4 or newer.'
+    assert hasattr(socket, 'AF_UNIX'), 'Unix domain sockets not supported.'
+    _check_socket(path)
+    if not os.path.isdir(graph.path):
+        poll = None  # <- Only directory graphs can be refreshed.
+    server = _Server(graph, path, poll)
+    server.run(ready and (lambda: ready(server)))
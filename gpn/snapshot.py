@@ -0,0 +1,147 @@
+# -*- coding: utf-8 -*-
+"""Read-only, in-memory copy of a node's cells for fast lookups."""
+import bisect
+from array import array
+try:
+    from sys import intern  # New location in 3.0
+except ImportError:
+    pass  # <- Built-in function in 2.x.
+
+from gpn.cell import CellHierarchy
+
+
+def _intern(value):
+    """Return interned `value` (unicode values on Python 2 cannot be
+    interned and are returned unchanged).
+
+    """
+    if isinstance(value, str):
+        return intern(value)
+    return value
+
+
+def _contains(sorted_array, value):
+    position = bisect.bisect_left(sorted_array, value)
+    return position < len(sorted_array) and sorted_array[position] == value
+
+
+class NodeSnapshot(object):
+    """Compact copy of the cells of `node` (see Node.snapshot()).
+
+    Cells are stored as one array('i') of label_ids per hierarchy
+    level (indexed by position in the sorted `cell_ids` array).  Each
+    level also maps its label values to a sorted array of cell_ids so
+    select_cell() filters are answered by intersecting arrays instead
+    of SQL queries.  Label values are interned (where supported).
+
+    A snapshot does not see later changes to its node--compare its
+    `node_hash` with the node's get_hash() to check if it is current.
+    Rows are made with the node's row_factory (as of the snapshot).
+
+    """
+    __slots__ = ('hierarchy', 'node_hash', 'cell_ids', '_label_ids',
+                 '_label_values', '_index', '_row_factory',
+                 '_cell_hierarchy')
+
+    def __init__(self, node):
+        with node._connect() as connection:
+            cursor = connection.cursor()
+            cursor.execute('SELECT hierarchy_id, hierarchy_value '
+                           'FROM hierarchy ORDER BY hierarchy_level')
+            hierarchy = cursor.fetchall()
+
+            cursor.execute('SELECT label_id, label_value FROM label')
+            label_values = dict((label_id, _intern(value))
+                                for label_id, value in cursor)
+
+            cursor.execute('SELECT cell_id FROM cell ORDER BY cell_id')
+            cell_ids = array('i', (x[0] for x in cursor))
+
+            label_ids = []
+            for hierarchy_id, _ in hierarchy:
+                cursor.execute('SELECT label_id FROM cell_label '
+                               'WHERE hierarchy_id=? ORDER BY cell_id',
+                               (hierarchy_id,))
+                level = array('i', (x[0] for x in cursor))
+                assert len(level) == len(cell_ids), 'Cells missing labels.'
+                label_ids.append(level)
+
+        index = []
+        for level in label_ids:
+            by_label = {}
+            for cell_id, label_id in zip(cell_ids, level):
+                value = label_values[label_id]
+                try:
+                    by_label[value].append(cell_id)
+                except KeyError:
+                    by_label[value] = array('i', [cell_id])
+            index.append(by_label)  # Arrays are sorted (cell_ids are).
+
+        self.hierarchy = tuple(_intern(x[1]) for x in hierarchy)
+        self.node_hash = node.get_hash()
+        self.cell_ids = cell_ids
+        self._label_ids = tuple(label_ids)
+        self._label_values = label_values
+        self._index = dict(zip(self.hierarchy, index))
+        self._row_factory = node.row_factory
+        self._cell_hierarchy = CellHierarchy(self.hierarchy)
+
+    def __len__(self):
+        return len(self.cell_ids)
+
+    def __repr__(self):
+        return '<%s of %s cells: %s>' % (self.__class__.__name__, len(self),
+                                        ', '.join(self.hierarchy))
+
+    def select_cell_id(self, **kwds):
+        """Return sorted list of cell_ids whose labels match all of the
+        given hierarchy=label keyword arguments (all cells if no
+        arguments are given).
+
+        """
+        if not kwds:
+            return list(self.cell_ids)
+
+        matches = []
+        for hierarchy_value, label_value in kwds.items():
+            try:
+                matches.append(self._index[hierarchy_value][label_value])
+            except KeyError:
+                return []  # <- Unknown hierarchy or label.
+        matches.sort(key=len)
+
+        # Intersect starting with the smallest array.  When the
+        # remaining cells are few compared to the next array, they are
+        # looked up by binary search instead (so large arrays, such as
+        # the root label's, are not scanned).
+        cell_ids = set(matches[0])
+        for other in matches[1:]:
+            if len(cell_ids) * 16 < len(other):
+                cell_ids = set(x for x in cell_ids if _contains(other, x))
+            else:
+                cell_ids.intersection_update(other)
+            if not cell_ids:
+                break
+        return sorted(cell_ids)
+
+    def select_cell(self, **kwds):
+        """Return list of label dictionaries for cells that match the
+        given hierarchy=label keyword arguments (like
+        Node.select_cell()).
+
+        """
+        return [self.get_cell(x) for x in self.select_cell_id(**kwds)]
+
+    def get_cell(self, cell_id):
+        """Return row of hierarchy and label values for `cell_id`.
+        Raises KeyError if the cell does not exist.
+
+        """
+        position = bisect.bisect_left(self.cell_ids, cell_id)
+        if position == len(self.cell_ids) or self.cell_ids[position] != cell_id:
+            raise KeyError(cell_id)
+        values = self._label_values
+        labels = tuple(values[level[position]] for level in self._label_ids)
+        if self._row_factory is dict:
+            return dict(zip(self.hierarchy, labels))
+        return self._row_factory(self._cell_hierarchy, labels, cell_id)
@@ -0,0 +1,485 @@
+# -*- coding: utf-8 -*-
+import collections
+import json
+import os
+import re
+import sqlite3
+import uuid
+import warnings
+try:
+    from collections.abc import Mapping  # New location in 3.3
+except ImportError:
+    from collections import Mapping
+
+from gpn.connector import IN_MEMORY
+from gpn.connector import _SharedConnection
+from gpn.connector import _register_types
+from gpn.connector import _expensive_constraints
+from gpn.connector import _get_schema_dict
+from gpn.node import Node
+
+
+# Node tables in an order that satisfies their foreign keys.
+_node_tables = ['hierarchy', 'label', 'cell', 'cell_label', 'node', 'edge',
+                'weight', 'relation', 'relation_weight', 'property']
+
+_store_columns = None  # Set by _get_store_columns() on first use.
+
+
+def _get_store_columns():
+    """Return dictionary of node table names and lists of (column,
+    declared_type) pairs (read from the Node schema).
+
+    """
+    global _store_columns
+    if _store_columns is None:
+        tables = _get_schema_dict('TABLE')
+        connection = sqlite3.connect(':memory:')
+        try:
+            cursor = connection.cursor()
+            columns = {}
+            for table in _node_tables:
+                cursor.execute(tables[table])
+                cursor.execute('PRAGMA table_info(%s)' % table)
+                columns[table] = [(x[1], x[2]) for x in cursor.fetchall()]
+        finally:
+            connection.close()
+        _store_columns = columns
+    return _store_columns
+
+
+def _get_store_schema():
+    """Return list of statements to create store tables.  Each node
+    table is stored as "store_<table>" with an added store_id column
+    (the node_store row it belongs to).  Constraints are not copied--
+    rows are validated by the Node schema before they are saved.  The
+    node_store_version table holds a new token each time a node is
+    saved.
+
+    """
+    schema = [
+        """
+        CREATE TABLE IF NOT EXISTS node_store (
+            store_id INTEGER PRIMARY KEY,
+            node_name TEXT UNIQUE NOT NULL
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS node_store_version (
+            store_id INTEGER PRIMARY KEY,
+            version TEXT NOT NULL
+        )
+        """,
+    ]
+    for table, columns in sorted(_get_store_columns().items()):
+        columns = ',\n'.join('    %s %s' % x for x in columns)
+        schema.append('CREATE TABLE IF NOT EXISTS store_%s (\n'
+                      '    store_id INTEGER NOT NULL,\n%s\n)'
+                      % (table, columns))
+        schema.append('CREATE INDEX IF NOT EXISTS idx_Store%s_StoreId '
+                      'ON store_%s (store_id)'
+                      % (table.title().replace('_', ''), table))
+    schema.append('CREATE INDEX IF NOT EXISTS idx_StoreRelation_EdgeId '
+                  'ON store_relation (store_id, edge_id)')
+    return schema
+
+
+def _is_store(path):
+    """Return True if the SQLite file `path` is empty or contains a
+    node_store table, else False.
+
+    """
+    if os.path.getsize(path) == 0:
+        return True  # <- Empty files are new databases.
+    try:
+        connection = sqlite3.connect(path)
+        try:
+            cursor = connection.cursor()
+            cursor.execute("SELECT 1 FROM sqlite_master "
+                           "WHERE type='table' AND name='node_store'")
+            return cursor.fetchone() is not None
+        finally:
+            connection.close()
+    except sqlite3.DatabaseError:
+        return False  # <- Not a SQLite file.
+
+
+class NodeStore(Mapping):
+    """Single-file store for many nodes.  Each node's rows are kept in
+    shared tables keyed by a store_id column (instead of one SQLite file
+    per node) so graphs with thousands of nodes use one file, and
+    cross-node queries run against a single database.
+
+    As a mapping, a store returns Node objects by name.  Each Node is
+    an in-memory copy with the full Node API--changes must be written
+    back with save().  At most `maxsize` loaded nodes are kept (least
+    recently used are dropped).
+
+    """
+    def __init__(self, path=None, maxsize=128):
+        """Open store in `path` (created if it does not exist).  If
+        `path` is omitted, the store is kept in memory.  Existing files
+        that are not node stores (such as node files) are not changed--
+        an error is raised instead.
+
+        """
+        assert maxsize > 0, 'maxsize must be a positive integer.'
+        _register_types()
+        self.maxsize = maxsize
+        if path:
+            if os.path.isfile(path) and not _is_store(path):
+                raise Exception('File - %s - is not a node store.' % path)
+            self._dbsrc = path
+        else:
+            self._dbsrc = sqlite3.connect(':memory:',
+                                          detect_types=sqlite3.PARSE_DECLTYPES,
+                                          factory=_SharedConnection)
+        self._open = collections.OrderedDict()
+        self._names_cache = None  # <- Set by _names(), cleared on write.
+
+        with self._connect() as connection:
+            cursor = connection.cursor()
+            for operation in _get_store_schema():
+                cursor.execute(operation)
+
+    def __del__(self):
+        try:
+            self._dbsrc.close_parent()  # Permanently close in-memory db!
+        except AttributeError:
+            pass
+
+    def _connect(self):
+        if isinstance(self._dbsrc, sqlite3.Connection):
+            return self._dbsrc
+        return sqlite3.connect(self._dbsrc,
+                               detect_types=sqlite3.PARSE_DECLTYPES)
+
+    def _names(self):
+        """Return dictionary of node names and store_ids (cached until
+        save() or remove() is called).
+
+        """
+        if self._names_cache is None:
+            with self._connect() as connection:
+                cursor = connection.cursor()
+                cursor.execute('SELECT node_name, store_id FROM node_store')
+                self._names_cache = dict(cursor.fetchall())
+        return self._names_cache
+
+    def __getitem__(self, name):
+        try:
+            node = self._open.pop(name)
+        except KeyError:
+            store_id = self._names()[name]  # <- Raises KeyError if missing.
+            node = Node(mode=IN_MEMORY, name=name)
+            self._copy_rows(store_id, node)
+        self._open[name] = node  # Most recently used is last.
+        while len(self._open) > self.maxsize:
+            self._open.popitem(last=False)
+        return node
+
+    def __contains__(self, name):
+        return name in self._names()
+
+    def __iter__(self):
+        return iter(sorted(self._names()))
+
+    def __len__(self):
+        return len(self._names())
+
+    def save(self, node, name=None):
+        """Write `node` to store under `name` (defaults to node.name),
+        replacing any node previously saved with that name.
+
+        """
+        global _node_tables
+        name = name or node.name
+        assert name, 'Node is unnamed--a name must be given.'
+        columns = _get_store_columns()
+
+        with self._connect() as connection:
+            cursor = connection.cursor()
+            store_id = self._names().get(name)
+            if store_id is None:
+                cursor.execute('INSERT INTO node_store (node_name) VALUES (?)',
+                               (name,))
+                store_id = cursor.lastrowid
+            else:
+                self._delete_rows(cursor, store_id)
+
+            with node._connect() as node_connection:
+                node_cursor = node_connection.cursor()
+                for table in _node_tables:
+                    names = [x[0] for x in columns[table]]
+                    node_cursor.execute('SELECT %s FROM %s'
+                                        % (', '.join(names), table))
+                    operation = ('INSERT INTO store_%s (store_id, %s) '
+                                 'VALUES (?%s)' % (table, ', '.join(names),
+                                                   ', ?' * len(names)))
+                    params = ((store_id,) + tuple(row) for row in node_cursor)
+                    cursor.executemany(operation, params)
+
+            cursor.execute('INSERT OR REPLACE INTO node_store_version '
+                           '(store_id, version) VALUES (?, ?)',
+                           (store_id, uuid.uuid4().hex))
+
+        self._names_cache = None
+        self._open.pop(name, None)
+
+    def remove(self, name):
+        """Remove node `name` from store."""
+        with self._connect() as connection:
+            cursor = connection.cursor()
+            store_id = self._names()[name]  # <- Raises KeyError if missing.
+            self._delete_rows(cursor, store_id)
+            cursor.execute('DELETE FROM node_store_version WHERE store_id=?',
+                           (store_id,))
+            cursor.execute('DELETE FROM node_store WHERE store_id=?',
+                           (store_id,))
+        self._names_cache = None
+        self._open.pop(name, None)
+
+    def import_nodes(self, nodes):
+        """Save every node in `nodes` (a mapping of names and Nodes
+        such as Graph('path/to/folder').nodes).  Nodes that cannot be
+        opened are skipped with a warning.
+
+        """
+        for name in nodes:
+            try:
+                node = nodes[name]
+            except Exception:
+                warnings.warn('Skipping invalid node %r.' % name)
+                continue
+            self.save(node, name)
+
+    def export_nodes(self, dirpath):
+        """Write every node to a .node file in `dirpath` (names with
+        '/' are written to sub-folders).
+
+        """
+        names = self._names()
+        for name in sorted(names):
+            filepath = os.path.join(dirpath, *name.split('/')) + '.node'
+            assert not os.path.exists(filepath), '%s already exists' % filepath
+            folder = os.path.dirname(filepath)
+            if folder and not os.path.isdir(folder):
+                os.makedirs(folder)
+            self._copy_rows(names[name], Node(filepath))
+
+    def _copy_rows(self, store_id, node):
+        """Copy stored rows into empty `node`."""
+        global _node_tables
+        columns = _get_store_columns()
+        with node._connect() as node_connection:
+            node_connection.isolation_level = None
+            node_cursor = node_connection.cursor()
+            node_cursor.execute('BEGIN TRANSACTION')
+
+            # Temporarily drop triggers (rows were validated when saved).
+            for trigger in _expensive_constraints:
+                node_cursor.execute('DROP TRIGGER %s' % trigger)
+
+            with self._connect() as connection:
+                cursor = connection.cursor()
+                for table in _node_tables:
+                    names = ', '.join(x[0] for x in columns[table])
+                    cursor.execute('SELECT %s FROM store_%s WHERE store_id=?'
+                                   % (names, table), (store_id,))
+                    operation = ('INSERT INTO %s (%s) VALUES (%s)'
+                                 % (table, names,
+                                    ', '.join(['?'] * len(columns[table]))))
+                    node_cursor.executemany(operation, cursor)
+
+            schema_dict = _get_schema_dict()
+            for trigger in _expensive_constraints:
+                node_cursor.execute(schema_dict[trigger])
+            node_cursor.execute('COMMIT TRANSACTION')
+            node_connection.isolation_level = ''
+
+    @staticmethod
+    def _delete_rows(cursor, store_id):
+        global _node_tables
+        for table in reversed(_node_tables):
+            cursor.execute('DELETE FROM store_%s WHERE store_id=?' % table,
+                           (store_id,))
+
+    def node_hash(self, name):
+        """Return most recently stored hash of node `name`."""
+        with self._connect() as connection:
+            cursor = connection.cursor()
+            cursor.execute("""
+                SELECT node_hash
+                FROM store_node
+                WHERE store_id=(SELECT store_id FROM node_store
+                                WHERE node_name=?)
+                ORDER BY node_id DESC
+                LIMIT 1
+            """, (name,))
+            found = cursor.fetchone()
+        return found[0] if found else None
+
+    def version(self, name):
+        """Return token that changes each time node `name` is saved
+        (None for nodes saved before versions were recorded).
+
+        """
+        with self._connect() as connection:
+            cursor = connection.cursor()
+            cursor.execute("""
+                SELECT version
+                FROM node_store_version
+                WHERE store_id=(SELECT store_id FROM node_store
+                                WHERE node_name=?)
+            """, (name,))
+            found = cursor.fetchone()
+        return found[0] if found else None
+
+    def summaries(self):
+        """Return dictionary of node names and summaries (node hash,
+        hierarchy list, and edge rows--see gpn.catalog._read_summary())
+        read with one query per table.
+
+        """
+        with self._connect() as connection:
+            cursor = connection.cursor()
+            cursor.execute('SELECT store_id, node_name FROM node_store')
+            names = dict(cursor.fetchall())
+            summaries = dict((x, [None, [], []]) for x in names.values())
+
+            cursor.execute("""
+                SELECT store_id, node_hash
+                FROM store_node
+                ORDER BY store_id, node_id
+            """)
+            for store_id, node_hash in cursor:
+                summaries[names[store_id]][0] = node_hash  # Last one wins.
+
+            cursor.execute("""
+                SELECT store_id, hierarchy_value
+                FROM store_hierarchy
+                ORDER BY store_id, hierarchy_level
+            """)
+            for store_id, hierarchy_value in cursor:
+                summaries[names[store_id]][1].append(hierarchy_value)
+
+            cursor.execute("""
+                SELECT edge.store_id, other_node_hash, other_node_name,
+                       edge_name, edge_order, property_val
+                FROM store_edge AS edge
+                LEFT JOIN store_property AS property
+                    ON property.store_id=edge.store_id
+                       AND property_key=('edge_statistics:' || edge_id)
+                ORDER BY edge.store_id, other_node_hash, edge_order
+            """)
+            for row in cursor:
+                statistics = json.loads(row[5]) if row[5] else {}
+                edge_row = tuple(row[1:5]) + (statistics,)
+                summaries[names[row[0]]][2].append(edge_row)
+
+        return dict((k, tuple(v)) for k, v in summaries.items())
+
+    def query(self, operation, parameters=(), names=None):
+        """Run `operation` (see gpn.graph.Graph.query()) against the
+        stored rows of each node in `names` (default: all nodes) and
+        yield result rows with the node name as the first column.
+
+        Nodes are not loaded.  Each "{schema}.<table>" in the operation
+        is replaced with a common table expression that selects the
+        node's rows from store_<table>, and up to 100 nodes are queried
+        with one UNION ALL statement.
+
+        """
+        global _node_tables
+        parameters = list(parameters)
+        store_ids = self._names()
+        names = sorted(store_ids) if names is None else list(names)
+
+        marker = '_gpn_schema_'
+        sql = operation.format(schema=marker)
+        tables = sorted(set(re.findall(re.escape(marker) + r'\.(\w+)', sql)))
+        for table in tables:
+            assert table in _node_tables, 'Table %r is not stored.' % table
+        sql = sql.replace(marker + '.', '')
+        assert marker not in sql, 'Tables must be qualified as {schema}.<table>.'
+
+        columns = _get_store_columns()
+        ctes = ['%s AS (SELECT %s FROM store_%s WHERE store_id=?)'
+                % (table, ', '.join(x[0] for x in columns[table]), table)
+                for table in tables]
+        if ctes:
+            sql = 'WITH %s\n%s' % (',\n'.join(ctes), sql)
+        select = 'SELECT ? AS node_name, * FROM (%s)' % sql
+
+        batch_size = 100  # <- Well below SQLite's compound SELECT limit.
+        with self._connect() as connection:
+            cursor = connection.cursor()
+            for start in range(0, len(names), batch_size):
+                batch = names[start:start + batch_size]
+                params = []
+                for name in batch:
+                    params.append(name)
+                    params.extend([store_ids[name]] * len(tables))
+                    params.extend(parameters)
+                cursor.execute('\nUNION ALL\n'.join([select] * len(batch)),
+                               params)
+                for row in cursor:
+                    yield tuple(row)
+
+    def read_relations(self, name, other_node_hash, edge_name=None,
+                       weight_name=None):
+        """Return list of (other_cell_id, cell_id, weight) rows for the
+        edge in node `name` that refers to `other_node_hash` (see
+        gpn.graph._read_relations()) using a single store query.
+
+        """
+        if edge_name is None:
+            edge_clause = ('edge_order=(SELECT MIN(edge_order) '
+                           '            FROM store_edge '
+                           '            WHERE store_id=edge.store_id '
+                           '                  AND other_node_hash=?)')
+            edge_param = other_node_hash
+        else:
+            edge_clause = 'edge_name=?'
+            edge_param = edge_name
+
+        if weight_name is None:
+            weight_clause = ('weight_id=(SELECT weight_id FROM store_weight '
+                             '           WHERE store_id=edge.store_id '
+                             '                 AND edge_id=edge.edge_id '
+                             '           ORDER BY weight_order IS NULL, '
+                             '                    weight_order, weight_id '
+                             '           LIMIT 1)')
+            weight_params = ()
+        else:
+            weight_clause = 'weight_name=?'
+            weight_params = (weight_name,)
+
+        query = """
+            SELECT relation.other_cell_id, relation.cell_id,
+                   relation_weight.weight
+            FROM store_edge AS edge
+            JOIN store_relation AS relation
+                ON relation.store_id=edge.store_id
+                   AND relation.edge_id=edge.edge_id
+            LEFT JOIN store_weight AS weight
+                ON weight.store_id=edge.store_id
+                   AND weight.edge_id=edge.edge_id AND weight.%s
+            LEFT JOIN store_relation_weight AS relation_weight
+                ON relation_weight.store_id=edge.store_id
+                   AND relation_weight.relation_id=relation.relation_id
+                   AND relation_weight.weight_id=weight.weight_id
+            WHERE edge.store_id=(SELECT store_id FROM node_store
+                                 WHERE node_name=?)
+                  AND edge.other_node_hash=? AND edge.%s
+        """ % (weight_clause, edge_clause)
+        params = weight_params + (name, other_node_hash, edge_param)
+
+        with self._connect() as connection:
+            cursor = connection.cursor()
+            cursor.execute(query, params)
+            relations = cursor.fetchall()
+
+        msg = 'No relations found for edge %r.' % (edge_name or other_node_hash)
+        assert relations, msg
+        return relations
@@ -3,9 +3,17 @@ import glob
 import os
 import shutil
 import tempfile
+try:
+    from StringIO import StringIO
+except ImportError:
+    from io import StringIO  # New stdlib location in 3.0
 
 from gpn.tests import _unittest as unittest
 
+from gpn.node import Node
+from gpn.graph import _node_hash
+from gpn import IN_MEMORY
+
 
 class MkdtempTestCase(unittest.TestCase):
     # TestCase changes cwd to temporary location.  After testing,
@@ -27,7 +35,9 @@ class MkdtempTestCase(unittest.TestCase):
             self.setUpClass.__func__(self)
 
     def tearDown(self):
-        for path in glob.glob(os.path.join(self._temp_dir, '*')):
+        paths = glob.glob(os.path.join(self._temp_dir, '*'))
+        paths += glob.glob(os.path.join(self._temp_dir, '.*'))  # Hidden files.
+        for path in paths:
             if os.path.isdir(path):
                 shutil.rmtree(path)
             else:
@@ -35,3 +45,39 @@ class MkdtempTestCase(unittest.TestCase):
 
         if self._no_class_fixtures:
             self.tearDownClass.__func__(self)
+
+
+def make_node(name, cells, path=None):
+    """Return node with cells from given CSV text (in memory unless
+    `path` is given).
+
+    """
+    if path:
+        node = Node(path)
+    else:
+        node = Node(mode=IN_MEMORY, name=name)
+    node._insert_cells(StringIO(cells))
+    return node
+
+
+def add_edge(node, other, relations, edge_name='unnamed'):
+    """Add edge to `node` referring to `other` with the given
+    (other_cell_id, cell_id, weight) relations.
+
+    """
+    connection = node._connect()
+    cursor = connection.cursor()
+    cursor.execute('INSERT INTO edge (edge_name, other_node_hash, '
+                   'other_node_name) VALUES (?, ?, ?)',
+                   (edge_name, _node_hash(other), other.name))
+    edge_id = cursor.lastrowid
+    cursor.execute('INSERT INTO weight (edge_id, weight_name, weight_order) '
+                   "VALUES (?, 'count', 1)", (edge_id,))
+    weight_id = cursor.lastrowid
+    for other_cell_id, cell_id, weight in relations:
+        cursor.execute('INSERT INTO relation (edge_id, other_cell_id, cell_id) '
+                       'VALUES (?, ?, ?)', (edge_id, other_cell_id, cell_id))
+        cursor.execute('INSERT INTO relation_weight '
+                       '(weight_id, relation_id, weight) VALUES (?, ?, ?)',
+                       (weight_id, cursor.lastrowid, weight))
+    connection.commit()
@@ -0,0 +1,231 @@
+# -*- coding: utf-8 -*-
+import json
+import os
+import subprocess
+import sys
+try:
+    from StringIO import StringIO
+except ImportError:
+    from io import StringIO  # New stdlib location in 3.0
+
+from gpn.tests import _unittest as unittest
+from gpn.tests.common import MkdtempTestCase
+
+from gpn.benchmarks import compare
+from gpn.benchmarks import memory
+from gpn.benchmarks import suite
+from gpn.benchmarks.__main__ import main
+from gpn.benchmarks.generator import iter_rows
+from gpn.node import Node
+from gpn import IN_MEMORY
+
+
+class TestGenerator(unittest.TestCase):
+    def test_rows(self):
+        rows = list(iter_rows(9, depth=3, fanout=3))
+        self.assertEqual(['level0', 'level1', 'level2'], rows[0])
+        self.assertEqual(10, len(rows))
+        self.assertEqual(set(['Root']), set(x[0] for x in rows[1:]))
+
+        label_sets = set(tuple(x) for x in rows[1:])
+        self.assertEqual(9, len(label_sets))  # <- All unique.
+
+    def test_cardinality(self):
+        rows = list(iter_rows(100, depth=3, fanout=10, cardinality=25))[1:]
+        leaf_labels = set(x[2] for x in rows)
+        self.assertEqual(25, len(leaf_labels))
+        self.assertEqual(100, len(set(tuple(x) for x in rows)))
+
+    def test_unmapped(self):
+        rows = list(iter_rows(1000, depth=4, fanout=10, unmapped=0.05))[1:]
+        unmapped = [x for x in rows if x[-1] == 'UNMAPPED']
+        self.assertGreater(len(unmapped), 25)
+        self.assertLess(len(unmapped), 75)
+
+        node = Node(mode=IN_MEMORY)
+        fh = StringIO('\n'.join(','.join(x) for x in iter_rows(
+            1000, depth=4, fanout=10, unmapped=0.05)))
+        node._insert_cells(fh)  # <- Passes all node constraints.
+
+    def test_too_many_cells(self):
+        with self.assertRaisesRegex(AssertionError, 'maximum is 100'):
+            list(iter_rows(101, depth=3, fanout=10))
+
+
+class TestSuite(unittest.TestCase):
+    def test_run(self):
+        results = suite.run(sizes=[50], lookups=5, graph_nodes=3,
+                            graph_cells=20, workers=[1, 2], modules=[])
+        self.assertIn('sqlite', results['environment'])
+
+        cases = [x['case'] for x in results['results']]
+        expected = [name for name, func in suite.node_cases]
+        expected += ['graph_load', 'graph_load']
+        self.assertEqual(expected, cases)
+        for result in results['results']:
+            self.assertGreaterEqual(result['seconds'], 0)
+
+    def test_main(self):
+        orig_stdout, orig_stderr = sys.stdout, sys.stderr
+        sys.stdout, sys.stderr = StringIO(), StringIO()
+        try:
+            main(['--sizes', '20', '--lookups', '2', '--graph-nodes', '0',
+                  '--modules', ''])
+            output = sys.stdout.getvalue()
+        finally:
+            sys.stdout, sys.stderr = orig_stdout, orig_stderr
+        results = json.loads(output)
+        self.assertEqual(len(suite.node_cases), len(results['results']))
+
+
+@unittest.skipIf(sys.version_info < (3, 7), 'requires -X importtime')
+class TestImport(unittest.TestCase):
+    def test_run(self):
+        results = suite.run(sizes=[], graph_nodes=0, cases=['import'],
+                            modules=['gpn', 'gpn.graph'])
+        modules = [x['module'] for x in results['results']]
+        self.assertEqual(['gpn', 'gpn.graph'], modules)
+
+        gpn_time, graph_time = [x['seconds'] for x in results['results']]
+        self.assertGreater(graph_time, gpn_time)
+
+    def test_lazy_package(self):
+        """Importing gpn should not import its submodules."""
+        env = dict(os.environ)
+        package_dir = os.path.dirname(os.path.dirname(suite.gpn.__file__))
+        env['PYTHONPATH'] = os.path.abspath(package_dir)
+        code = ('import gpn, sys; '
+                'print([x for x in sys.modules if x.startswith("gpn.")])')
+        process = subprocess.Popen([sys.executable, '-c', code],
+                                   stdout=subprocess.PIPE, env=env)
+        self.assertEqual(b'[]', process.communicate()[0].strip())
+
+
+class TestCompare(MkdtempTestCase):
+    def test_change_interval(self):
+        change, low, high = compare.change_interval([1.0, 1.0], [1.5, 1.5])
+        self.assertEqual((50.0, 50.0, 50.0), (change, low, high))
+
+        change, low, high = compare.change_interval([1.0, 1.2, 1.1],
+                                                    [1.3, 1.1, 1.2])
+        self.assertAlmostEqual(9.0909, change, places=4)
+        self.assertLess(low, 0)   # <- Interval includes zero
+        self.assertGreater(high, 0)  # so change may be noise.
+
+        change, low, high = compare.change_interval([1.0], [2.0])
+        self.assertEqual(float('-inf'), low)  # <- Needs repeats.
+
+    def test_compare(self):
+        baseline = {'results': [
+            {'case': 'select_cell', 'cells': 10, 'seconds': 1.0,
+             'samples': [0.9, 1.0, 1.1]},
+            {'case': 'open', 'cells': 10, 'seconds': 1.0,
+             'samples': [0.9, 1.0, 1.1]}]}
+        current = {'results': [
+            {'case': 'select_cell', 'cells': 10, 'seconds': 2.0,
+             'samples': [1.9, 2.0, 2.1]},
+            {'case': 'open', 'cells': 10, 'seconds': 1.05,
+             'samples': [0.95, 1.05, 1.15]},
+            {'case': 'open', 'cells': 99, 'seconds': 5.0}]}  # <- No baseline.
+        rows = compare.compare(baseline, current, threshold=10.0)
+        self.assertEqual(['select_cell', 'open'], [x['case'] for x in rows])
+        self.assertEqual([True, False], [x['regression'] for x in rows])
+        self.assertIn('REGRESSION', compare.format_report(rows))
+
+    def test_insufficient_samples(self):
+        baseline = {'results': [{'case': 'open', 'cells': 10,
+                                 'seconds': 1.0, 'samples': [1.0]}]}
+        current = {'results': [{'case': 'open', 'cells': 10,
+                                'seconds': 5.0, 'samples': [5.0]}]}
+        rows = compare.compare(baseline, current)
+        self.assertEqual([True], [x['insufficient'] for x in rows])
+        self.assertIn('INSUFFICIENT SAMPLES', compare.format_report(rows))
+
+        with open('baseline.json', 'w') as fh:
+            json.dump(baseline, fh)  # <- Older baseline with one sample.
+        current['results'][0]['samples'] = [5.0, 5.1, 4.9]
+        orig_run = suite.run
+        suite.run = lambda **kwds: current
+        orig_stderr = sys.stderr
+        sys.stderr = StringIO()
+        try:
+            with self.assertRaises(SystemExit):
+                main(['--repeat', '1', '--baseline', 'baseline.json'])
+            status = main(['--repeat', '3', '--output', 'current.json',
+                           '--baseline', 'baseline.json'])
+            self.assertEqual(1, status)
+        finally:
+            sys.stderr = orig_stderr
+            suite.run = orig_run
+
+    def test_exit_status(self):
+        baseline = {'results': [{'case': 'open', 'cells': 20,
+                                 'workers': None, 'seconds': 1.0,
+                                 'samples': [1.0, 1.1, 0.9]}]}
+        with open('baseline.json', 'w') as fh:
+            json.dump(baseline, fh)
+
+        # Fixed timings keep the comparison independent of machine load.
+        current = {'results': [{'case': 'open', 'cells': 20,
+                                'workers': None, 'seconds': 2.0,
+                                'samples': [2.0, 2.1, 1.9]}]}
+        orig_run = suite.run
+        suite.run = lambda **kwds: current
+        orig_stderr = sys.stderr
+        sys.stderr = StringIO()
+        try:
+            args = ['--sizes', '20', '--lookups', '2', '--graph-nodes', '0',
+                    '--repeat', '3', '--cases', 'open', '--output',
+                    'current.json']
+            status = main(args + ['--baseline', 'baseline.json'])
+            self.assertEqual(1, status)
+
+            status = main(args + ['--save-baseline', 'baseline.json'])
+            self.assertEqual(0, status)
+        finally:
+            sys.stderr = orig_stderr
+            suite.run = orig_run
+        with open('baseline.json') as fh:
+            self.assertEqual(3, len(json.load(fh)['results'][0]['samples']))
+
+
+class TestMemory(MkdtempTestCase):
+    @unittest.skipIf(not memory.tracemalloc, 'tracemalloc not available.')
+    def test_profile_memory(self):
+        def allocate(context):
+            context['data'] = [str(x) * 10 for x in range(20000)]
+        result = memory.profile_memory(allocate, {}, top=3)
+        self.assertGreater(result['python_peak'], 500000)
+        self.assertEqual(3, len(result['python_top']))
+        top_site = result['python_top'][0]['site']
+        self.assertIn('test_benchmarks.py', top_site)
+
+    def test_sqlite_memory(self):
+        node = Node('fixture.node')
+        node._insert_cells(StringIO('state,county\nIndiana,LaPorte\n'))
+        settings = memory.sqlite_settings('fixture.node')
+        self.assertGreater(settings['page_count'], 0)
+        self.assertGreater(settings['cache_bytes'], 0)
+
+        def query(context):
+            list(Node('fixture.node').select_cell(state='Indiana'))
+        result = memory.profile_memory(query, {})
+        if memory._get_sqlite_library():
+            self.assertGreater(result['sqlite_peak'], 0)
+
+    def test_compare_memory(self):
+        baseline = {'results': [{'case': 'open', 'cells': 10, 'seconds': 1.0,
+                                 'memory': {'python_peak': 1000,
+                                            'sqlite_peak': 1000}}]}
+        current = {'results': [{'case': 'open', 'cells': 10, 'seconds': 1.0,
+                                'memory': {'python_peak': 1500,
+                                           'sqlite_peak': 1000}}]}
+        row = compare.compare(baseline, current, threshold=10.0)[0]
+        self.assertEqual(25.0, row['memory_change'])
+        self.assertTrue(row['memory_regression'])
+        self.assertFalse(row['regression'])
+        self.assertIn('MEMORY REGRESSION', compare.format_report([row]))
+
+
+if __name__ == '__main__':
+    unittest.main()
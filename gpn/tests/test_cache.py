@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+import os
+from decimal import Decimal
+
+from gpn.tests import _unittest as unittest
+from gpn.tests.common import MkdtempTestCase
+
+from gpn.cache import TranslationCache
+
+
+class TestTranslationCache(unittest.TestCase):
+    def test_make_key(self):
+        key = TranslationCache.make_key(['aaa', 'bbb', 'ccc'])
+        self.assertEqual('aaa|bbb|ccc|None,None|None', key)
+
+        key = TranslationCache.make_key(['aaa', 'bbb'], ['e1'], 'population')
+        self.assertEqual('aaa|bbb|e1|population', key)
+
+        key = TranslationCache.make_key(['aaa', 'bbb'], ['e1'], None, ['v1'])
+        self.assertEqual('aaa|bbb|e1|None|v1', key)
+
+    def test_get_and_put(self):
+        cache = TranslationCache()
+        self.assertIsNone(cache.get('aaa|bbb'))
+
+        rows = [(1, 2, Decimal('0.5')), (1, 3, Decimal('0.5')), (2, 4, None)]
+        cache.put('aaa|bbb', rows)
+        self.assertIn('aaa|bbb', cache)
+        self.assertEqual(rows, cache.get('aaa|bbb'))
+
+        cache.put('aaa|bbb', [(5, 6, None)])  # <- Replace entry.
+        self.assertEqual([(5, 6, None)], cache.get('aaa|bbb'))
+        self.assertEqual(1, len(cache))
+
+    def test_lru_eviction(self):
+        cache = TranslationCache(maxsize=2)
+        cache.put('a', [(1, 1, None)])
+        cache.put('b', [(2, 2, None)])
+        cache.get('a')                  # <- Makes 'b' least recently used.
+        cache.put('c', [(3, 3, None)])  # <- Evicts 'b'.
+
+        self.assertIn('a', cache)
+        self.assertNotIn('b', cache)
+        self.assertIn('c', cache)
+        self.assertEqual(2, len(cache))
+
+    def test_clear(self):
+        cache = TranslationCache()
+        cache.put('a', [(1, 1, None)])
+        cache.clear()
+        self.assertEqual(0, len(cache))
+
+
+class TestPersistentCache(MkdtempTestCase):
+    def test_persistence(self):
+        rows = [(1, 2, Decimal('0.25'))]
+        cache = TranslationCache('cachefile')
+        cache.put('aaa|bbb', rows)
+        del cache
+        self.assertTrue(os.path.isfile('cachefile'))
+
+        cache = TranslationCache('cachefile')  # <- Reopen existing file.
+        self.assertEqual(rows, cache.get('aaa|bbb'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+import os
+import warnings
+
+from gpn.tests import _unittest as unittest
+from gpn.tests.common import MkdtempTestCase
+from gpn.tests.common import make_node
+from gpn.tests.common import add_edge
+
+import gpn.catalog
+from gpn.catalog import _Catalog
+from gpn.catalog import _read_summary
+from gpn.graph import Edge
+from gpn.graph import Graph
+from gpn.graph import _node_hash
+
+
+class TestCatalog(MkdtempTestCase):
+    def setUp(self):
+        super(TestCatalog, self).setUp()
+        self.a = make_node('a', 'country,region\nUSA,East\n', 'a.node')
+        self.b = make_node('b', 'country,state\nUSA,NY\n', 'b.node')
+        add_edge(self.b, self.a, [(1, 1, 1)])
+
+        # Count number of files read.
+        self._orig_read_summary = gpn.catalog._read_summary
+        self.read_count = 0
+        def counting_read_summary(node):
+            self.read_count += 1
+            return self._orig_read_summary(node)
+        gpn.catalog._read_summary = counting_read_summary
+
+    def tearDown(self):
+        gpn.catalog._read_summary = self._orig_read_summary
+        super(TestCatalog, self).tearDown()
+
+    def test_read_summary(self):
+        node_hash, hierarchy, edge_rows = _read_summary(self.b)
+        self.assertEqual(_node_hash(self.b), node_hash)
+        self.assertEqual(['country', 'state'], hierarchy)
+        expected = [(_node_hash(self.a), 'a', 'unnamed', 1, {})]
+        self.assertEqual(expected, edge_rows)
+
+    def test_sync(self):
+        catalog = _Catalog('catalogfile')
+        catalog.sync('.', ['a.node', 'b.node'])
+        summaries = catalog.summaries()
+        self.assertEqual(['a.node', 'b.node'], sorted(summaries))
+        self.assertEqual(2, self.read_count)
+
+        catalog.sync('.', ['a.node', 'b.node'])  # <- Files unchanged.
+        self.assertEqual(2, self.read_count)
+
+        add_edge(self.a, self.b, [(1, 1, 1)])      # <- Change 'a.node'.
+        os.utime('a.node', (0, 0))
+        catalog.sync('.', ['a.node', 'b.node'])
+        self.assertEqual(3, self.read_count)
+        summaries = catalog.summaries(['a.node'])
+        self.assertEqual(['a.node'], list(summaries))
+        self.assertEqual(1, len(summaries['a.node'][2]))
+
+        catalog.sync('.', ['a.node'])  # <- File removed.
+        self.assertEqual(['a.node'], list(catalog.summaries()))
+
+    def test_invalid_file(self):
+        with open('bad.node', 'w') as fh:
+            fh.write('Invalid file contents.')
+        catalog = _Catalog()
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter('always')
+            catalog.sync('.', ['a.node', 'bad.node'])
+        self.assertEqual(['a.node'], list(catalog.summaries()))
+        self.assertEqual(1, len(caught))
+
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter('always')
+            catalog.sync('.', ['a.node', 'bad.node'])  # <- Not reopened.
+        self.assertEqual(0, len(caught))
+
+    def test_workers(self):
+        for name in 'cdefgh':
+            make_node(name, 'country,zone\nUSA,%s\n' % name, name + '.node')
+        filenames = sorted(x for x in os.listdir('.') if x.endswith('.node'))
+
+        expected = _Catalog()
+        expected.sync('.', filenames, workers=1)
+        result = _Catalog()
+        result.sync('.', filenames, workers=4)
+        self.assertEqual(expected.summaries(), result.summaries())
+
+    def test_graph_workers(self):
+        graph = Graph('.', workers=4)
+        self.assertEqual([Edge('a', 'b', 'unnamed', 1)], graph.edges)
+
+    def test_graph_startup(self):
+        graph = Graph('.')
+        self.assertEqual([Edge('a', 'b', 'unnamed', 1)], graph.edges)
+        self.assertEqual(['country', 'state'], graph.hierarchy('b'))
+        self.assertTrue(os.path.isfile('.gpn-catalog'))
+        self.assertEqual(2, self.read_count)
+
+        graph = Graph('.')  # <- Uses existing catalog.
+        self.assertEqual([Edge('a', 'b', 'unnamed', 1)], graph.edges)
+        self.assertEqual(2, self.read_count)
+        self.assertEqual(0, len(graph.nodes._open))
+
+    def test_graph_without_catalog_file(self):
+        graph = Graph('.', catalog=False)
+        self.assertEqual([Edge('a', 'b', 'unnamed', 1)], graph.edges)
+        self.assertFalse(os.path.exists('.gpn-catalog'))
+
+
+if __name__ == '__main__':
+    unittest.main()
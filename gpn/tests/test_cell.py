@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+import pickle
+try:
+    from collections.abc import Mapping  # New location in 3.3
+except ImportError:
+    from collections import Mapping
+
+from gpn.tests import _unittest as unittest
+from gpn.tests.common import make_node
+
+from gpn.cell import Cell
+from gpn.cell import CellHierarchy
+
+
+class TestCell(unittest.TestCase):
+    def setUp(self):
+        self.hierarchy = CellHierarchy(['state', 'county'])
+        self.cell = Cell(self.hierarchy, ('OH', 'Franklin'), cell_id=3)
+
+    def test_mapping(self):
+        cell = self.cell
+        self.assertEqual('Franklin', cell['county'])
+        self.assertEqual(['state', 'county'], list(cell))
+        self.assertEqual(2, len(cell))
+        self.assertIn('state', cell)
+        self.assertNotIn('town', cell)
+        self.assertIsNone(cell.get('town'))
+        self.assertEqual([('state', 'OH'), ('county', 'Franklin')],
+                         list(cell.items()))
+        with self.assertRaises(KeyError):
+            cell['town']
+
+    def test_equality(self):
+        expected = {'state': 'OH', 'county': 'Franklin'}
+        self.assertEqual(expected, self.cell)
+        self.assertEqual(self.cell, expected)
+        self.assertEqual(expected, dict(self.cell))
+
+    def test_slots(self):
+        with self.assertRaises(AttributeError):
+            self.cell.other = 1
+        self.assertFalse(hasattr(self.cell, '__dict__'))
+        self.assertIsInstance(self.cell, Mapping)
+
+    def test_pickle(self):
+        cell = pickle.loads(pickle.dumps(self.cell, pickle.HIGHEST_PROTOCOL))
+        self.assertEqual(self.cell, cell)
+        self.assertEqual(3, cell.cell_id)
+
+    def test_label_count(self):
+        with self.assertRaisesRegex(AssertionError, 'one label per level'):
+            Cell(self.hierarchy, ('OH',))
+
+
+class TestRowFactory(unittest.TestCase):
+    def setUp(self):
+        self.node = make_node('counties', 'state,county\n'
+                                          'OH,Franklin\n'
+                                          'OH,Hamilton\n')
+
+    def test_select_cell(self):
+        expected = list(self.node.select_cell(state='OH'))
+        self.node.row_factory = Cell
+        cells = list(self.node.select_cell(state='OH'))
+        self.assertEqual(expected, cells)
+        self.assertEqual([1, 2], [x.cell_id for x in cells])
+        self.assertIs(cells[0].hierarchy, cells[1].hierarchy)  # <- Shared.
+        self.assertIs(cells[0]['state'], cells[1]['state'])
+
+    def test_snapshot(self):
+        self.node.row_factory = Cell
+        cell = self.node.snapshot().get_cell(2)
+        self.assertIsInstance(cell, Cell)
+        self.assertEqual({'state': 'OH', 'county': 'Hamilton'}, cell)
+
+    def test_default(self):
+        row = next(self.node.select_cell(county='Hamilton'))
+        self.assertIs(dict, type(row))
+
+
+if __name__ == '__main__':
+    unittest.main()
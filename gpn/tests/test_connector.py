@@ -6,7 +6,7 @@ import sqlite3
 from gpn.tests import _unittest as unittest
 from gpn.tests.common import MkdtempTestCase
 
-from gpn.connector import _schema
+from gpn.connector import _get_schema
 from gpn.connector import _get_schema_dict
 from gpn.connector import _expensive_constraints
 from gpn.connector import _normalize_args_for_trigger
@@ -245,7 +245,7 @@ class TestGetSchemaDict_ConstraintNames(unittest.TestCase):
         schema_dict = _get_schema_dict()
 
         self.assertIsInstance(schema_dict, dict)
-        self.assertSetEqual(set(_schema), set(schema_dict.values()))
+        self.assertSetEqual(set(_get_schema()), set(schema_dict.values()))
 
         keys = list(schema_dict.keys())
         self.assertIn('cell', keys)  # Table
@@ -275,12 +275,11 @@ class TestGetSchemaDict_ConstraintNames(unittest.TestCase):
 
 class TestConnector(MkdtempTestCase):
     def _make_database(self, filename):
-        global _schema
         self._existing_node = filename
         connection = sqlite3.connect(self._existing_node)
         cursor = connection.cursor()
         cursor.execute('PRAGMA synchronous=OFF')
-        for operation in _schema:
+        for operation in _get_schema():
             cursor.execute(operation)
         cursor.execute('PRAGMA synchronous=FULL')
         connection.close()
@@ -3,11 +3,32 @@ try:
     from StringIO import StringIO
 except ImportError:
     from io import StringIO  # New stdlib location in 3.0
+import os
+import random
+import shutil
+import sqlite3
+import threading
+import time
+import warnings
+from decimal import Decimal
+from xml.etree import ElementTree
+try:
+    import networkx
+except ImportError:
+    networkx = None
 
 from gpn.tests import _unittest as unittest
 from gpn.tests.common import MkdtempTestCase
+from gpn.tests.common import make_node
+from gpn.tests.common import add_edge
 
+import gpn.graph
+from gpn.graph import Edge
 from gpn.graph import Graph
+from gpn.graph import _add_edge
+from gpn.graph import _adjacency_attrs
+from gpn.graph import _node_hash
+from gpn.graph import _tarjan
 from gpn.node import Node
 from gpn import IN_MEMORY
 
@@ -30,6 +51,743 @@ class TestInstantiation(MkdtempTestCase):
         node_names = set(graph.nodes.keys())
         self.assertSetEqual(set(['old_boundary', 'new_boundary']), node_names)
 
+    def test_from_other_directory(self):
+        os.mkdir('subdir')
+        Node('subdir/old_boundary.node')
+        graph = Graph(path='subdir')
+
+        self.assertEqual(['old_boundary'], list(graph.nodes.keys()))
+        self.assertIsInstance(graph.nodes['old_boundary'], Node)
+        self.assertFalse(os.path.exists('old_boundary.node'))
+
+    def test_lazy_loading(self):
+        """Nodes should not be opened until accessed."""
+        Node('old_boundary.node')
+        Node('new_boundary.node')
+        with open('not_a_node.node', 'w') as fh:
+            fh.write('Invalid file contents.')
+        graph = Graph(path='.')  # <- Invalid file is not opened.
+
+        self.assertIn('not_a_node', graph.nodes)
+        self.assertEqual(3, len(graph.nodes))
+        self.assertEqual(0, len(graph.nodes._open))
+
+        graph.nodes['old_boundary']
+        self.assertEqual(['old_boundary'], list(graph.nodes._open))
+        with self.assertRaisesRegex(Exception, 'not a valid node'):
+            graph.nodes['not_a_node']
+
+    def test_max_open(self):
+        for name in ('a', 'b', 'c'):
+            Node(name + '.node')
+        graph = Graph(path='.', max_open=2)
+
+        node_a = graph.nodes['a']
+        graph.nodes['b']
+        graph.nodes['a']  # <- Makes 'b' least recently used.
+        graph.nodes['c']
+        self.assertEqual(['a', 'c'], list(graph.nodes._open))
+        self.assertIs(node_a, graph.nodes['a'])
+
+    def test_sub_folders(self):
+        os.makedirs(os.path.join('east', 'north'))
+        os.mkdir('west')
+        os.mkdir('.hidden')
+        Node('top.node')
+        Node(os.path.join('east', 'ny.node'))
+        Node(os.path.join('east', 'north', 'vt.node'))
+        Node(os.path.join('west', 'ca.node'))
+        Node(os.path.join('.hidden', 'skip.node'))
+
+        graph = Graph(path='.')  # <- Default depth is 0.
+        self.assertEqual(['top'], list(graph.nodes))
+
+        graph = Graph(path='.', depth=1)
+        self.assertEqual(['east/ny', 'top', 'west/ca'], list(graph.nodes))
+
+        graph = Graph(path='.', depth=None)
+        expected = ['east/north/vt', 'east/ny', 'top', 'west/ca']
+        self.assertEqual(expected, list(graph.nodes))
+        self.assertIsInstance(graph.nodes['east/north/vt'], Node)
+
+    def test_node_names(self):
+        """Opened nodes are named by their keys (not by file path)."""
+        os.mkdir('east')
+        Node(os.path.join('east', 'ny.node'))
+        Node('top.node-default')
+        graph = Graph(path='.', depth=1)
+        for name in ('east/ny', 'top'):
+            self.assertEqual(name, graph.nodes[name].name)
+
+        graph = Graph(path='east')
+        self.assertEqual('ny', graph.nodes['ny'].name)
+
+    def test_components(self):
+        os.makedirs(os.path.join('east', 'north'))
+        os.mkdir('west')
+        Node(os.path.join('east', 'ny.node'))
+        Node(os.path.join('east', 'north', 'vt.node'))
+        Node(os.path.join('west', 'ca.node'))
+
+        graph = Graph(path='.')
+        expected = ['east', 'east/north', 'west']
+        self.assertEqual(expected, graph.component_names())
+
+        east = graph.component('east')
+        self.assertEqual(['ny'], list(east.nodes))
+        self.assertIs(east, graph.component('east'))
+        self.assertEqual(['vt'], list(graph.component('east/north').nodes))
+        self.assertNotIn('west', graph._subgraphs)  # <- Not loaded.
+
+        with self.assertRaisesRegex(AssertionError, 'not a component'):
+            graph.component('south')
+
+    def test_default_suffix(self):
+        Node('boundary.node-default')
+        Node('other.node-default')
+        Node('other.node')
+        graph = Graph(path='.')
+        self.assertEqual(['boundary', 'other'], list(graph.nodes))
+        self.assertEqual('other.node', graph.nodes._filenames['other'])
+
+
+class TestGetHash(MkdtempTestCase):
+    def test_from_collection(self):
+        a = make_node('a', 'country,region\nUSA,East\n')
+        b = make_node('b', 'country,state\nUSA,NY\n')
+        first = Graph(nodes=[a, b]).get_hash()
+        self.assertEqual(first, Graph(nodes=[b, a]).get_hash())
+
+        b._insert_cells(StringIO('country,state\nUSA,PA\n'))
+        self.assertNotEqual(first, Graph(nodes=[a, b]).get_hash())
+
+    def test_from_directory(self):
+        a = make_node('a', 'country,region\nUSA,East\n', 'a.node')
+        make_node('b', 'country,state\nUSA,NY\n', 'b.node')
+        graph = Graph('.')
+        self.assertEqual(Graph(nodes=[a, Node('b.node')]).get_hash(),
+                         graph.get_hash())
+
+    def test_unnamed_node(self):
+        node = make_node(None, 'country,region\nUSA,East\n')
+        with warnings.catch_warnings(record=True):
+            warnings.simplefilter('always')
+            graph = Graph(nodes=[node])
+        self.assertEqual([node.get_hash()[:12]], list(graph.nodes))
+
+        with self.assertRaisesRegex(AssertionError, 'unnamed and has no'):
+            Graph(nodes=[Node(mode=IN_MEMORY)])
+
+
+class TestTranslate(unittest.TestCase):
+    def setUp(self):
+        self.a = make_node('a', 'country,region\n'
+                                 'USA,East\n'       # 1
+                                 'USA,West\n')      # 2
+        self.b = make_node('b', 'country,state\n'
+                                 'USA,NY\n'         # 1
+                                 'USA,PA\n'         # 2
+                                 'USA,CA\n')        # 3
+        self.c = make_node('c', 'country,zone\n'
+                                 'USA,Atlantic\n'   # 1
+                                 'USA,Pacific\n')   # 2
+        add_edge(self.b, self.a, [(1, 1, Decimal('0.5')),
+                                   (1, 2, Decimal('0.5')),
+                                   (2, 3, Decimal('1'))])
+        add_edge(self.c, self.b, [(1, 1, Decimal('1')),
+                                   (2, 1, Decimal('1')),
+                                   (3, 2, Decimal('1'))])
+        self.graph = Graph(nodes=[self.a, self.b, self.c])
+
+    def test_single_step(self):
+        result = self.graph.translate(['a', 'b'])
+        expected = [(1, 1, Decimal('0.5')),
+                    (1, 2, Decimal('0.5')),
+                    (2, 3, Decimal('1'))]
+        self.assertEqual(expected, result)
+
+    def test_multiple_steps(self):
+        result = self.graph.translate(['a', 'b', 'c'])
+        expected = [(1, 1, Decimal('1.0')), (2, 2, Decimal('1'))]
+        self.assertEqual(expected, result)
+
+    def test_cached(self):
+        key = self.graph._get_cache().make_key(
+            [_node_hash(self.a), _node_hash(self.b), _node_hash(self.c)],
+            [None, None], None,
+            [self.b._change_token(), self.c._change_token()])
+        self.assertNotIn(key, self.graph._get_cache())
+
+        first = self.graph.translate(['a', 'b', 'c'])
+        self.assertIn(key, self.graph._get_cache())
+        second = self.graph.translate(['a', 'b', 'c'])
+        self.assertEqual(first, second)
+
+    def test_edited_edge(self):
+        self.graph.translate(['a', 'b'])
+        with self.b._connect() as connection:
+            connection.execute('UPDATE relation_weight SET weight=? '
+                               'WHERE weight=?', (Decimal('0.25'),
+                                                  Decimal('0.5')))
+        result = self.graph.translate(['a', 'b'])  # <- Cells are unchanged.
+        expected = [(1, 1, Decimal('0.25')),
+                    (1, 2, Decimal('0.25')),
+                    (2, 3, Decimal('1'))]
+        self.assertEqual(expected, result)
+
+    def test_missing_edge(self):
+        with self.assertRaisesRegex(AssertionError, 'No relations found'):
+            self.graph.translate(['c', 'a'])
+
+    def test_retabulate(self):
+        result = self.graph.retabulate(['a', 'b'], {1: 10, 2: 4})
+        self.assertEqual({1: 5.0, 2: 5.0, 3: 4.0}, result)
+
+        result = self.graph.retabulate(['a', 'b', 'c'], {1: 10, 2: 4})
+        self.assertEqual({1: 10.0, 2: 4.0}, result)
+
+        with self.assertRaisesRegex(AssertionError, 'no relation'):
+            self.graph.retabulate(['a', 'b'], {99: 1})
+
+    def test_retabulate_unweighted(self):
+        d = make_node('d', 'country,area\n'
+                           'USA,North\n'   # 1
+                           'USA,South\n')  # 2
+        with d._connect() as connection:
+            cursor = connection.cursor()
+            cursor.execute('INSERT INTO edge (other_node_hash, '
+                           'other_node_name) VALUES (?, ?)',
+                           (_node_hash(self.a), 'a'))
+            cursor.executemany('INSERT INTO relation (edge_id, '
+                               'other_cell_id, cell_id) VALUES (?, ?, ?)',
+                               [(cursor.lastrowid, 1, 1),
+                                (cursor.lastrowid, 1, 2)])
+        graph = Graph(nodes=[self.a, d])
+        result = graph.retabulate(['a', 'd'], {1: 10})
+        self.assertEqual({1: 5.0, 2: 5.0}, result)  # <- Even split.
+
+
+class TestAdjacency(unittest.TestCase):
+    def setUp(self):
+        a = make_node('a', 'country,region\nUSA,East\n')
+        b = make_node('b', 'country,state\nUSA,NY\n')
+        c = make_node('c', 'country,zone\nUSA,Atlantic\n')
+        d = make_node('d', 'country,division\nUSA,Central\n')
+        outside = make_node('outside', 'country,area\nUSA,Other\n')
+        add_edge(b, a, [(1, 1, 1)])
+        add_edge(c, b, [(1, 1, 1)])
+        add_edge(a, c, [(1, 1, 1)], edge_name='first')
+        add_edge(a, c, [(1, 1, 1)], edge_name='second')
+        add_edge(d, outside, [(1, 1, 1)])  # <- Not in graph.
+        self.graph = Graph(nodes=[a, b, c, d])
+
+    def test_edges(self):
+        expected = [Edge('a', 'b', 'unnamed', 1),
+                    Edge('b', 'c', 'unnamed', 1),
+                    Edge('c', 'a', 'first', 1),
+                    Edge('c', 'a', 'second', 2)]
+        self.assertEqual(expected, self.graph.edges)
+
+        unresolved_names = [x[2] for x in self.graph._unresolved]
+        self.assertEqual(['outside'], unresolved_names)
+
+    def test_successors(self):
+        self.assertEqual(['b'], self.graph.successors('a'))
+        self.assertEqual(['a'], self.graph.successors('c'))
+        self.assertEqual([], self.graph.successors('d'))
+
+    def test_find_path(self):
+        self.assertEqual(['a', 'b', 'c'], self.graph.find_path('a', 'c'))
+        self.assertEqual(['c', 'a'], self.graph.find_path('c', 'a'))
+        self.assertEqual(['a'], self.graph.find_path('a', 'a'))
+        self.assertIsNone(self.graph.find_path('a', 'd'))
+
+    def test_find_path_no_sqlite(self):
+        """Path search should not open any node."""
+        self.graph.edges  # <- Load adjacency.
+        for node in self.graph.nodes.values():
+            def fail():
+                raise AssertionError('Node should not be opened.')
+            node._connect = fail
+        self.assertEqual(['b', 'c', 'a'], self.graph.find_path('b', 'a'))
+        self.assertEqual(2, len(self.graph.connected_components()))
+
+    def test_connected_components(self):
+        expected = [['a', 'b', 'c'], ['d']]
+        self.assertEqual(expected, self.graph.connected_components())
+
+
+class TestEdgeStatistics(unittest.TestCase):
+    def test_edge_statistics(self):
+        a = make_node('a', 'country,region\n'
+                            'USA,East\n'   # 1
+                            'USA,West\n')  # 2
+        b = make_node('b', 'country,state\n'
+                            'USA,NY\n'     # 1
+                            'USA,PA\n')    # 2 (3 is UNMAPPED)
+        add_edge(b, a, [(1, 1, Decimal('3')),
+                         (1, 2, Decimal('1')),
+                         (2, 2, Decimal('1')),
+                         (2, 3, Decimal('1'))])
+
+        connection = b._connect()
+        cursor = connection.cursor()
+        result = b._edge_statistics(cursor, 1)
+        expected = {'many_to_many': 0.5,      # (1, 2) and (2, 2).
+                    'weight_spread': 0.5,     # Not proportional, even split.
+                    'unmapped': 0.25}         # (2, 3).
+        self.assertEqual(expected, result)
+
+        cursor.execute('UPDATE weight SET proportional=1')
+        connection.commit()
+        result = b._edge_statistics(cursor, 1)
+        self.assertEqual(0.375, result['weight_spread'])  # (0.25 + 0.5) / 2
+
+    def test_stored_statistics(self):
+        a = make_node('a', 'country,region\nUSA,East\n')
+        b = make_node('b', 'country,state\nUSA,NY\n')
+        add_edge(b, a, [(1, 1, 1)])
+        b.update_edge_statistics()
+        b.update_edge_statistics()  # <- Should replace, not duplicate.
+
+        graph = Graph(nodes=[a, b])
+        edge = Edge('a', 'b', 'unnamed', 1)
+        expected = {'many_to_many': 0.0, 'weight_spread': 0.0, 'unmapped': 0.0}
+        self.assertEqual(expected, graph._edge_statistics[edge])
+
+
+class TestWeightedPath(unittest.TestCase):
+    def setUp(self):
+        self.a = make_node('a', 'country,region\nUSA,East\nUSA,West\n')
+        self.b = make_node('b', 'country,state\nUSA,NY\nUSA,PA\n')
+        self.c = make_node('c', 'country,zone\nUSA,Atlantic\n')
+        self.d = make_node('d', 'country,division\nUSA,Central\n')
+        add_edge(self.b, self.a, [(1, 1, 1), (2, 2, 1)])  # a->b (exact)
+        add_edge(self.d, self.b, [(1, 1, 1), (2, 1, 1)])  # b->d (exact)
+        add_edge(self.c, self.a, [(1, 1, 1), (1, 2, 1),   # a->c (lossy)
+                                   (2, 1, 1), (2, 2, 1)])
+        add_edge(self.d, self.c, [(1, 1, 1)])             # c->d (exact)
+        for node in (self.b, self.c, self.d):
+            node.update_edge_statistics()
+        self.graph = Graph(nodes=[self.a, self.b, self.c, self.d])
+
+    def test_unweighted(self):
+        path = self.graph.find_path('a', 'd')
+        self.assertEqual(['a', 'b', 'd'], path)
+
+    def test_statistic_name(self):
+        path = self.graph.find_path('a', 'd', cost='many_to_many')
+        self.assertEqual(['a', 'b', 'd'], path)
+
+    def test_cost_function(self):
+        def prefer_c(edge, stats):
+            return 0 if 'c' in (edge.from_node, edge.to_node) else 10
+        path = self.graph.find_path('a', 'd', cost=prefer_c)
+        self.assertEqual(['a', 'c', 'd'], path)
+
+    def test_negative_cost(self):
+        with self.assertRaisesRegex(AssertionError, 'must not be negative'):
+            self.graph.find_path('a', 'd', cost=lambda edge, stats: -1)
+
+
+class TestReachability(unittest.TestCase):
+    def setUp(self):
+        nodes = dict((x, make_node(x, 'country,region\nUSA,%s\n' % x))
+                     for x in 'abcde')
+        add_edge(nodes['b'], nodes['a'], [(1, 1, 1)])  # a->b
+        add_edge(nodes['a'], nodes['b'], [(1, 1, 1)])  # b->a
+        add_edge(nodes['c'], nodes['b'], [(1, 1, 1)])  # b->c
+        add_edge(nodes['e'], nodes['d'], [(1, 1, 1)])  # d->e
+        self.graph = Graph(nodes=list(nodes.values()))
+
+    def test_tarjan(self):
+        successors = {'a': ['b'], 'b': ['c'], 'c': ['a', 'd'],
+                      'd': ['e'], 'e': ['d'], 'f': []}
+        result = _tarjan(sorted(successors), successors)
+        self.assertEqual([['d', 'e'], ['a', 'b', 'c'], ['f']], result)
+
+    def test_deep_graph(self):
+        """Iterative version should not exceed recursion limit."""
+        names = list(range(5000))
+        successors = dict((x, [x + 1]) for x in names[:-1])
+        successors[names[-1]] = [0]
+        result = _tarjan(names, successors)
+        self.assertEqual([names], result)
+
+    def test_components(self):
+        expected = [['a', 'b'], ['c'], ['d'], ['e']]
+        result = sorted(self.graph.strongly_connected_components())
+        self.assertEqual(expected, result)
+        self.assertFalse(self.graph.is_strongly_connected())
+
+    def test_is_reachable(self):
+        self.assertTrue(self.graph.is_reachable('a', 'c'))
+        self.assertTrue(self.graph.is_reachable('b', 'a'))
+        self.assertFalse(self.graph.is_reachable('c', 'a'))
+        self.assertFalse(self.graph.is_reachable('a', 'd'))
+        self.assertEqual(['a', 'b', 'c'], self.graph.reachable_from('a'))
+        self.assertEqual(['a', 'b', 'c'], self.graph.can_reach('c'))
+        self.assertEqual(['d', 'e'], self.graph.can_reach('e'))
+
+    def test_add_edge(self):
+        state = dict((x, getattr(self.graph, x)) for x in _adjacency_attrs)
+        _add_edge(state, Edge('c', 'd', 'unnamed', 1))  # <- No cycle.
+        self.graph.__dict__.update(state)
+        self.assertTrue(self.graph.is_reachable('a', 'e'))
+        self.assertEqual(['a', 'b', 'c', 'd', 'e'], self.graph.can_reach('e'))
+        self.assertEqual(4, len(self.graph.strongly_connected_components()))
+
+        _add_edge(state, Edge('e', 'a', 'unnamed', 1))  # <- Closes cycle.
+        self.graph.__dict__.update(state)
+        self.assertTrue(self.graph.is_strongly_connected())
+        self.assertTrue(self.graph.is_reachable('e', 'c'))
+
+
+class TestRefresh(MkdtempTestCase):
+    def setUp(self):
+        super(TestRefresh, self).setUp()
+        self.a = make_node('a', 'country,region\nUSA,East\n', 'a.node')
+        self.b = make_node('b', 'country,state\nUSA,NY\n', 'b.node')
+        add_edge(self.b, self.a, [(1, 1, 1)])
+        self.graph = Graph('.')
+
+    def tearDown(self):
+        self.graph.stop_polling()
+        super(TestRefresh, self).tearDown()
+
+    def test_no_changes(self):
+        self.assertEqual((set(), set(), set()), self.graph.refresh())
+
+    def test_refresh(self):
+        self.assertEqual([Edge('a', 'b', 'unnamed', 1)], self.graph.edges)
+        old_b = self.graph.nodes['b']
+
+        c = make_node('c', 'country,zone\nUSA,Atlantic\n', 'c.node')
+        add_edge(c, self.b, [(1, 1, 1)])  # <- Add node.
+        add_edge(self.b, c, [(1, 1, 1)])  # <- Change node.
+        os.utime('b.node', (0, 0))
+        os.remove('a.node')               # <- Remove node.
+
+        added, removed, changed = self.graph.refresh()
+        self.assertEqual((set(['c']), set(['a']), set(['b'])),
+                         (added, removed, changed))
+
+        self.assertEqual([Edge('b', 'c', 'unnamed', 1),
+                          Edge('c', 'b', 'unnamed', 1)], self.graph.edges)
+        self.assertTrue(self.graph.is_reachable('c', 'b'))
+        self.assertEqual(['b', 'c'], list(self.graph.nodes))
+        self.assertIsNot(old_b, self.graph.nodes['b'])
+
+    def _check_matches_reload(self):
+        """Refreshed graph should match a newly loaded graph."""
+        expected = Graph('.', catalog=False)
+        self.assertEqual(expected.edges, self.graph.edges)
+        self.assertEqual(sorted(expected._unresolved),
+                         sorted(self.graph._unresolved))
+        self.assertEqual(expected._node_hashes, self.graph._node_hashes)
+        self.assertEqual(expected._hash_index, self.graph._hash_index)
+        self.assertEqual(sorted(expected.strongly_connected_components()),
+                         sorted(self.graph.strongly_connected_components()))
+        for name in expected.nodes:
+            self.assertEqual(expected.reachable_from(name),
+                             self.graph.reachable_from(name))
+            self.assertEqual(expected.can_reach(name),
+                             self.graph.can_reach(name))
+
+    def test_incremental(self):
+        """Added edges should update the reachability index without
+        rebuilding it.
+
+        """
+        self.graph.edges  # <- Load edges.
+        rebuilds = []
+        orig_reachability = gpn.graph._reachability
+        def counting_reachability(adjacency):
+            rebuilds.append(adjacency)
+            return orig_reachability(adjacency)
+        gpn.graph._reachability = counting_reachability
+        try:
+            c = make_node('c', 'country,zone\nUSA,Atlantic\n', 'c.node')
+            add_edge(c, self.b, [(1, 1, 1)])
+            self.graph.refresh()
+            self.assertEqual([], rebuilds)
+            self.assertTrue(self.graph.is_reachable('a', 'c'))
+            self._check_matches_reload()
+
+            add_edge(self.a, c, [(1, 1, 1)])  # <- Closes a cycle.
+            del rebuilds[:]
+            self.graph.refresh()
+            self.assertEqual(1, len(rebuilds))
+            self.assertTrue(self.graph.is_strongly_connected())
+            self._check_matches_reload()
+        finally:
+            gpn.graph._reachability = orig_reachability
+
+    def test_new_edge_sorts_first(self):
+        """A new edge that closes a cycle should be indexed with the
+        existing edges even when it sorts before them.
+
+        """
+        c = make_node('c', 'country,zone\nUSA,Atlantic\n', 'c.node')
+        d = make_node('d', 'country,zone\nUSA,Pacific\n', 'd.node')
+        add_edge(c, d, [(1, 1, 1)])  # d->c
+        self.graph.refresh()
+        self.graph.edges  # <- Load edges.
+
+        add_edge(d, c, [(1, 1, 1)])  # c->d (sorts before d->c).
+        self.graph.refresh()
+        self.assertIn(['c', 'd'], self.graph.strongly_connected_components())
+        self.assertTrue(self.graph.is_reachable('d', 'c'))
+        self._check_matches_reload()
+
+    def test_random_changes(self):
+        """Refreshing after random changes should match a reload."""
+        rng = random.Random(0)
+        self.graph.edges  # <- Load edges.
+        present = set(['a', 'b'])
+        pairs = set([('a', 'b')])  # <- (from_node, to_node) edges in files.
+        for step in range(60):
+            action = rng.choice(['add', 'remove', 'edge', 'edge'])
+            if action == 'add' or len(present) < 2:
+                name = rng.choice('abcdef')
+                if name in present:
+                    continue
+                make_node(name, 'country,zone\nUSA,%s\n' % name,
+                          name + '.node')
+                present.add(name)
+                changed = name
+            elif action == 'remove':
+                name = rng.choice(sorted(present))
+                os.remove(name + '.node')
+                present.discard(name)
+                pairs = set(x for x in pairs if x[1] != name)
+                changed = None
+            else:
+                from_node, to_node = rng.sample(sorted(present), 2)
+                if (from_node, to_node) in pairs:
+                    continue
+                add_edge(Node(to_node + '.node'), Node(from_node + '.node'),
+                         [(1, 1, 1)])
+                pairs.add((from_node, to_node))
+                changed = to_node
+            if changed:
+                os.utime(changed + '.node', (step + 1, step + 1))
+            self.graph.refresh()
+            self._check_matches_reload()
+
+    def test_resolve_referrers(self):
+        """Edges in unchanged nodes should be resolved when the nodes
+        they refer to are added and unresolved when they are removed.
+
+        """
+        os.mkdir('staging')
+        c = make_node('c', 'country,zone\nUSA,Atlantic\n', 'staging/c.node')
+        add_edge(self.a, c, [(1, 1, 1)])
+        self.graph.refresh()
+        self.assertEqual([Edge('a', 'b', 'unnamed', 1)], self.graph.edges)
+        self._check_matches_reload()
+
+        os.rename('staging/c.node', 'c.node')
+        self.graph.refresh()
+        self.assertEqual([Edge('a', 'b', 'unnamed', 1),
+                          Edge('c', 'a', 'unnamed', 1)], self.graph.edges)
+        self.assertTrue(self.graph.is_reachable('c', 'b'))
+        self._check_matches_reload()
+
+        os.remove('c.node')
+        self.graph.refresh()
+        self.assertEqual([Edge('a', 'b', 'unnamed', 1)], self.graph.edges)
+        self.assertEqual(['a', 'b'], sorted(self.graph._adjacency))
+        self._check_matches_reload()
+
+    def test_components(self):
+        os.mkdir('east')
+        make_node('ny', 'country,state\nUSA,NY\n', 'east/ny.node')
+        east = self.graph.component('east')
+        self.assertEqual(['ny'], list(east.nodes))
+
+        make_node('pa', 'country,state\nUSA,PA\n', 'east/pa.node')
+        self.graph.refresh()
+        self.assertEqual(['ny', 'pa'], list(east.nodes))
+
+        shutil.rmtree('east')
+        self.graph.refresh()
+        self.assertEqual({}, self.graph._subgraphs)
+
+    def test_node_map_lock(self):
+        """Node lookups and refresh() should share one lock."""
+        refreshed = []
+        thread = threading.Thread(
+            target=lambda: refreshed.append(self.graph.nodes.refresh()))
+        with self.graph.nodes._lock:
+            thread.start()
+            thread.join(0.1)
+            self.assertEqual([], refreshed)  # <- Waiting for lock.
+            self.graph.nodes['a']
+        thread.join()
+        self.assertEqual(1, len(refreshed))
+
+    def test_polling(self):
+        found = []
+        self.graph.start_polling(interval=0.01, callback=lambda *x: found.append(x))
+        make_node('c', 'country,zone\nUSA,Atlantic\n', 'c.node')
+        for _ in range(500):
+            if found:
+                break
+            time.sleep(0.01)
+        self.graph.stop_polling()
+
+        self.assertEqual((set(['c']), set(), set()), found[0])
+        self.assertIn('c', self.graph.nodes)
+
+
+class TestQuery(MkdtempTestCase):
+    def setUp(self):
+        super(TestQuery, self).setUp()
+        for state in ('IN', 'NY', 'OH', 'PA', 'TX'):
+            make_node(state, 'country,state\nUSA,%s\n' % state,
+                      state.lower() + '.node')
+
+        self._orig_max_attached = gpn.graph._max_attached
+        gpn.graph._max_attached = lambda connection: 2  # <- Force batches.
+
+    def tearDown(self):
+        gpn.graph._max_attached = self._orig_max_attached
+        super(TestQuery, self).tearDown()
+
+    def test_query(self):
+        graph = Graph('.')
+        operation = ('SELECT label_value FROM {schema}.label '
+                     'WHERE label_value IN (?, ?)')
+        result = graph.query(operation, ['NY', 'TX'])
+        self.assertEqual([('ny', 'NY'), ('tx', 'TX')], sorted(result))
+
+    def test_names(self):
+        graph = Graph('.')
+        operation = 'SELECT COUNT(*) FROM {schema}.cell'
+        result = graph.query(operation, names=['oh', 'in'])
+        self.assertEqual([('oh', 2), ('in', 2)], list(result))
+
+    def test_memory_nodes(self):
+        nodes = [make_node('a', 'country,region\nUSA,East\n'),
+                 make_node('b', 'country,region\nUSA,West\n')]
+        graph = Graph(nodes=nodes)
+        operation = ("SELECT label_value FROM {schema}.label "
+                     "WHERE hierarchy_id=2 AND label_value!='UNMAPPED'")
+        result = graph.query(operation)
+        self.assertEqual([('a', 'East'), ('b', 'West')], sorted(result))
+
+    def test_read_only(self):
+        graph = Graph('.')
+        operation = 'DELETE FROM {schema}.cell'
+        with self.assertRaises(sqlite3.Error):
+            list(graph.query(operation))
+
+
+class TestFindLabel(MkdtempTestCase):
+    def setUp(self):
+        super(TestFindLabel, self).setUp()
+        make_node('a', 'country,state\nUSA,New York\nUSA,Ohio\n', 'a.node')
+        make_node('b', 'country,city\nUSA,new  york\n', 'b.node')
+
+    def test_find_label(self):
+        graph = Graph('.')
+        result = graph.find_label('NEW YORK')
+        expected = [('a', graph._node_hashes['a'], 'state', 2, 'New York'),
+                    ('b', graph._node_hashes['b'], 'city', 2, 'new  york')]
+        self.assertEqual(expected, result)
+
+        result = graph.find_label('New York', normalize=False)
+        self.assertEqual(['a'], [x[0] for x in result])
+
+        self.assertEqual([], graph.find_label('UNMAPPED'))
+        self.assertTrue(os.path.isfile('.gpn-labels'))
+
+    def test_incremental(self):
+        graph = Graph('.')
+        graph.find_label('ohio')
+        self.assertEqual([], graph._label_index.stale(graph._node_hashes))
+
+        make_node('c', 'country,state\nUSA,Ohio\n', 'c.node')
+        node_b = graph.nodes['b']
+        node_b._insert_cells(StringIO('country,city\nUSA,Ohio\n'))
+        os.remove('a.node')
+        graph.refresh()
+
+        stale = graph._label_index.stale(graph._node_hashes)
+        self.assertEqual(['b', 'c'], stale)  # <- Node 'a' not reindexed.
+        result = graph.find_label('ohio')
+        self.assertEqual(['b', 'c'], [x[0] for x in result])
+
+
+class TestExport(unittest.TestCase):
+    def setUp(self):
+        a = make_node('a', 'country,region\nUSA,East\nUSA,West\n')
+        b = make_node('b', 'country,state\nUSA,"New ""York"""\n')
+        add_edge(b, a, [(1, 1, Decimal('0.5')), (2, 1, 1)])
+        self.graph = Graph(nodes=[a, b])
+
+    def test_dot(self):
+        fh = StringIO()
+        self.graph.export_dot(fh)
+        expected = ('digraph gpn {\n'
+                    '  "a";\n'
+                    '  "b";\n'
+                    '  "a" -> "b" [label="unnamed"];\n'
+                    '}\n')
+        self.assertEqual(expected, fh.getvalue())
+
+    def test_dot_cells(self):
+        fh = StringIO()
+        self.graph.export_dot(fh, cells=True)
+        output = fh.getvalue()
+        self.assertIn('  subgraph "cluster_a" {\n', output)
+        self.assertIn('    "b::1" [label="USA, New \\"York\\""];\n', output)
+        self.assertIn('  "a::1" -> "b::1" [label="0.5"];\n', output)
+        self.assertIn('  "a::2" -> "b::1" [label="1"];\n', output)
+
+    def test_graphml(self):
+        fh = StringIO()
+        self.graph.export_graphml(fh)
+        root = ElementTree.fromstring(fh.getvalue())
+        ns = '{http://graphml.graphdrawing.org/xmlns}'
+        graph = root.find(ns + 'graph')
+        nodes = [x.get('id') for x in graph.findall(ns + 'node')]
+        self.assertEqual(['a', 'b'], nodes)
+        edges = [(x.get('source'), x.get('target'))
+                 for x in graph.findall(ns + 'edge')]
+        self.assertEqual([('a', 'b')], edges)
+
+    def test_graphml_cells(self):
+        fh = StringIO()
+        self.graph.export_graphml(fh, cells=True)
+        root = ElementTree.fromstring(fh.getvalue())
+        ns = '{http://graphml.graphdrawing.org/xmlns}'
+        cells = [x.get('id') for x in root.iter(ns + 'node')]
+        expected = ['a', 'a::1', 'a::2', 'a::3', 'b', 'b::1', 'b::2']
+        self.assertEqual(expected, cells)
+
+        weights = {}
+        for edge in root.iter(ns + 'edge'):
+            key = (edge.get('source'), edge.get('target'))
+            for data in edge.findall(ns + 'data'):
+                if data.get('key') == 'weight':
+                    weights[key] = data.text
+        expected = {('a::1', 'b::1'): '0.5', ('a::2', 'b::1'): '1'}
+        self.assertEqual(expected, weights)
+
+    @unittest.skipIf(networkx, 'NetworkX is installed.')
+    def test_networkx_missing(self):
+        with self.assertRaisesRegex(ImportError, 'requires the NetworkX'):
+            self.graph.to_networkx()
+
+    @unittest.skipIf(not networkx, 'NetworkX not installed.')
+    def test_networkx(self):
+        result = self.graph.to_networkx(cells=True)
+        self.assertEqual(5, result.number_of_nodes())
+        self.assertEqual(2, result.number_of_edges())
+        self.assertTrue(result.has_edge(('a', 1), ('b', 1)))
+
 
 if __name__ == '__main__':
     unittest.main()
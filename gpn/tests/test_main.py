@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+import os
+import sqlite3
+import sys
+try:
+    from StringIO import StringIO
+except ImportError:
+    from io import StringIO  # New stdlib location in 3.0
+
+from gpn.tests import _unittest as unittest
+from gpn.tests.common import MkdtempTestCase
+
+import gpn.connector
+from gpn.__main__ import main
+from gpn.__main__ import _StatementTimer
+from gpn.node import Node
+
+
+class TestStatementTimer(unittest.TestCase):
+    def test_normalize(self):
+        sql = "SELECT * FROM label WHERE label_value='O''Brien' AND label_id=12"
+        expected = 'SELECT * FROM label WHERE label_value=? AND label_id=?'
+        self.assertEqual(expected, _StatementTimer._normalize(sql))
+
+    def test_totals(self):
+        timer = _StatementTimer()
+        timer('SELECT 1')
+        timer('SELECT 2')
+        timer.stop()
+        timer('SELECT 3')  # <- Ignored after stop().
+        self.assertEqual(['SELECT ?'], list(timer.totals.keys()))
+        self.assertEqual(2, timer.totals['SELECT ?'][0])
+
+
+class TestMain(MkdtempTestCase):
+    def setUp(self):
+        MkdtempTestCase.setUp(self)
+        with open('cells.csv', 'w') as fh:
+            fh.write('country,state,county\n'
+                     'USA,Indiana,LaPorte\n'
+                     'USA,Indiana,Porter\n'
+                     'USA,Ohio,Franklin\n')
+
+    def _main(self, *argv):
+        """Run main() and return exit status, stdout, and stderr."""
+        orig_stdout, orig_stderr = sys.stdout, sys.stderr
+        sys.stdout, sys.stderr = StringIO(), StringIO()
+        try:
+            status = main(list(argv))
+            return status, sys.stdout.getvalue(), sys.stderr.getvalue()
+        finally:
+            sys.stdout, sys.stderr = orig_stdout, orig_stderr
+
+    def test_ingest_and_hash(self):
+        status, output, errors = self._main('ingest', 'a.node', 'cells.csv')
+        self.assertEqual((0, '', ''), (status, output, errors))
+
+        status, output, errors = self._main('hash', 'a.node')
+        self.assertEqual(0, status)
+        self.assertEqual(Node('a.node').get_hash() + '\n', output)
+
+    def test_export(self):
+        self._main('ingest', 'a.node', 'cells.csv')
+        status, output, errors = self._main('export', 'a.node')
+        self.assertEqual(0, status)
+        lines = output.splitlines()
+        self.assertEqual('cell_id,country,state,county', lines[0])
+        self.assertEqual(5, len(lines))  # <- Header, UNMAPPED, and 3 cells.
+
+        status, output, errors = self._main('export', 'a.node', 'out.csv')
+        self.assertEqual('', output)
+        self.assertTrue(os.path.isfile('out.csv'))
+
+    def test_select(self):
+        self._main('ingest', 'a.node', 'cells.csv')
+        status, output, errors = self._main('select', 'a.node', 'state=Indiana')
+        self.assertEqual(0, status)
+        expected = ['country,state,county', 'USA,Indiana,LaPorte',
+                    'USA,Indiana,Porter']
+        self.assertEqual(expected, output.splitlines())
+
+        status, output, errors = self._main('select', 'a.node', 'Indiana')
+        self.assertEqual(1, status)
+        self.assertIn('HIERARCHY=LABEL', errors)
+
+    def test_missing_node(self):
+        status, output, errors = self._main('hash', 'missing.node')
+        self.assertEqual(1, status)
+        self.assertIn('No such node file', errors)
+        self.assertFalse(os.path.exists('missing.node'))
+
+    def test_graph(self):
+        self._main('ingest', 'a.node', 'cells.csv')
+        status, output, errors = self._main('graph', '.')
+        self.assertEqual(0, status)
+        self.assertIn('Nodes: 1\n', output)
+        self.assertIn('Edges: 0\n', output)
+
+        status, output, errors = self._main('graph', '.', '--export', 'dot')
+        self.assertTrue(output.startswith('digraph'))
+
+    def test_progress(self):
+        status, output, errors = self._main('ingest', 'a.node', 'cells.csv',
+                                            '--progress')
+        self.assertEqual(0, status)
+        self.assertRegex(errors, r'3 rows \(\d+ rows/s\)\n$')
+
+    @unittest.skipUnless(hasattr(sqlite3.Connection, 'set_trace_callback'),
+                         'requires set_trace_callback() (new in 3.3)')
+    def test_profile(self):
+        status, output, errors = self._main('ingest', 'a.node', 'cells.csv',
+                                            '--profile', '--profile-top', '5')
+        self.assertEqual(0, status)
+        self.assertIn('cumulative', errors)
+        self.assertIn('SQLite statements', errors)
+        self.assertIn('INSERT INTO', errors)
+        self.assertIsNone(gpn.connector._trace_callback)  # <- Restored.
+
+
+if __name__ == '__main__':
+    unittest.main()
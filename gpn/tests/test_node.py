@@ -12,7 +12,7 @@ from gpn.tests import _unittest as unittest
 from gpn.tests.common import MkdtempTestCase
 
 from gpn.node import Node
-from gpn.connector import _schema
+from gpn.connector import _get_schema
 from gpn.connector import _SharedConnection
 from gpn import IN_MEMORY
 from gpn import TEMP_FILE
@@ -21,12 +21,11 @@ from gpn import READ_ONLY
 
 class TestInstantiation(MkdtempTestCase):
     def _make_node(self, filename):
-        global _schema
         self._existing_node = filename
         connection = sqlite3.connect(self._existing_node)
         cursor = connection.cursor()
         cursor.execute('PRAGMA synchronous=OFF')
-        for operation in _schema:
+        for operation in _get_schema():
             cursor.execute(operation)
         cursor.execute('PRAGMA synchronous=FULL')
         connection.close()
@@ -134,6 +133,60 @@ class TestHash(unittest.TestCase):
         self.assertEqual(expected, result)
 
 
+class TestCachedHash(MkdtempTestCase):
+    def _count_computations(self, node):
+        """Wrap node's _get_hash() and return list of results."""
+        computed = []
+        orig_get_hash = node._get_hash
+        def counting_get_hash(cursor):
+            computed.append(orig_get_hash(cursor))
+            return computed[-1]
+        node._get_hash = counting_get_hash
+        return computed
+
+    def _check_cached(self, node):
+        computed = self._count_computations(node)
+        node._insert_cells(StringIO('state,county\nIndiana,LaPorte\n'))
+        first = node.get_hash()
+        self.assertEqual(1, len(computed))  # <- Cached by insert.
+        self.assertEqual(first, node.get_hash())
+        self.assertEqual(1, len(computed))
+
+        # Changing cells directly should invalidate cached hash.
+        with node._connect() as connection:
+            connection.execute("UPDATE label SET label_value='Porter' "
+                               "WHERE label_value='LaPorte'")
+        second = node.get_hash()
+        self.assertEqual(2, len(computed))
+        self.assertNotEqual(first, second)
+
+    def test_in_memory(self):
+        self._check_cached(Node(mode=IN_MEMORY))
+
+    def test_file(self):
+        self._check_cached(Node('counties.node'))
+
+    def test_reopened_file(self):
+        node = Node('counties.node')
+        node._insert_cells(StringIO('state,county\nIndiana,LaPorte\n'))
+        expected = node.get_hash()
+
+        reopened = Node('counties.node')
+        computed = self._count_computations(reopened)
+        self.assertEqual(expected, reopened.get_hash())
+        self.assertEqual(expected, reopened.get_hash())
+        self.assertEqual(0, len(computed))  # <- Stored hash is current.
+
+        # Writing to the file should invalidate the stored hash.
+        with node._connect() as connection:
+            connection.execute("UPDATE label SET label_value='Porter' "
+                               "WHERE label_value='LaPorte'")
+        reopened = Node('counties.node')
+        computed = self._count_computations(reopened)
+        self.assertNotEqual(expected, reopened.get_hash())
+        self.assertEqual(1, len(computed))
+
+
 class TestTransactionHandling(unittest.TestCase):
     def setUp(self):
         self._node = Node(mode=IN_MEMORY)
@@ -429,6 +482,193 @@ class TestSelect(unittest.TestCase):
         self.assertEqual(expected, list(result))
 
 
+class TestHierarchyIndex(unittest.TestCase):
+    def setUp(self):
+        fh = StringIO('country,region,state,city\n'      # cell_ids
+                      'USA,Midwest,IL,Chicago\n'         # 1
+                      'USA,Northeast,NY,New York\n'      # 2
+                      'USA,Northeast,PA,UNMAPPED\n'      # 3
+                      'USA,South,TX,Dallas\n'            # 4
+                      'USA,South,TX,Houston\n'           # 5
+                      'USA,West,CA,Los Angeles\n'        # 6
+                      'USA,West,CA,San Diego\n')         # 7
+        self.node = Node(mode=IN_MEMORY)
+        self.node._insert_cells(fh)  # <- UNMAPPED cell is 8.
+
+    def test_descendants(self):
+        self.assertEqual([4, 5], self.node.descendants(region='South'))
+        self.assertEqual([6, 7], self.node.descendants(country='USA',
+                                                       region='West',
+                                                       state='CA'))
+        self.assertEqual([2, 3], self.node.descendants(country='USA',
+                                                       region='Northeast'))
+        self.assertEqual([], self.node.descendants(region='XX'))
+        self.assertEqual([], self.node.descendants(planet='Earth'))
+        self.assertEqual([], self.node.descendants(region='West', state='TX'))
+        self.assertEqual(list(range(1, 9)), self.node.descendants())
+
+    def test_skipped_levels(self):
+        self.assertEqual([6, 7], self.node.descendants(country='USA',
+                                                       state='CA'))
+        self.assertEqual([3], self.node.descendants(region='Northeast',
+                                                    city='UNMAPPED'))
+
+    def test_ancestors(self):
+        expected = [{'country': 'USA'},
+                    {'country': 'USA', 'region': 'West'},
+                    {'country': 'USA', 'region': 'West', 'state': 'CA'}]
+        self.assertEqual(expected, self.node.ancestors(7))
+        self.assertEqual([6, 7], self.node.descendants(**expected[-1]))
+
+        with self.assertRaises(KeyError):
+            self.node.ancestors(99)
+
+    def test_incremental(self):
+        """Cells inserted later are added to the existing index."""
+        connection = self.node._connect()
+        cursor = connection.cursor()
+        cursor.execute('SELECT COUNT(*) FROM hierarchy_prefix')
+        prefix_count = cursor.fetchone()[0]
+        connection.close()
+
+        fh = StringIO('country,region,state,city\n'
+                      'USA,West,CA,San Jose\n'  # 9
+                      'USA,West,OR,Portland\n')  # 10
+        self.node._insert_cells(fh)
+        self.assertEqual([6, 7, 9, 10], self.node.descendants(region='West'))
+        self.assertEqual([6, 7, 9], self.node.descendants(state='CA'))
+
+        connection = self.node._connect()
+        cursor = connection.cursor()
+        cursor.execute('SELECT COUNT(*) FROM hierarchy_prefix')
+        self.assertEqual(prefix_count + 3, cursor.fetchone()[0])
+        connection.close()
+
+    def test_missing_index(self):
+        """Nodes without an index are still valid and are indexed on
+        first use.
+
+        """
+        connection = self.node._connect()
+        cursor = connection.cursor()
+        cursor.execute('DROP TABLE cell_prefix')
+        cursor.execute('DROP TABLE hierarchy_prefix')
+        connection.commit()
+        self.assertTrue(self.node._connect._is_valid(connection))
+        connection.close()
+
+        self.assertEqual([4, 5], self.node.descendants(state='TX'))
+
+
+class TestReadOnlyHierarchyIndex(MkdtempTestCase):
+    def setUp(self):
+        MkdtempTestCase.setUp(self)
+        node = Node('counties.node')
+        node._insert_cells(StringIO('country,state,county\n'  # cell_ids
+                                    'USA,OH,Franklin\n'       # 1
+                                    'USA,OH,Hamilton\n'       # 2
+                                    'USA,PA,Franklin\n'))     # 3
+
+    def drop_index(self):
+        """Remove index (as in a node made before it existed)."""
+        connection = sqlite3.connect('counties.node')
+        connection.execute('DROP TABLE cell_prefix')
+        connection.execute('DROP TABLE hierarchy_prefix')
+        connection.commit()
+        connection.close()
+
+    def assertQueries(self, node):
+        self.assertEqual([1, 2], node.descendants(state='OH'))
+        self.assertEqual([1, 3], node.descendants(county='Franklin'))
+        self.assertEqual([{'country': 'USA'},
+                          {'country': 'USA', 'state': 'PA'}],
+                         node.ancestors(3))
+        with self.assertRaises(KeyError):
+            node.ancestors(99)
+        result = list(node.rollup({1: 1, 2: 2, 3: 4}, to_level='state'))
+        self.assertEqual([({'country': 'USA', 'state': 'OH'}, 3),
+                          ({'country': 'USA', 'state': 'PA'}, 4)], result)
+
+    def test_current_index(self):
+        node = Node('counties.node', mode=READ_ONLY)
+        self.assertQueries(node)
+
+    def test_missing_index(self):
+        """Read-only queries work without writing an index."""
+        self.drop_index()
+        modified = os.stat('counties.node').st_mtime
+        node = Node('counties.node', mode=READ_ONLY)
+        self.assertQueries(node)
+
+        self.assertEqual(modified, os.stat('counties.node').st_mtime)
+        connection = sqlite3.connect('counties.node')
+        cursor = connection.execute("SELECT 1 FROM sqlite_master "
+                                    "WHERE name='cell_prefix'")
+        self.assertIsNone(cursor.fetchone())
+        connection.close()
+
+
+class TestRollup(unittest.TestCase):
+    def setUp(self):
+        fh = StringIO('country,state,county\n'  # cell_ids
+                      'USA,OH,Franklin\n'       # 1
+                      'USA,OH,Hamilton\n'       # 2
+                      'USA,PA,Franklin\n'       # 3
+                      'USA,PA,UNMAPPED\n')      # 4
+        self.node = Node(mode=IN_MEMORY)
+        self.node._insert_cells(fh)
+
+    def test_rollup(self):
+        data = {1: 10, 2: 5, 3: 2, 4: 1}
+        result = list(self.node.rollup(data, to_level='state'))
+        expected = [({'country': 'USA', 'state': 'OH'}, 15),
+                    ({'country': 'USA', 'state': 'PA'}, 3)]
+        self.assertEqual(expected, result)
+
+        result = list(self.node.rollup(data, to_level='country'))
+        self.assertEqual([({'country': 'USA'}, 18)], result)
+
+    def test_same_label_different_parents(self):
+        """Labels are grouped by their full path, not value alone."""
+        data = [(1, 1.5), (3, 2.5), (3, 1)]  # <- Pairs may repeat cells.
+        result = list(self.node.rollup(data, to_level='county'))
+        expected = [({'country': 'USA', 'state': 'OH', 'county': 'Franklin'}, 1.5),
+                    ({'country': 'USA', 'state': 'PA', 'county': 'Franklin'}, 3.5)]
+        self.assertEqual(expected, result)
+
+    def test_order(self):
+        """Totals are ordered by label values (not by cell_id)."""
+        node = Node(mode=IN_MEMORY)
+        node._insert_cells(StringIO('country,state,county\n'
+                                    'USA,WV,Wayne\n'    # 1
+                                    'USA,OH,Wayne\n'    # 2
+                                    'USA,OH,Adams\n'))  # 3
+        result = node.rollup({1: 1, 2: 2, 3: 3}, to_level='county')
+        labels = [(x['state'], x['county']) for x, _ in result]
+        expected = [('OH', 'Adams'), ('OH', 'Wayne'), ('WV', 'Wayne')]
+        self.assertEqual(expected, labels)
+
+    def test_unknown_cells_and_levels(self):
+        result = list(self.node.rollup({1: 1, 99: 1}, to_level='country'))
+        self.assertEqual([({'country': 'USA'}, 1)], result)
+
+        with self.assertRaises(AssertionError):
+            list(self.node.rollup({1: 1}, to_level='city'))
+
+    def test_temporary_table_removed(self):
+        result = self.node.rollup({1: 1, 2: 1}, to_level='county')
+        next(result)
+        result.close()  # <- Stop before all totals are read.
+        self.assertEqual(1, len(list(self.node.rollup({1: 1}, 'county'))))
+
+        connection = self.node._connect()
+        cursor = connection.cursor()
+        cursor.execute("SELECT name FROM sqlite_temp_master "
+                       "WHERE name='rollup_data'")
+        self.assertIsNone(cursor.fetchone())
+        connection.close()
+
+
 class TestFileImportExport(MkdtempTestCase):
     def setUp(self):
         super(self.__class__, self).setUp()
@@ -463,6 +703,46 @@ class TestFileImportExport(MkdtempTestCase):
             self.node.export_cells(filename)
 
 
+class TestSuggestRelations(unittest.TestCase):
+    def setUp(self):
+        self.node = Node(mode=IN_MEMORY)
+        self.node._insert_cells(StringIO('country,county\n'
+                                         'USA,Allen\n'          # 1
+                                         'USA,Cuyahoga\n'       # 2
+                                         'USA,Saint Clair\n'    # 3
+                                         'USA,Van Wert\n'       # 4
+                                         'USA,Hamilton\n'))     # 5
+        self.other = Node(mode=IN_MEMORY)
+        self.other._insert_cells(StringIO('country,county\n'
+                                          'USA,Allen\n'         # 1
+                                          'USA,CUYAHOGA\n'      # 2
+                                          'USA,St. Clair\n'     # 3
+                                          'USA,VanWert\n'       # 4
+                                          'USA,Marion\n'))      # 5
+
+    def test_leaf_labels(self):
+        expected = [(1, 'Allen'), (2, 'Cuyahoga'), (3, 'Saint Clair'),
+                    (4, 'Van Wert'), (5, 'Hamilton')]  # No UNMAPPED cell.
+        self.assertEqual(expected, list(self.node._leaf_labels()))
+
+    def test_suggest_relations(self):
+        result = self.node.suggest_relations(self.other)
+        expected = [(1, 1, 1.0),       # Exact.
+                    (2, 2, 0.9),       # Normalized.
+                    (4, 4, 0.4)]       # Trigram similarity (5/10 * 0.8).
+        self.assertEqual(expected, result)
+
+    def test_min_score(self):
+        result = self.node.suggest_relations(self.other, min_score=0.3)
+        self.assertIn((3, 3, 0.266667), result)
+        self.assertNotIn(5, [x[1] for x in result])  # <- Hamilton unmatched.
+
+    def test_block_size(self):
+        """Trigrams shared by too many labels should be skipped."""
+        result = self.node.suggest_relations(self.other, block_size=0)
+        self.assertEqual([(1, 1, 1.0), (2, 2, 0.9)], result)
+
+
 class TestRepr(unittest.TestCase):
     def test_empty(self):
         node = Node()
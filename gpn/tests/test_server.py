@@ -0,0 +1,160 @@
+# -*- coding: utf-8 -*-
+import json
+import os
+import socket
+import threading
+from decimal import Decimal
+
+from gpn.tests import _unittest as unittest
+from gpn.tests.common import MkdtempTestCase
+from gpn.tests.common import make_node
+from gpn.tests.common import add_edge
+
+from gpn import client
+from gpn import server
+from gpn.graph import Graph
+
+
+def _make_graph(in_memory=True):
+    """Return graph of nodes a and b (if `in_memory` is False, node
+    files are created in the current directory).
+
+    """
+    a = make_node('a', 'country,region\n'
+                       'USA,East\n'     # 1
+                       'USA,West\n',    # 2
+                  path=None if in_memory else 'a.node')
+    b = make_node('b', 'country,state\n'
+                       'USA,NY\n'       # 1
+                       'USA,PA\n'       # 2
+                       'USA,CA\n',      # 3
+                  path=None if in_memory else 'b.node')
+    add_edge(b, a, [(1, 1, Decimal('0.5')),
+                    (1, 2, Decimal('0.5')),
+                    (2, 3, Decimal('1'))])
+    if in_memory:
+        return Graph(nodes=[a, b])
+    return Graph('.')
+
+
+class TestHandleRequest(unittest.TestCase):
+    def setUp(self):
+        self.graph = _make_graph()
+
+    def handle(self, request):
+        return server.handle_request(self.graph, json.dumps(request))
+
+    def test_select(self):
+        response = self.handle({'op': 'select', 'node': 'b',
+                                'criteria': {'state': 'PA'}, 'id': 7})
+        expected = {'id': 7, 'ok': True,
+                    'result': [{'cell_id': 2, 'country': 'USA',
+                                'state': 'PA'}]}
+        self.assertEqual(expected, response)
+
+    def test_translate(self):
+        response = self.handle({'op': 'translate', 'path': ['a', 'b']})
+        expected = [[1, 1, 0.5], [1, 2, 0.5], [2, 3, 1.0]]
+        self.assertEqual(expected, response['result'])
+
+    def test_retabulate(self):
+        response = self.handle({'op': 'retabulate', 'path': ['a', 'b'],
+                                'data': {'1': 10, '2': 4}})
+        self.assertEqual({'1': 5.0, '2': 5.0, '3': 4.0}, response['result'])
+
+    def test_errors(self):
+        response = self.handle({'op': 'unknown', 'id': 'x'})
+        self.assertEqual('x', response['id'])
+        self.assertFalse(response['ok'])
+        self.assertIn('Unknown op', response['error'])
+
+        response = server.handle_request(self.graph, 'not json')
+        self.assertFalse(response['ok'])
+
+        response = self.handle({'op': 'select', 'node': 'missing'})
+        self.assertEqual('KeyError: %r' % json.loads('"missing"'),
+                         response['error'])  # <- Repr is u'missing' in 2.x.
+
+
+@unittest.skipUnless(server.asyncio and hasattr(socket, 'AF_UNIX'),
+                     'requires asyncio and Unix domain sockets')
+class TestServe(MkdtempTestCase):
+    def setUp(self):
+        MkdtempTestCase.setUp(self)
+        ready = threading.Event()
+        self.running = []
+
+        def on_ready(srv):
+            self.running.append(srv)
+            ready.set()
+
+        graph = _make_graph(in_memory=False)
+        self.thread = threading.Thread(
+            target=server.serve, args=(graph, 'test.sock'),
+            kwargs={'ready': on_ready})
+        self.thread.daemon = True
+        self.thread.start()
+        self.assertTrue(ready.wait(10), 'Server did not start.')
+
+    def tearDown(self):
+        if self.thread.is_alive():
+            self.running[0].stop()
+            self.thread.join(10)
+        MkdtempTestCase.tearDown(self)
+
+    def test_request(self):
+        requests = [{'op': 'select', 'node': 'a', 'criteria': {'region': 'West'}},
+                    {'op': 'retabulate', 'path': ['a', 'b'], 'data': {'2': 3}},
+                    {'op': 'unknown'}]
+        responses = list(client.request('test.sock', requests))
+        self.assertEqual(2, responses[0]['result'][0]['cell_id'])
+        self.assertEqual({'3': 3.0}, responses[1]['result'])
+        self.assertFalse(responses[2]['ok'])
+
+    def test_pipelined(self):
+        """Requests sent together are answered in order."""
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            sock.connect('test.sock')
+            lines = [json.dumps({'op': 'hash', 'id': i}) for i in range(5)]
+            sock.sendall(('\n'.join(lines) + '\n').encode('utf-8'))
+            sock.shutdown(socket.SHUT_WR)
+            chunks = []
+            while True:
+                chunk = sock.recv(4096)
+                if not chunk:
+                    break
+                chunks.append(chunk)
+        finally:
+            sock.close()
+        responses = b''.join(chunks).decode('utf-8').splitlines()
+        ids = [json.loads(x)['id'] for x in responses]
+        self.assertEqual([0, 1, 2, 3, 4], ids)
+
+    def test_stop_closes_connections(self):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            sock.connect('test.sock')
+            sock.sendall(b'{"op": "hash"}\n')
+            self.assertTrue(sock.recv(4096))  # <- Connection is open.
+            self.running[0].stop()
+            self.thread.join(10)
+            self.assertEqual(b'', sock.recv(4096))  # <- Closed by server.
+        finally:
+            sock.close()
+        self.assertFalse(os.path.exists('test.sock'))
+
+    def test_already_running(self):
+        with self.assertRaisesRegex(IOError, 'already running'):
+            server.serve(Graph('.'), 'test.sock')
+
+    def test_stale_socket(self):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.bind('stale.sock')
+        sock.close()  # <- Leaves file behind with no listener.
+        server._check_socket('stale.sock')
+        self.assertFalse(os.path.exists('stale.sock'))
+
+
+if __name__ == '__main__':
+    unittest.main()
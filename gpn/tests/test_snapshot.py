@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+from array import array
+try:
+    from StringIO import StringIO
+except ImportError:
+    from io import StringIO  # New stdlib location in 3.0
+
+from gpn.tests import _unittest as unittest
+from gpn.tests.common import make_node
+
+from gpn.snapshot import NodeSnapshot
+
+
+class TestNodeSnapshot(unittest.TestCase):
+    def setUp(self):
+        self.node = make_node('counties', 'state,county,town\n'
+                                          'OH,Franklin,Columbus\n'
+                                          'OH,Franklin,Dublin\n'
+                                          'OH,Hamilton,Cincinnati\n'
+                                          'OH,Hamilton,UNMAPPED\n')
+        self.snapshot = self.node.snapshot()
+
+    def test_structure(self):
+        snapshot = self.snapshot
+        self.assertIsInstance(snapshot, NodeSnapshot)
+        self.assertEqual(('state', 'county', 'town'), snapshot.hierarchy)
+        self.assertEqual(self.node.get_hash(), snapshot.node_hash)
+        self.assertEqual(array('i', [1, 2, 3, 4, 5]), snapshot.cell_ids)
+        self.assertEqual(5, len(snapshot))
+        for level in snapshot._label_ids:
+            self.assertIsInstance(level, array)
+            self.assertEqual(len(snapshot), len(level))
+
+    def test_matches_node(self):
+        criteria = [{'state': 'OH'},
+                    {'county': 'Franklin'},
+                    {'county': 'Hamilton', 'town': 'UNMAPPED'},
+                    {'state': 'OH', 'county': 'Hamilton', 'town': 'Cincinnati'},
+                    {'county': 'Franklin', 'town': 'Cincinnati'},
+                    {'county': 'Unknown'}]
+        for kwds in criteria:
+            expected = list(self.node.select_cell(**kwds))
+            self.assertEqual(expected, self.snapshot.select_cell(**kwds), kwds)
+
+    def test_select_cell_id(self):
+        self.assertEqual([1, 2], self.snapshot.select_cell_id(county='Franklin'))
+        self.assertEqual([], self.snapshot.select_cell_id(unknown='Franklin'))
+        self.assertEqual([1, 2, 3, 4, 5], self.snapshot.select_cell_id())
+
+    def test_get_cell(self):
+        expected = {'state': 'OH', 'county': 'Hamilton', 'town': 'Cincinnati'}
+        self.assertEqual(expected, self.snapshot.get_cell(3))
+        with self.assertRaises(KeyError):
+            self.snapshot.get_cell(99)
+
+    def test_interned_labels(self):
+        first = self.snapshot.get_cell(3)['county']
+        second = self.snapshot.get_cell(4)['county']
+        self.assertIs(first, second)
+
+    def test_not_updated(self):
+        """Snapshot does not change when node changes."""
+        self.node._insert_cells(StringIO('state,county,town\n'
+                                         'OH,Knox,Gambier\n'))
+        self.assertEqual(5, len(self.snapshot))
+        self.assertNotEqual(self.node.get_hash(), self.snapshot.node_hash)
+
+
+if __name__ == '__main__':
+    unittest.main()
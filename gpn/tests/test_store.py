@@ -0,0 +1,193 @@
+# -*- coding: utf-8 -*-
+import os
+from decimal import Decimal
+
+from gpn.tests import _unittest as unittest
+from gpn.tests.common import MkdtempTestCase
+from gpn.tests.common import make_node
+from gpn.tests.common import add_edge
+
+from gpn.graph import Edge
+from gpn.graph import Graph
+from gpn.graph import _node_hash
+from gpn.node import Node
+from gpn.store import NodeStore
+
+
+class TestNodeStore(unittest.TestCase):
+    def setUp(self):
+        self.a = make_node('a', 'country,region\n'
+                                'USA,East\n'       # 1
+                                'USA,West\n')      # 2
+        self.b = make_node('b', 'country,state\n'
+                                'USA,NY\n'         # 1
+                                'USA,PA\n')        # 2
+        add_edge(self.b, self.a, [(1, 1, Decimal('0.5')),
+                                  (1, 2, Decimal('0.5')),
+                                  (2, 2, Decimal('1'))])
+        self.store = NodeStore()
+        self.store.save(self.a)
+        self.store.save(self.b)
+
+    def test_mapping(self):
+        self.assertEqual(['a', 'b'], list(self.store))
+        self.assertEqual(2, len(self.store))
+        self.assertIn('a', self.store)
+        self.assertNotIn('c', self.store)
+        with self.assertRaises(KeyError):
+            self.store['c']
+
+    def test_load(self):
+        node = self.store['b']
+        self.assertIsInstance(node, Node)
+        self.assertEqual('b', node.name)
+        self.assertEqual(_node_hash(self.b), _node_hash(node))
+        self.assertEqual(list(self.b.select_cell(state='PA')),
+                         list(node.select_cell(state='PA')))
+
+    def test_save_replaces(self):
+        node = self.store['a']
+        add_edge(node, self.b, [(1, 1, 1)])
+        self.assertEqual([], self.store.summaries()['a'][2])  # <- Not saved.
+
+        self.store.save(node)
+        self.assertEqual(2, len(self.store))
+        edge_rows = self.store.summaries()['a'][2]
+        self.assertEqual([(_node_hash(self.b), 'b', 'unnamed', 1, {})],
+                         edge_rows)
+
+    def test_remove(self):
+        self.store.remove('a')
+        self.assertEqual(['b'], list(self.store))
+        self.assertEqual(['b'], list(self.store.summaries()))
+
+    def test_names_cached(self):
+        names = self.store._names()
+        self.assertIs(names, self.store._names())  # <- Not re-queried.
+        self.store.save(self.a, 'c')
+        self.assertEqual(['a', 'b', 'c'], list(self.store))
+        self.store.remove('c')
+        self.assertNotIn('c', self.store)
+
+    def test_summaries(self):
+        summaries = self.store.summaries()
+        node_hash, hierarchy, edge_rows = summaries['b']
+        self.assertEqual(_node_hash(self.b), node_hash)
+        self.assertEqual(['country', 'state'], hierarchy)
+        self.assertEqual([(_node_hash(self.a), 'a', 'unnamed', 1, {})],
+                         edge_rows)
+
+    def test_read_relations(self):
+        result = self.store.read_relations('b', _node_hash(self.a))
+        expected = [(1, 1, Decimal('0.5')),
+                    (1, 2, Decimal('0.5')),
+                    (2, 2, Decimal('1'))]
+        self.assertEqual(expected, sorted(result))
+
+        with self.assertRaisesRegex(AssertionError, 'No relations found'):
+            self.store.read_relations('a', _node_hash(self.b))
+
+
+class TestStoreFiles(MkdtempTestCase):
+    def setUp(self):
+        super(TestStoreFiles, self).setUp()
+        os.mkdir('nodes')
+        self.a = make_node('a', 'country,region\nUSA,East\nUSA,West\n',
+                           'nodes/a.node')
+        self.b = make_node('b', 'country,state\nUSA,NY\nUSA,PA\n',
+                           'nodes/b.node')
+        add_edge(self.b, self.a, [(1, 1, 1), (2, 2, 1)])
+
+    def test_import_export(self):
+        store = NodeStore('graph.gpn')
+        store.import_nodes(Graph('nodes').nodes)
+        self.assertEqual(['a', 'b'], list(store))
+
+        store.export_nodes('exported')
+        self.assertTrue(os.path.isfile('exported/a.node'))
+        exported = Node('exported/b.node')
+        self.assertEqual(_node_hash(self.b), _node_hash(exported))
+
+        with self.assertRaisesRegex(AssertionError, 'already exists'):
+            store.export_nodes('exported')
+
+    def test_not_a_store(self):
+        """Existing files that are not stores are left unchanged."""
+        with self.assertRaisesRegex(Exception, 'not a node store'):
+            Graph('nodes/a.node')
+        with self.assertRaisesRegex(Exception, 'not a node store'):
+            NodeStore('nodes/a.node')
+        self.assertEqual(_node_hash(self.a), _node_hash(Node('nodes/a.node')))
+
+        with open('notes.txt', 'w') as fh:
+            fh.write('Not a database.')
+        with self.assertRaisesRegex(Exception, 'not a node store'):
+            NodeStore('notes.txt')
+
+        open('empty.gpn', 'w').close()
+        self.assertEqual([], list(NodeStore('empty.gpn')))  # <- New store.
+
+    def test_graph(self):
+        NodeStore('graph.gpn').import_nodes(Graph('nodes').nodes)
+        graph = Graph('graph.gpn')
+        self.assertIsInstance(graph.nodes, NodeStore)
+        self.assertEqual([Edge('a', 'b', 'unnamed', 1)], graph.edges)
+        self.assertEqual([], graph.component_names())
+
+        expected = Graph('nodes').translate(['a', 'b'])
+        self.assertEqual(expected, graph.translate(['a', 'b']))
+        self.assertEqual(1, len(graph._get_cache()))  # <- Cached in store.
+        self.assertFalse(os.path.exists('.gpn-cache'))
+
+    def test_query(self):
+        """Store graphs are queried without loading nodes."""
+        NodeStore('graph.gpn').import_nodes(Graph('nodes').nodes)
+        graph = Graph('graph.gpn', max_open=1)
+        operation = ('SELECT label_value FROM {schema}.label '
+                     'NATURAL JOIN {schema}.hierarchy '
+                     'WHERE hierarchy_value=? ORDER BY label_value')
+        expected = list(Graph('nodes').query(operation, ['state']))
+        self.assertEqual([('b', 'NY'), ('b', 'PA'), ('b', 'UNMAPPED')],
+                         expected)
+        self.assertEqual(expected, list(graph.query(operation, ['state'])))
+
+        operation = 'SELECT COUNT(*) FROM {schema}.cell'
+        self.assertEqual([('b', 3)], list(graph.query(operation, names=['b'])))
+        self.assertEqual(Graph('nodes').find_label('ny'),
+                         graph.find_label('ny'))
+        self.assertEqual(0, len(graph.nodes._open))  # <- Nothing loaded.
+
+        with self.assertRaisesRegex(AssertionError, 'not stored'):
+            list(graph.query('SELECT * FROM {schema}.cell_prefix'))
+
+    def test_edited_edge(self):
+        """Cached translations are not reused after an edge changes
+        (including by a later Graph reading the same cache).
+
+        """
+        self.assertEqual([(1, 1, 1), (2, 2, 1)],
+                         Graph('nodes').translate(['a', 'b']))
+        graph = Graph('nodes')
+        self.assertEqual([(1, 1, 1), (2, 2, 1)], graph.translate(['a', 'b']))
+        self.assertEqual(1, len(graph._get_cache()))  # <- Reused entry.
+
+        with self.b._connect() as connection:
+            connection.execute('UPDATE relation SET cell_id=1 '
+                               'WHERE other_cell_id=2')
+        self.assertEqual([(1, 1, 1), (2, 1, 1)],
+                         Graph('nodes').translate(['a', 'b']))
+
+        store = NodeStore('graph.gpn')
+        store.import_nodes(Graph('nodes').nodes)
+        self.assertEqual([(1, 1, 1), (2, 1, 1)],
+                         Graph('graph.gpn').translate(['a', 'b']))
+        with self.b._connect() as connection:
+            connection.execute('UPDATE relation SET cell_id=2 '
+                               'WHERE other_cell_id=2')
+        store.save(self.b, 'b')
+        self.assertEqual([(1, 1, 1), (2, 2, 1)],
+                         Graph('graph.gpn').translate(['a', 'b']))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,32 @@
+#!/usr/bin/env bash
+#=======================================================================
+#        FILE: run-benchmarks.sh
+# DESCRIPTION: Runs benchmarks and compares them against a stored
+#              baseline (created on first run).  Exits with a non-zero
+#              status when a case is significantly slower than the
+#              threshold.  Extra arguments are passed to the runner,
+#              e.g.: ./run-benchmarks.sh --cases insert_cells,select_cell
+#=======================================================================
+
+PYTHON=${PYTHON:-python3}
+BASELINE=${BASELINE:-benchmarks-baseline.json}
+REPEAT=${REPEAT:-7}
+THRESHOLD=${THRESHOLD:-10}
+
+if [ ! -f "$BASELINE" ]
+then
+    echo "No baseline found--saving baseline to $BASELINE." >&2
+    $PYTHON -B -m gpn.benchmarks --repeat $REPEAT --output /dev/null \
+        --save-baseline "$BASELINE" "$@"
+    exit $?
+fi
+
+$PYTHON -B -m gpn.benchmarks --repeat $REPEAT --output /dev/null \
+    --baseline "$BASELINE" --threshold $THRESHOLD "$@"
+status=$?
+if [ $status -ne 0 ]
+then
+    echo "" >&2
+    echo "Benchmark comparison failed." >&2
+fi
+exit $status